@@ -1,17 +1,28 @@
 from flask import Flask, request, jsonify, render_template
-from flask import send_from_directory
+from flask import send_file, send_from_directory, Response, stream_with_context
 import xml.etree.ElementTree as ET
 import difflib
+import importlib.util
 import re
 import os
+import sys
 import logging
 import pandas as pd
 import io
 import json
+import tempfile
 from collections import defaultdict
 from datetime import datetime
 import json
-from deepdiff import DeepDiff
+from json_compare import (ARRAY_MODES, JSON_ERRORS, ArrayAligner, ExclusionProfileStore, JsonDocumentCache,
+                          compare_json_deepdiff, compare_json_streams, compare_ndjson_streams)
+from fix_log_store import KEY_TAGS, FixLogCatalog
+from fix_parser import FixParseError, FixParser, diff_messages, field_names
+from enum_decode import EnumDecodeStore, read_rows
+from fix_replay import DEFAULT_EXCLUDED_TAGS, DEFAULT_KEY_TAGS, parse_tags, replay_diff
+from fixml_tag_index import load_tag_index
+from sourceExtractor import extract_batch, iter_csv_chunks
+from venue_analysis import VenueCatalog, VenueFileError, VenuePresenceIndex, ingest_venues
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.DEBUG)
@@ -138,6 +149,7 @@ def compare():
         'xml2': cleaned_xml2,
         'diff': diff
     }
+    decode_different_values(result, 'field')
 
     app.logger.debug("Sending response")
     return jsonify(result)
@@ -398,89 +410,24 @@ def cdo_json_comparison():
     return render_template('cdo_json_comparison.html')
 
 
-def get_all_paths(obj, parent_path=''):
-    """Recursively get all paths in a nested dictionary using dot notation"""
-    paths = []
-    if isinstance(obj, dict):
-        for key, value in obj.items():
-            current_path = f"{parent_path}.{key}" if parent_path else key
-            paths.append(current_path)
-            if isinstance(value, (dict, list)):
-                paths.extend(get_all_paths(value, current_path))
-    elif isinstance(obj, list):
-        for i, value in enumerate(obj):
-            current_path = f"{parent_path}[{i}]"
-            if isinstance(value, (dict, list)):
-                paths.extend(get_all_paths(value, current_path))
-    return paths
-
-
-def get_nested_value(obj, path):
-    """Get a value from a nested dictionary using dot notation"""
-    try:
-        current = obj
-        parts = path.split('.')
-        for part in parts:
-            if '[' in part:  # Handle array indices if present
-                key, index = part.split('[')
-                index = int(index.rstrip(']'))
-                current = current[key][index]
-            else:
-                current = current[part]
-        return current
-    except (KeyError, IndexError, TypeError):
-        return None
-
-
 @app.route('/compare_json', methods=['POST'])
 def compare_json():
     try:
         file1 = request.files['file1']
         file2 = request.files['file2']
 
-        json1 = json.loads(file1.read().decode('utf-8'))
-        json2 = json.loads(file2.read().decode('utf-8'))
-
-        # Compare the JSON structures
-        only_in_1 = []
-        only_in_2 = []
-        different_values = []
-
-        def flatten_json(obj, prefix=''):
-            items = {}
-            if isinstance(obj, dict):
-                for key, value in obj.items():
-                    new_key = f"{prefix}.{key}" if prefix else str(key)
-                    if isinstance(value, (dict, list)):
-                        items.update(flatten_json(value, new_key))
-                    else:
-                        items[new_key] = value
-            elif isinstance(obj, list):
-                for i, value in enumerate(obj):
-                    new_key = f"{prefix}[{i}]"
-                    if isinstance(value, (dict, list)):
-                        items.update(flatten_json(value, new_key))
-                    else:
-                        items[new_key] = value
-            return items
-
-        # Flatten both JSONs
-        flat_json1 = flatten_json(json1)
-        flat_json2 = flatten_json(json2)
-
-        # Find structural differences
-        only_in_1 = sorted(set(flat_json1.keys()) - set(flat_json2.keys()))
-        only_in_2 = sorted(set(flat_json2.keys()) - set(flat_json1.keys()))
-
-        # Compare values for common keys
-        common_keys = set(flat_json1.keys()) & set(flat_json2.keys())
-        for key in sorted(common_keys):
-            if flat_json1[key] != flat_json2[key]:
-                different_values.append({
-                    'path': key,
-                    'value1': flat_json1[key],
-                    'value2': flat_json2[key]
-                })
+        array_mode, array_keys, exclusions = get_json_compare_options()
+
+        if array_mode == 'deepdiff':
+            json1 = json.load(file1.stream)
+            json2 = json.load(file2.stream)
+            only_in_1, only_in_2, different_values = compare_json_deepdiff(json1, json2, exclusions)
+        else:
+            aligner = ArrayAligner(array_keys) if array_mode in ('key', 'hash') else None
+
+            # Flatten both JSONs into path-sorted streams and merge them in one pass
+            only_in_1, only_in_2, different_values = compare_json_streams(file1.stream, file2.stream,
+                                                                          aligner, exclusions)
 
         result = {
             'file1_name': os.path.splitext(file1.filename)[0],
@@ -489,16 +436,141 @@ def compare_json():
             'only_in_2': only_in_2,
             'different_values': different_values
         }
+        decode_different_values(result, 'path')
 
         return jsonify(result)
 
-    except json.JSONDecodeError as e:
+    except JSON_ERRORS as e:
         return jsonify({'error': f'Invalid JSON format: {str(e)}'}), 400
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         app.logger.error(f"Error in comparison: {str(e)}")  # Add logging
         return jsonify({'error': f'Comparison failed: {str(e)}'}), 500
 
 
+def get_json_compare_options():
+    """Read the array matching mode, identity keys and exclusion profile from the form"""
+    # How array elements are paired: by position, identity key, structural hash or DeepDiff
+    array_mode = request.form.get('array_mode', 'index')
+    array_keys = [key.strip() for key in request.form.get('array_key', '').split(',') if key.strip()]
+
+    if array_mode not in ARRAY_MODES:
+        raise ValueError(f'Unknown array mode: {array_mode}')
+    if array_mode == 'key' and not array_keys:
+        raise ValueError('An array key is required for key-based alignment')
+
+    # Excluded subtrees are skipped while flattening rather than filtered afterwards
+    exclusions = None
+    profile_name = request.form.get('exclusion_profile')
+    if profile_name:
+        exclusions = exclusion_profiles.compile(profile_name)
+        if exclusions is None:
+            raise ValueError(f'Unknown exclusion profile: {profile_name}')
+
+    return array_mode, array_keys, exclusions
+
+
+app.config.setdefault('NDJSON_WORKERS', 1)
+
+
+@app.route('/compare_ndjson', methods=['POST'])
+def compare_ndjson():
+    try:
+        file1 = request.files['file1']
+        file2 = request.files['file2']
+        id_path = request.form.get('id_path', '').strip()
+        # A request may ask for fewer worker processes than configured, never more
+        workers = app.config['NDJSON_WORKERS']
+        requested = request.form.get('workers', type=int)
+        if requested is not None:
+            workers = max(1, min(requested, workers))
+
+        if not id_path:
+            return jsonify({'error': 'An id path is required to match NDJSON records'}), 400
+
+        array_mode, array_keys, exclusions = get_json_compare_options()
+        if array_mode == 'deepdiff':
+            return jsonify({'error': 'DeepDiff matching is not available for NDJSON comparison'}), 400
+
+        app.logger.debug(f"NDJSON comparison of {file1.filename} and {file2.filename} keyed by {id_path}")
+
+        result = compare_ndjson_streams(file1.stream, file2.stream, id_path,
+                                        array_keys=array_keys if array_mode != 'index' else None,
+                                        exclusions=exclusions, workers=workers)
+
+        app.logger.debug(
+            f"NDJSON comparison completed. Matched: {result['matched']}, Different: {result['different']}, "
+            f"Missing: {result['missing_count']}, Extra: {result['extra_count']}")
+
+        result.update({
+            'file1_name': os.path.splitext(file1.filename)[0],
+            'file2_name': os.path.splitext(file2.filename)[0],
+            'id_path': id_path
+        })
+        return jsonify(result)
+
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        app.logger.error(f"Error in NDJSON comparison: {str(e)}")
+        return jsonify({'error': f'Comparison failed: {str(e)}'}), 500
+
+
+# Path indexes of uploaded JSON documents, built once per document
+app.config.setdefault('JSON_INDEX_CACHE_SIZE', 8)
+json_documents = JsonDocumentCache(app.config['JSON_INDEX_CACHE_SIZE'])
+
+
+@app.route('/json_documents', methods=['POST'])
+def upload_json_document():
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    file = request.files['file']
+    try:
+        document_id, index = json_documents.add(file.read())
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return jsonify({'error': f'Invalid JSON format: {str(e)}'}), 400
+
+    app.logger.debug(f"Indexed {file.filename}: {len(index)} paths")
+    return jsonify({
+        'document_id': document_id,
+        'file_name': os.path.splitext(file.filename)[0],
+        'path_count': len(index),
+        'leaf_count': index.leaf_count
+    })
+
+
+@app.route('/json_documents/<document_id>/paths', methods=['GET'])
+def json_document_paths(document_id):
+    index = json_documents.get(document_id)
+    if index is None:
+        return jsonify({'error': 'Unknown or expired document, please upload it again'}), 404
+
+    prefix = request.args.get('prefix', '')
+    limit = request.args.get('limit', 1000, type=int)
+    paths, total = index.paths_with_prefix(prefix, limit)
+
+    return jsonify({'paths': paths, 'total': total})
+
+
+@app.route('/json_documents/<document_id>/lookup', methods=['POST'])
+def json_document_lookup(document_id):
+    index = json_documents.get(document_id)
+    if index is None:
+        return jsonify({'error': 'Unknown or expired document, please upload it again'}), 404
+
+    data = request.json or {}
+    paths = data.get('paths')
+    if not isinstance(paths, list):
+        return jsonify({'error': 'paths must be a list of field paths'}), 400
+
+    values, missing = index.lookup(paths, full_values=bool(data.get('full_values')))
+
+    return jsonify({'values': values, 'missing': missing})
+
+
 @app.route('/check_static')
 def check_static():
     css_path = os.path.join(app.static_folder, 'css/cdo_json_comparison.css')
@@ -524,18 +596,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger('json_comparison')
 
+# Server-side exclusion profiles for the JSON comparison tool
+app.config.setdefault('EXCLUSION_PROFILES_PATH', os.path.join(app.root_path, 'exclusion_profiles.json'))
+exclusion_profiles = ExclusionProfileStore(app.config['EXCLUSION_PROFILES_PATH'])
+
 
 @app.route('/log_excluded_field', methods=['POST'])
 def log_excluded_field():
     data = request.json
     field_path = data.get('field_path')
     action = data.get('action')  # 'exclude' or 'include'
+    profile = data.get('profile')  # Optional profile to persist the change to
 
     if action == 'exclude':
         logger.info(f'Field excluded: {field_path}')
     else:
         logger.info(f'Field un-excluded: {field_path}')
 
+    if profile and field_path:
+        try:
+            exclusion_profiles.update_pattern(profile, field_path, exclude=(action == 'exclude'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+    return jsonify({'status': 'success'})
+
+
+@app.route('/exclusion_profiles', methods=['GET'])
+def list_exclusion_profiles():
+    return jsonify({'profiles': exclusion_profiles.list_profiles()})
+
+
+@app.route('/exclusion_profiles/<name>', methods=['GET'])
+def get_exclusion_profile(name):
+    profile = exclusion_profiles.get(name)
+    if profile is None:
+        return jsonify({'error': f'Unknown exclusion profile: {name}'}), 404
+    return jsonify({'name': name, **profile})
+
+
+@app.route('/exclusion_profiles/<name>', methods=['PUT'])
+def save_exclusion_profile(name):
+    data = request.json or {}
+    patterns = data.get('patterns')
+
+    if not isinstance(patterns, list):
+        return jsonify({'error': 'patterns must be a list of field paths'}), 400
+
+    try:
+        profile = exclusion_profiles.save(name, patterns)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    logger.info(f'Exclusion profile saved: {name} ({len(profile["patterns"])} patterns)')
+    return jsonify({'name': name, **profile})
+
+
+@app.route('/exclusion_profiles/<name>', methods=['DELETE'])
+def delete_exclusion_profile(name):
+    if not exclusion_profiles.delete(name):
+        return jsonify({'error': f'Unknown exclusion profile: {name}'}), 404
+    logger.info(f'Exclusion profile deleted: {name}')
     return jsonify({'status': 'success'})
 
 
@@ -574,6 +695,11 @@ def fix_message_comparison():
 
 
 # NEW FIXML Field Analysis Tool
+app.config.setdefault('FIXML_MAX_VENUES', 100)
+app.config.setdefault('VENUE_CATALOG_PATH', os.path.join(app.root_path, 'venue_catalog'))
+venue_catalog = VenueCatalog(app.config['VENUE_CATALOG_PATH'])
+
+
 @app.route('/fixml_field_analysis')
 def fixml_field_analysis():
     return send_from_directory('static', 'fixml_field_analysis.html')
@@ -588,12 +714,13 @@ def upload_fixml_venues():
         if num_venues < 2:
             return jsonify({'error': 'Minimum 2 venues required for comparison'}), 400
 
-        if num_venues > 10:  # Set a reasonable maximum
-            return jsonify({'error': 'Maximum 10 venues supported'}), 400
+        max_venues = app.config['FIXML_MAX_VENUES']
+        if num_venues > max_venues:
+            return jsonify({'error': f'Maximum {max_venues} venues supported'}), 400
 
         # Check if all required files are provided
-        venue_files = {}
-        venue_names = {}
+        venue_keys = []
+        venue_files = []
 
         for i in range(1, num_venues + 1):
             file_key = f'venue{i}'
@@ -604,155 +731,536 @@ def upload_fixml_venues():
                 venue_name = request.form.get(name_key, f'Venue {i}')
                 return jsonify({'error': f'{venue_name} file is required'}), 400
 
-            venue_files[file_key] = request.files[file_key]
-            venue_names[file_key] = request.form.get(name_key, f'Venue {i}')
+            venue_keys.append(file_key)
+            venue_files.append((request.form.get(name_key, f'Venue {i}'), request.files[file_key].read()))
 
-        # Process each CSV file
-        venue_data = {}
-        for venue_key, file in venue_files.items():
-            try:
-                df = pd.read_csv(file, keep_default_na=False)
-
-                # Validate required columns
-                required_columns = ['field_name', 'enumValues', 'Presence']
-                missing_columns = [col for col in required_columns if col not in df.columns]
-                if missing_columns:
-                    return jsonify({
-                        'error': f'Missing required columns in {venue_names[venue_key]}: {", ".join(missing_columns)}'
-                    }), 400
-
-                venue_data[venue_key] = {
-                    'name': venue_names[venue_key],
-                    'data': df.to_dict('records')
-                }
-            except Exception as e:
-                return jsonify({
-                    'error': f'Error processing {venue_names[venue_key]}: {str(e)}'
-                }), 400
-
-        # Analyze the data
-        analysis_result = analyze_fixml_venues(venue_data)
-
-        return jsonify(analysis_result)
+        # Parse and reduce every venue CSV concurrently, then merge in venue order
+        try:
+            partials = ingest_venues(venue_files)
+        except VenueFileError as e:
+            return jsonify({'error': str(e)}), 400
+
+        index = VenuePresenceIndex()
+        for venue_key, (venue_name, _), partial in zip(venue_keys, venue_files, partials):
+            index.add_venue(venue_key, venue_name, partial)
+
+        # The compact format uses a string table, integer ids and per-field venue bitmasks
+        if request.form.get('format') == 'compact':
+            result = index.to_compact_result()
+        else:
+            result = index.to_result()
+
+        if request.form.get('similarity'):
+            result['similarity'] = index.similarity()
+
+        return jsonify(result)
 
     except Exception as e:
         app.logger.error(f"Error in upload_fixml_venues: {str(e)}")
         return jsonify({'error': f'Analysis failed: {str(e)}'}), 500
 
 
-def analyze_fixml_venues(venue_data):
-    """Analyze FIXML venue data and create matrices"""
-
-    # Collect all unique field names
-    all_fields = set()
-    all_enum_values = set()
-    all_presence_values = set()
-
-    # Field presence matrix data
-    field_matrix = {}
-    enum_matrix = {}
-    presence_matrix = {}
-
-    venues = list(venue_data.keys())
-    venue_names = [venue_data[venue]['name'] for venue in venues]
-    num_venues = len(venues)
-
-    # First pass: collect all unique values
-    for venue_key, venue_info in venue_data.items():
-        for row in venue_info['data']:
-            field_name = row['field_name']
-            enum_values = str(row['enumValues']).strip() if row['enumValues'] else ''
-            presence = str(row['Presence']).strip() if row['Presence'] else ''
-
-            all_fields.add(field_name)
-            if enum_values and enum_values != 'nan':
-                # Split enum values if they contain multiple values
-                enum_list = [val.strip() for val in enum_values.split(',') if val.strip()]
-                all_enum_values.update(enum_list)
-            if presence and presence != 'nan':
-                all_presence_values.add(presence)
-
-    # Initialize matrices
-    for field in all_fields:
-        field_matrix[field] = {venue: False for venue in venues}
-
-    for enum_val in all_enum_values:
-        enum_matrix[enum_val] = {venue: [] for venue in venues}
-
-    for presence_val in all_presence_values:
-        presence_matrix[presence_val] = {venue: [] for venue in venues}
-
-    # Second pass: populate matrices
-    for venue_key, venue_info in venue_data.items():
-        for row in venue_info['data']:
-            field_name = row['field_name']
-            enum_values = str(row['enumValues']).strip() if row['enumValues'] else ''
-            presence = str(row['Presence']).strip() if row['Presence'] else ''
-
-            # Mark field as present in this venue
-            field_matrix[field_name][venue_key] = True
-
-            # Process enum values
-            if enum_values and enum_values != 'nan':
-                enum_list = [val.strip() for val in enum_values.split(',') if val.strip()]
-                for enum_val in enum_list:
-                    if enum_val in enum_matrix:
-                        enum_matrix[enum_val][venue_key].append(field_name)
-
-            # Process presence values
-            if presence and presence != 'nan':
-                if presence in presence_matrix:
-                    presence_matrix[presence][venue_key].append(field_name)
-
-    # Create summary statistics
-    field_stats = {}
-    for field in all_fields:
-        present_count = sum(1 for venue in venues if field_matrix[field][venue])
-        field_stats[field] = {
-            'present_in': present_count,
-            'venues': [venue_data[venue]['name'] for venue in venues if field_matrix[field][venue]]
-        }
+@app.route('/venue_catalog', methods=['GET'])
+def list_catalog_venues():
+    return jsonify({'venues': venue_catalog.list_venues(), 'max_venues': app.config['FIXML_MAX_VENUES']})
 
-    # Group fields by presence pattern
-    presence_patterns = defaultdict(list)
-    for field in all_fields:
-        pattern = tuple(field_matrix[field][venue] for venue in venues)
-        presence_patterns[pattern].append(field)
 
-    # Calculate dynamic summary statistics
-    fields_in_all_venues = len([f for f, stats in field_stats.items() if stats['present_in'] == num_venues])
-    fields_in_one_venue = len([f for f, stats in field_stats.items() if stats['present_in'] == 1])
-    fields_in_multiple_venues = len([f for f, stats in field_stats.items() if 1 < stats['present_in'] < num_venues])
+@app.route('/venue_catalog/<name>', methods=['GET'])
+def get_catalog_venue(name):
+    entry = venue_catalog.get(name)
+    if entry is None:
+        return jsonify({'error': f'Unknown venue: {name}'}), 404
+    return jsonify({'name': name, **entry})
+
+
+@app.route('/venue_catalog/<name>', methods=['POST'])
+def upload_catalog_venue(name):
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    file = request.files['file']
+    try:
+        version, created = venue_catalog.put(name, file.read(), file.filename)
+    except VenueFileError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if created:
+        logger.info(f'Venue catalog updated: {name} v{version["version"]}')
+    return jsonify({'name': name, 'created': created, **version})
+
+
+@app.route('/venue_catalog/<name>', methods=['DELETE'])
+def delete_catalog_venue(name):
+    if not venue_catalog.delete(name):
+        return jsonify({'error': f'Unknown venue: {name}'}), 404
+    logger.info(f'Venue catalog entry deleted: {name}')
+    return jsonify({'status': 'success'})
+
+
+@app.route('/analyze_venue_catalog', methods=['POST'])
+def analyze_venue_catalog():
+    """Run the venue analysis over catalogued venues, e.g. {"venues": ["A", "B"], "versions": {"A": 1}}"""
+    data = request.json or {}
+    error = validate_venue_selection(data.get('venues'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        result = venue_catalog.analyze(data['venues'], data.get('versions'), compact=data.get('format') == 'compact')
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(result)
+
+
+@app.route('/venue_similarity', methods=['POST'])
+def venue_similarity():
+    """Jaccard/overlap similarity and clustering of catalogued venues, e.g. {"venues": ["A", "B", "C"]}"""
+    data = request.json or {}
+    error = validate_venue_selection(data.get('venues'))
+    if error:
+        return jsonify({'error': error}), 400
+
+    try:
+        result = venue_catalog.similarity(data['venues'], data.get('versions'), method=data.get('method', 'average'))
+    except KeyError as e:
+        return jsonify({'error': e.args[0]}), 404
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify(result)
+
+
+def validate_venue_selection(names):
+    """Return an error message for an invalid list of catalogued venue names, else None"""
+    if not isinstance(names, list) or len(names) < 2:
+        return 'Minimum 2 venues required for comparison'
+
+    max_venues = app.config['FIXML_MAX_VENUES']
+    if len(names) > max_venues:
+        return f'Maximum {max_venues} venues supported'
+
+    if len(set(names)) != len(names):
+        return 'Each venue can only be selected once'
+    return None
+
 
-    return {
-        'success': True,
-        'venue_names': venue_names,
-        'venues': venues,
-        'num_venues': num_venues,
-        'total_fields': len(all_fields),
-        'total_enum_values': len(all_enum_values),
-        'total_presence_values': len(all_presence_values),
-        'field_matrix': field_matrix,
-        'enum_matrix': enum_matrix,
-        'presence_matrix': presence_matrix,
-        'field_stats': field_stats,
-        'presence_patterns': {
-            str(pattern): fields for pattern, fields in presence_patterns.items()
-        },
-        'summary': {
-            'fields_in_all_venues': fields_in_all_venues,
-            'fields_in_one_venue': fields_in_one_venue,
-            'fields_in_multiple_venues': fields_in_multiple_venues
-        }
-    }
 @app.route('/debug_fixml')
 def debug_fixml():
-    return render_template('debug_fixml_analysis.html')
+    return render_template('debug_fixml_analysis.html', max_venues=app.config['FIXML_MAX_VENUES'])
 
 @app.route('/fixml_to_fix_converter')
 def fixml_to_fix_converter():
     return send_from_directory('static', 'fixml_to_fix_converter.html')
 
 
+def load_fixml_converter_module():
+    """Import fixml-to-fix-converter.py (not importable by name) as fixml_to_fix_converter"""
+    module = sys.modules.get('fixml_to_fix_converter')
+    if module is None:
+        spec = importlib.util.spec_from_file_location(
+            'fixml_to_fix_converter', os.path.join(app.root_path, 'fixml-to-fix-converter.py'))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['fixml_to_fix_converter'] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+# One converter for the whole app, so requests never pay the dictionary load cost
+app.config.setdefault('FIX_VERSION', None)
+app.config.setdefault('FIXML_CONVERT_MAX_PATHS', 100000)
+fixml_converter_module = load_fixml_converter_module()
+fixml_converter = fixml_converter_module.FIXMLToFIXConverter(fix_version=app.config['FIX_VERSION'])
+
+
+CONVERTED_MIMETYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+
+@app.route('/convert_fixml_paths', methods=['POST'])
+def convert_fixml_paths():
+    """
+    Map FIXML paths to FIX tags with the shared converter.
+
+    Accepts JSON {"paths": [...]} or a CSV/Excel upload ('file', optional
+    'column').  Uploads can be returned as the converted file with
+    output=xlsx, csv or parquet; otherwise one result per row is returned as JSON.
+    """
+    max_paths = app.config['FIXML_CONVERT_MAX_PATHS']
+
+    if 'file' in request.files:
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({'error': 'No file selected'}), 400
+
+        try:
+            if file.filename.lower().endswith('.csv'):
+                df = pd.read_csv(file.stream)
+            else:
+                df = pd.read_excel(file.stream)
+        except Exception as e:
+            return jsonify({'error': f'Could not read {file.filename}: {str(e)}'}), 400
+
+        if len(df) > max_paths:
+            return jsonify({'error': f'Maximum {max_paths} paths per request'}), 400
+
+        column = request.form.get('column') or None
+        try:
+            fixml_converter.convert_dataframe(df, column)
+        except (KeyError, IndexError):
+            return jsonify({'error': f'Column not found: {column}'}), 400
+        column = column or df.columns[0]
+
+        output_format = request.form.get('output')
+        if output_format in fixml_converter_module.TABLE_WRITERS:
+            output = io.BytesIO()
+            writer = fixml_converter_module.TABLE_WRITERS[output_format](output)
+            writer.write(df)
+            writer.close()
+            output.seek(0)
+            download_name = f'{os.path.splitext(file.filename)[0]}_fix_tags.{output_format}'
+            return send_file(output, as_attachment=True, download_name=download_name,
+                             mimetype=CONVERTED_MIMETYPES[output_format])
+
+        paths = df[column]
+        tags = df['FIX_Tag']
+    else:
+        data = request.get_json(silent=True) or {}
+        paths = data.get('paths')
+        if not isinstance(paths, list):
+            return jsonify({'error': 'paths must be a list of FIXML paths'}), 400
+        if len(paths) > max_paths:
+            return jsonify({'error': f'Maximum {max_paths} paths per request'}), 400
+        paths = pd.Series(paths, dtype=object)
+        tags = fixml_converter.map_fixml_paths(paths)
+
+    dictionary = fixml_converter.dictionary
+    results = []
+    unmapped = 0
+    for path, tag in zip(paths.tolist(), tags.tolist()):
+        if isinstance(tag, int):
+            results.append({'path': path, 'tag': tag, 'name': dictionary.name(tag) if dictionary else None})
+        else:
+            # Unknown/Error messages from the converter
+            unmapped += 1
+            results.append({'path': None if pd.isna(path) else path, 'tag': None, 'message': tag})
+
+    return jsonify({
+        'fix_version': dictionary.version if dictionary else None,
+        'count': len(results),
+        'unmapped': unmapped,
+        'results': results
+    })
+
+
+# Server-side FIX tag=value parsing for the FIX message comparison page
+app.config.setdefault('FIX_PARSE_MAX_MESSAGES', 10000)
+fix_parser = FixParser(app.config['FIX_VERSION'])
+
+
+def parse_fix_text(text, delimiter):
+    """Parse posted FIX text, enforcing the message limit"""
+    if not isinstance(text, str) or not text.strip():
+        raise FixParseError('No FIX message provided')
+    messages = fix_parser.parse(text, delimiter)
+    max_messages = app.config['FIX_PARSE_MAX_MESSAGES']
+    if len(messages) > max_messages:
+        raise FixParseError(f'Maximum {max_messages} messages per request')
+    return messages
+
+
+@app.route('/parse_fix_messages', methods=['POST'])
+def parse_fix_messages():
+    """
+    Parse a FIX message or log into compact structures.
+
+    Expects JSON {"text": "...", "delimiter": optional}.  The delimiter (SOH,
+    "^A", "|" or any literal such as "^") is detected when omitted.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        messages = parse_fix_text(data.get('text'), data.get('delimiter'))
+    except FixParseError as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'count': len(messages),
+        'messages': [{'msg_type': message.msg_type, 'fields': message.fields} for message in messages],
+        'names': field_names(fix_parser.dictionary(), [message.fields for message in messages])
+    })
+
+
+@app.route('/compare_fix_messages', methods=['POST'])
+def compare_fix_messages():
+    """
+    Parse and diff FIX messages.
+
+    Expects JSON {"a": "...", "b": "...", "delimiter": optional}; when a and
+    b hold several messages they are compared pairwise in order.  A list of
+    pairs can be given instead as {"pairs": [["...", "..."], ...]}.
+    """
+    data = request.get_json(silent=True) or {}
+    delimiter = data.get('delimiter')
+    try:
+        if 'pairs' in data:
+            pairs = data['pairs']
+            if not isinstance(pairs, list) or not all(isinstance(pair, list) and len(pair) == 2 for pair in pairs):
+                return jsonify({'error': 'pairs must be a list of [a, b] messages'}), 400
+            if len(pairs) > app.config['FIX_PARSE_MAX_MESSAGES']:
+                return jsonify({'error': f"Maximum {app.config['FIX_PARSE_MAX_MESSAGES']} pairs per request"}), 400
+            messages_a, messages_b = [], []
+            for a, b in pairs:
+                messages_a.append(parse_fix_text(a, delimiter)[0])
+                messages_b.append(parse_fix_text(b, delimiter)[0])
+        else:
+            messages_a = parse_fix_text(data.get('a'), delimiter)
+            messages_b = parse_fix_text(data.get('b'), delimiter)
+    except FixParseError as e:
+        return jsonify({'error': str(e)}), 400
+
+    results = []
+    for a, b in zip(messages_a, messages_b):
+        results.append({
+            'a': {'msg_type': a.msg_type, 'fields': a.fields},
+            'b': {'msg_type': b.msg_type, 'fields': b.fields},
+            'diff': diff_messages(a.fields, b.fields)
+        })
+
+    return jsonify({
+        'count': len(results),
+        'unpaired': {'a': max(len(messages_a) - len(messages_b), 0), 'b': max(len(messages_b) - len(messages_a), 0)},
+        'results': results,
+        'names': field_names(fix_parser.dictionary(),
+                             [message.fields for message in messages_a + messages_b])
+    })
+
+
+# Indexed FIX session logs (see fix_log_store.py); logs are read from FIX_LOG_DIR
+app.config.setdefault('FIX_LOG_DIR', os.path.join(app.root_path, 'fix_logs'))
+app.config.setdefault('FIX_LOG_MAX_RESULTS', 1000)
+fix_logs = FixLogCatalog(app.config['FIX_LOG_DIR'])
+
+
+@app.route('/fix_logs', methods=['GET'])
+def list_fix_logs():
+    return jsonify({'logs': fix_logs.list_logs()})
+
+
+@app.route('/fix_logs/<name>', methods=['GET'])
+def fix_log_summary(name):
+    try:
+        return jsonify(fix_logs.get(name).summary())
+    except KeyError:
+        return jsonify({'error': f'Unknown FIX log: {name}'}), 404
+
+
+@app.route('/fix_logs/<name>/find', methods=['POST'])
+def find_fix_log_messages(name):
+    """
+    Find messages in an indexed log.
+
+    Expects JSON with any of msg_type, cl_ord_id, trade_report_id, trade_id,
+    start/end (SendingTime) and limit.  Only the matching messages are read.
+    """
+    data = request.get_json(silent=True) or {}
+    max_results = app.config['FIX_LOG_MAX_RESULTS']
+    try:
+        store = fix_logs.get(name)
+        limit = min(int(data.get('limit') or max_results), max_results)
+        keys = {key: data.get(key) for key in KEY_TAGS}
+        numbers = store.find(data.get('msg_type'), data.get('start'), data.get('end'), limit, **keys)
+    except KeyError:
+        return jsonify({'error': f'Unknown FIX log: {name}'}), 404
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    return jsonify({
+        'count': len(numbers),
+        'messages': [{
+            'number': number,
+            'msg_type': store.msg_type(number),
+            'sending_time': int(store.sending_times[number]),
+            'text': store.message(number)
+        } for number in numbers]
+    })
+
+
+@app.route('/compare_fix_log_messages', methods=['POST'])
+def compare_fix_log_messages():
+    """
+    Diff two messages of indexed logs.
+
+    Expects JSON {"a": {"log": name, "number": n}, "b": {"log": name, "number": n}}.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        selected = []
+        for side in ('a', 'b'):
+            spec = data.get(side) or {}
+            store = fix_logs.get(spec.get('log'))
+            number = int(spec.get('number'))
+            if not 0 <= number < len(store):
+                return jsonify({'error': f'Message {number} is not in {spec.get("log")}'}), 400
+            selected.append((store, number))
+    except KeyError as e:
+        return jsonify({'error': f'Unknown FIX log: {e.args[0]}'}), 404
+    except (TypeError, ValueError):
+        return jsonify({'error': 'a and b must each give a log and a message number'}), 400
+
+    (store_a, number_a), (store_b, number_b) = selected
+    parsed_a, parsed_b = store_a.parsed(number_a), store_b.parsed(number_b)
+    return jsonify({
+        'a': {'msg_type': parsed_a.msg_type, 'fields': parsed_a.fields},
+        'b': {'msg_type': parsed_b.msg_type, 'fields': parsed_b.fields},
+        'diff': diff_messages(parsed_a.fields, parsed_b.fields),
+        'names': field_names(fix_parser.dictionary(), [parsed_a.fields, parsed_b.fields])
+    })
+
+
+app.config.setdefault('FIX_REPLAY_WORKERS', 1)
+
+
+@app.route('/fix_log_replay_diff', methods=['POST'])
+def fix_log_replay_diff():
+    """
+    Align and diff two logs from FIX_LOG_DIR (e.g. UAT and production replays).
+
+    Expects JSON {"a": name, "b": name, "key": [tags], "exclude": [tags]};
+    key defaults to ClOrdID and exclude to the volatile session tags.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        log_a, log_b = fix_logs.path(data.get('a')), fix_logs.path(data.get('b'))
+    except KeyError as e:
+        return jsonify({'error': f'Unknown FIX log: {e.args[0]}'}), 404
+    try:
+        key_tags = parse_tags(data.get('key') or DEFAULT_KEY_TAGS)
+        exclude = parse_tags(data['exclude']) if data.get('exclude') is not None else DEFAULT_EXCLUDED_TAGS
+    except (TypeError, ValueError):
+        return jsonify({'error': 'key and exclude must be lists of tag numbers'}), 400
+
+    result = replay_diff(log_a, log_b, key_tags, exclude, app.config['FIX_REPLAY_WORKERS'],
+                         fix_version=app.config['FIX_VERSION'])
+    return jsonify(result)
+
+
+app.config.setdefault('FIXML_MAPPING_SPREADSHEETS', [os.path.join(app.root_path, 'fixml.xlsx')])
+app.config.setdefault('FIXML_TAG_QUERY_MAX', 10000)
+
+
+@app.route('/fixml_tag_paths', methods=['GET', 'POST'])
+def fixml_tag_paths():
+    """
+    Look up the FIXML paths that carry FIX tags, from the schema and the
+    FIXML_MAPPING_SPREADSHEETS.
+
+    Expects JSON {"tags": [448, "PartyRole", ...]} or repeated ?tag= query
+    parameters; returns one result per tag, in order.
+    """
+    if request.method == 'POST':
+        queries = (request.get_json(silent=True) or {}).get('tags')
+    else:
+        queries = request.args.getlist('tag')
+    if not queries or not isinstance(queries, list):
+        return jsonify({'error': 'tags must be a non-empty list of tag numbers or field names'}), 400
+    if len(queries) > app.config['FIXML_TAG_QUERY_MAX']:
+        return jsonify({'error': f"Maximum {app.config['FIXML_TAG_QUERY_MAX']} tags per request"}), 400
+
+    index = load_tag_index(app.config['FIX_VERSION'], app.config['FIXML_MAPPING_SPREADSHEETS'],
+                           mapper=fixml_converter.map_fixml_to_fix_tag, resolver=fixml_converter.path_resolver)
+    return jsonify({'results': index.lookup(queries), 'unmapped': index.data['unmapped']})
+
+
+app.config.setdefault('SOURCE_EXTRACTOR_WORKERS', 1)
+
+
+@app.route('/extract_report_fields', methods=['POST'])
+def extract_report_fields():
+    """
+    Extract Report field enums and shortcodes from uploaded metadata exports.
+
+    Accepts one or more uploads as 'files' (or a single 'file') and streams
+    back one merged CSV with a Source column naming each row's export.
+    """
+    uploads = [file for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+    if not uploads:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    sources = [(file.filename, file.read()) for file in uploads]
+    results = extract_batch(sources, app.config['SOURCE_EXTRACTOR_WORKERS'])
+    download_name = (f'{os.path.splitext(uploads[0].filename)[0]}_report_fields.csv' if len(uploads) == 1
+                     else 'report_fields.csv')
+    return Response(stream_with_context(iter_csv_chunks(results)), mimetype='text/csv',
+                    headers={'Content-Disposition': f'attachment; filename={download_name}'})
+
+
+# Enum/shortcode labels for differing values, compiled from sourceExtractor output
+app.config.setdefault('ENUM_DECODE_INDEX_PATH', os.path.join(app.root_path, 'enum_decode_index.pickle'))
+app.config.setdefault('ENUM_DECODE_SOURCES', [])
+enum_decodes = EnumDecodeStore(app.config['ENUM_DECODE_INDEX_PATH'])
+
+
+def get_decode_index():
+    """The decode index: built from ENUM_DECODE_SOURCES if configured, else the last uploaded one"""
+    if app.config['ENUM_DECODE_SOURCES']:
+        try:
+            return enum_decodes.build(app.config['ENUM_DECODE_SOURCES'])
+        except (OSError, ValueError) as e:
+            app.logger.error(f'Could not build the enum decode index from ENUM_DECODE_SOURCES: {e}')
+            return None
+    return enum_decodes.get()
+
+
+def decode_different_values(result, path_key):
+    """Label the result's differing enum codes when the request asks for decode"""
+    if request.form.get('decode', '').lower() not in ('1', 'true', 'on', 'yes'):
+        return
+    index = get_decode_index()
+    result['decoded'] = index.annotate(result['different_values'], path_key) if index is not None else None
+
+
+@app.route('/enum_decode_index', methods=['GET', 'POST'])
+def enum_decode_index():
+    """
+    Show the enum decode index, or replace it with uploaded sourceExtractor
+    CSV/Parquet output or raw metadata exports ('files').
+
+    When ENUM_DECODE_SOURCES is configured the index is always built from
+    those sources, so uploads are refused.
+    """
+    if request.method == 'GET':
+        index = get_decode_index()
+        if index is None:
+            return jsonify({'error': 'No enum decode index has been built'}), 404
+        return jsonify(index.summary())
+
+    if app.config['ENUM_DECODE_SOURCES']:
+        return jsonify({'error': 'The enum decode index is built from ENUM_DECODE_SOURCES; '
+                                 'update those files instead of uploading'}), 409
+
+    uploads = [file for file in request.files.getlist('files') + request.files.getlist('file') if file.filename]
+    if not uploads:
+        return jsonify({'error': 'No file uploaded'}), 400
+
+    rows = []
+    with tempfile.TemporaryDirectory() as directory:
+        for number, file in enumerate(uploads):
+            os.makedirs(os.path.join(directory, str(number)))
+            path = os.path.join(directory, str(number), os.path.basename(file.filename))
+            file.save(path)
+            try:
+                rows.extend(read_rows(path))
+            except (ValueError, OSError) as e:
+                return jsonify({'error': f'Could not read {file.filename}: {str(e)}'}), 400
+
+    index = enum_decodes.replace(rows, [file.filename for file in uploads])
+    return jsonify(index.summary())
+
+
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
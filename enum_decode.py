@@ -0,0 +1,311 @@
+"""
+Decoding of raw enum codes in comparison results.
+
+The Field/Enum/Shortcode rows produced by ``sourceExtractor`` are compiled
+into an index from field key and code (Shortcode) to label (Enum).  A field
+key is the lower-cased name segments of a path with array positions removed,
+so ``Report.Side``, ``TrdCaptRpt/@Side`` and ``trades[3].side`` all end in
+``side``.  Every suffix of a field's key is indexed (unless two fields with
+different codes share it), and lookups are memoised per field key, so all
+``trades[n].side`` paths share one entry.
+
+The compiled index is pickled and reused until its source files change::
+
+    python enum_decode.py build report_fields.csv exports/ --index enum_decode_index.pickle
+    python enum_decode.py decode TrdCaptRpt/@Side 1 2
+"""
+import argparse
+import csv
+import logging
+import os
+import pickle
+import re
+import sys
+import threading
+
+import pandas as pd
+
+from sourceExtractor import FIELDNAMES, expand_inputs, extract_report_file
+
+logger = logging.getLogger(__name__)
+
+# Bump when the pickled layout changes so stale indexes are rebuilt
+INDEX_VERSION = 1
+
+DEFAULT_INDEX_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'enum_decode_index.pickle')
+
+# Marks a key suffix shared by fields with different codes
+_AMBIGUOUS = object()
+
+_POSITIONS = re.compile(r'\[[^\]]*\]')
+_SEPARATORS = re.compile(r'[./@]+')
+
+
+def field_key(path):
+    """('trdcaptrpt', 'side') for 'TrdCaptRpt/@Side'; array positions and labels are dropped"""
+    return tuple(segment.lower() for segment in _SEPARATORS.split(_POSITIONS.sub('', str(path))) if segment)
+
+
+def code_text(value):
+    """A compared value as the code it would be written as in the extractor output"""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _source_stamp(paths):
+    return [[os.path.abspath(path), os.path.getsize(path), os.stat(path).st_mtime_ns] for path in paths]
+
+
+def read_rows(path):
+    """
+    Field/Enum/Shortcode rows from an extractor CSV or Parquet file, or
+    extracted from a metadata export (any other file).
+
+    Raises:
+        ValueError: If a CSV or Parquet file lacks the Field/Enum/Shortcode columns
+    """
+    lower = path.lower()
+    if lower.endswith('.parquet'):
+        df = pd.read_parquet(path)
+    elif lower.endswith('.csv'):
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')
+    else:
+        return [(row['Field'], row['Enum'], row['Shortcode']) for row in extract_report_file(path)]
+
+    missing = [name for name in FIELDNAMES if name not in df.columns]
+    if missing:
+        raise ValueError(f"{os.path.basename(path)} has no {', '.join(missing)} column")
+    df = df[FIELDNAMES].fillna('').astype(str)
+    return list(df.itertuples(index=False, name=None))
+
+
+class EnumDecodeIndex:
+    """
+    Code -> label lookups per field.
+
+    Args:
+        fields (dict): Field key tuple -> {code: label}
+        sources (list): Description of what the index was built from
+    """
+
+    # Memoised field keys kept before the memo is reset
+    MAX_MEMO_SIZE = 10000
+
+    def __init__(self, fields, sources=()):
+        self.fields = fields
+        self.sources = list(sources)
+        self._keys = {}
+        for key in sorted(fields, key=len, reverse=True):
+            codes = fields[key]
+            self._keys[key] = codes
+            for start in range(1, len(key)):
+                suffix = key[start:]
+                if suffix in fields:
+                    continue
+                existing = self._keys.get(suffix)
+                if existing is None:
+                    self._keys[suffix] = codes
+                elif existing is not codes and existing != codes:
+                    self._keys[suffix] = _AMBIGUOUS
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows, sources=()):
+        """Compile (Field, Enum, Shortcode) rows; rows without a shortcode have nothing to decode"""
+        fields = {}
+        for field, enum, shortcode in rows:
+            if not field or not shortcode or not enum:
+                continue
+            fields.setdefault(field_key(field), {}).setdefault(str(shortcode).strip(), str(enum))
+        return cls(fields, sources)
+
+    def __len__(self):
+        return len(self.fields)
+
+    @property
+    def code_count(self):
+        return sum(len(codes) for codes in self.fields.values())
+
+    def codes(self, path):
+        """The {code: label} map for a comparison path, or None"""
+        key = field_key(path)
+        try:
+            return self._memo[key]
+        except KeyError:
+            pass
+        codes = None
+        for start in range(len(key)):
+            candidate = self._keys.get(key[start:])
+            if candidate is not None and candidate is not _AMBIGUOUS:
+                codes = candidate
+                break
+        with self._lock:
+            if len(self._memo) >= self.MAX_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[key] = codes
+        return codes
+
+    @staticmethod
+    def _label(codes, value):
+        if not codes or value is None or isinstance(value, (dict, list)):
+            return None
+        return codes.get(code_text(value))
+
+    def decode(self, path, value):
+        """Label of ``value`` at ``path``, or None"""
+        return self._label(self.codes(path), value)
+
+    def annotate(self, items, path_key='path'):
+        """
+        Add ``label1``/``label2`` to differing-value dicts whose codes decode.
+
+        Args:
+            items: Dicts with ``path_key``, ``value1`` and ``value2``
+            path_key (str): Key holding the field path
+
+        Returns:
+            int: Number of items annotated
+        """
+        annotated = 0
+        for item in items:
+            codes = self.codes(item.get(path_key))
+            if codes is None:
+                continue
+            label1, label2 = self._label(codes, item.get('value1')), self._label(codes, item.get('value2'))
+            if label1 is not None:
+                item['label1'] = label1
+            if label2 is not None:
+                item['label2'] = label2
+            if label1 is not None or label2 is not None:
+                annotated += 1
+        return annotated
+
+    def summary(self):
+        return {'fields': len(self), 'codes': self.code_count, 'sources': self.sources}
+
+
+class EnumDecodeStore:
+    """
+    The persisted decode index, shared between requests.
+
+    Args:
+        index_path (str): Pickle file the compiled index is kept in
+    """
+
+    def __init__(self, index_path=DEFAULT_INDEX_PATH):
+        self.index_path = index_path
+        self._index = None
+        self._stamp = None
+        self._source = None  # Stamp of the files the loaded index was built from
+        self._lock = threading.Lock()
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'rb') as file:
+                compiled = pickle.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, pickle.UnpicklingError, EOFError) as e:
+            logger.warning(f'Ignoring unreadable enum decode index {self.index_path}: {e}')
+            return None
+        if compiled.get('index_version') != INDEX_VERSION:
+            return None
+        return compiled
+
+    def _save(self, compiled):
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        os.makedirs(directory, exist_ok=True)
+        temp_path = f'{self.index_path}.tmp'
+        with open(temp_path, 'wb') as file:
+            pickle.dump(compiled, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.index_path)
+
+    def _current(self):
+        # Callers hold self._lock
+        try:
+            stamp = os.stat(self.index_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if self._index is None or stamp != self._stamp:
+            compiled = self._load()
+            if compiled is None:
+                return None
+            self._index = EnumDecodeIndex(compiled['fields'], compiled['sources'])
+            self._stamp = stamp
+            self._source = compiled.get('source')
+        return self._index
+
+    def get(self):
+        """The persisted index (reloaded when the file changes), or None if there is none"""
+        with self._lock:
+            return self._current()
+
+    def replace(self, rows, sources, source_stamp=None):
+        """Compile ``rows``, persist them as the index and return it"""
+        index = EnumDecodeIndex.from_rows(rows, sources)
+        with self._lock:
+            self._save({'index_version': INDEX_VERSION, 'source': source_stamp, 'sources': index.sources,
+                        'fields': index.fields})
+            self._index = index
+            self._stamp = os.stat(self.index_path).st_mtime_ns
+            self._source = source_stamp
+        logger.info(f'Compiled {index.code_count} codes for {len(index)} fields -> {self.index_path}')
+        return index
+
+    def build(self, inputs, rebuild=False):
+        """
+        The index of extractor outputs or exports named by ``inputs`` (files,
+        directories or globs), recompiled only when one of them changed.
+        """
+        paths = expand_inputs(inputs)
+        stamp = _source_stamp(paths)
+        if not rebuild:
+            with self._lock:
+                index = self._current()
+                if index is not None and self._source == stamp:
+                    return index
+
+        rows = []
+        for path in paths:
+            rows.extend(read_rows(path))
+        return self.replace(rows, [os.path.basename(path) for path in paths], stamp)
+
+
+def main():
+    """
+    Command-line interface: compile the decode index, or decode codes with it.
+    """
+    parser = argparse.ArgumentParser(description='Compile and query the enum/shortcode decode index')
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH, help='Index file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = commands.add_parser('build', help='Compile extractor CSV/Parquet output or metadata exports')
+    build_parser.add_argument('inputs', nargs='+', help='Files, directories or glob patterns')
+    build_parser.add_argument('--rebuild', action='store_true', help='Recompile even if the sources are unchanged')
+
+    decode_parser = commands.add_parser('decode', help='Decode codes of one field path')
+    decode_parser.add_argument('path', help='Field path as shown in comparison results, e.g. TrdCaptRpt/@Side')
+    decode_parser.add_argument('codes', nargs='+', help='Codes to decode')
+
+    args = parser.parse_args()
+    store = EnumDecodeStore(args.index)
+
+    if args.command == 'build':
+        index = store.build(args.inputs, args.rebuild)
+        print(f"{index.code_count} codes for {len(index)} fields from {len(index.sources)} files -> {args.index}")
+    elif args.command == 'decode':
+        index = store.get()
+        if index is None:
+            parser.error(f'No decode index at {args.index}; run the build command first')
+        writer = csv.writer(sys.stdout, delimiter='\t')
+        for code in args.codes:
+            writer.writerow([args.path, code, index.decode(args.path, code) or ''])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
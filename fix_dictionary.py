@@ -0,0 +1,282 @@
+"""
+Compiled FIX data dictionaries.
+
+The FIX specification is read from the QuickFIX XML dictionaries bundled in
+``fix_spec/`` and compiled once into a pickled cache, so loading a dictionary
+takes milliseconds and needs no network access.  The cache is rebuilt
+automatically when the source XML changes, or explicitly with::
+
+    python fix_dictionary.py --rebuild [--version FIX.4.4]
+
+This product includes software developed by quickfixengine.org
+(http://www.quickfixengine.org/) - see fix_spec/LICENSE.quickfix.
+"""
+import argparse
+import logging
+import os
+import pickle
+import re
+import threading
+import xml.etree.ElementTree as ET
+
+logger = logging.getLogger(__name__)
+
+FIX_SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fix_spec')
+DEFAULT_CACHE_DIR = os.path.join(FIX_SPEC_DIR, 'compiled')
+
+# Source XML files per FIX version; the FIXT transport file supplies the
+# session header, trailer and admin messages for FIX 5.0 and later
+FIX_VERSIONS = {
+    'FIX.4.4': ('FIX44.xml',),
+    'FIX.5.0SP2': ('FIX50SP2.xml', 'FIXT11.xml'),
+}
+DEFAULT_FIX_VERSION = 'FIX.5.0SP2'
+
+# Bump when the compiled layout changes so stale caches are rebuilt
+CACHE_VERSION = 1
+
+# Member kinds in compiled message / component / group layouts
+FIELD, GROUP, COMPONENT = 'F', 'G', 'C'
+
+_dictionaries = {}
+_dictionaries_lock = threading.Lock()
+
+
+def name_variants(name):
+    """The lookup keys a field name is registered under (as the converter expects)"""
+    stripped = re.sub(r'[^a-zA-Z0-9]', '', name)
+    return (name, name.lower(), stripped, stripped.lower())
+
+
+def _compile_members(element, field_tags):
+    """Compile the children of a message/component/group into member tuples"""
+    members = []
+    for child in element:
+        required = child.get('required') == 'Y'
+        if child.tag == 'field':
+            members.append((FIELD, field_tags[child.get('name')], required))
+        elif child.tag == 'group':
+            members.append((GROUP, field_tags[child.get('name')], required, _compile_members(child, field_tags)))
+        elif child.tag == 'component':
+            members.append((COMPONENT, child.get('name'), required))
+    return tuple(members)
+
+
+def _source_stamp(paths):
+    return [(os.path.basename(path), os.path.getsize(path), os.stat(path).st_mtime_ns) for path in paths]
+
+
+def compile_dictionary(version, spec_dir=FIX_SPEC_DIR):
+    """
+    Compile the XML dictionaries for ``version`` into a plain, picklable dict.
+
+    Raises:
+        ValueError: If the FIX version is not supported
+    """
+    if version not in FIX_VERSIONS:
+        raise ValueError(f'Unsupported FIX version {version}; choose one of {", ".join(FIX_VERSIONS)}')
+
+    paths = [os.path.join(spec_dir, name) for name in FIX_VERSIONS[version]]
+    roots = [ET.parse(path).getroot() for path in paths]
+
+    fields = {}
+    field_tags = {}
+    for root in roots:
+        for field in root.iterfind('fields/field'):
+            tag = int(field.get('number'))
+            values = {value.get('enum'): value.get('description') for value in field.iterfind('value')}
+            fields[tag] = (field.get('name'), field.get('type'), values)
+            field_tags[field.get('name')] = tag
+
+    components = {}
+    messages = {}
+    header = trailer = ()
+    for root in roots:
+        for component in root.iterfind('components/component'):
+            components[component.get('name')] = _compile_members(component, field_tags)
+        for message in root.iterfind('messages/message'):
+            messages[message.get('msgtype')] = (
+                message.get('name'), message.get('msgcat'), _compile_members(message, field_tags))
+        # The application dictionary of FIX 5.0+ has an empty header
+        header = header or _compile_members(root.find('header'), field_tags)
+        trailer = trailer or _compile_members(root.find('trailer'), field_tags)
+
+    lookup = {}
+    for tag, (name, _, _) in fields.items():
+        for variant in name_variants(name):
+            lookup[variant] = tag
+
+    return {
+        'cache_version': CACHE_VERSION,
+        'version': version,
+        'source': _source_stamp(paths),
+        'fields': fields,
+        'lookup': lookup,
+        'components': components,
+        'messages': messages,
+        'header': header,
+        'trailer': trailer,
+    }
+
+
+def _cache_path(version, cache_dir):
+    return os.path.join(cache_dir, f'{version}.v{CACHE_VERSION}.pickle')
+
+
+def rebuild_cache(version, spec_dir=FIX_SPEC_DIR, cache_dir=DEFAULT_CACHE_DIR):
+    """Compile ``version`` and write its cache file, returning the compiled dict"""
+    compiled = compile_dictionary(version, spec_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    path = _cache_path(version, cache_dir)
+    temp_path = f'{path}.tmp'
+    with open(temp_path, 'wb') as file:
+        pickle.dump(compiled, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, path)
+    logger.info(f'Compiled {version} dictionary: {len(compiled["fields"])} fields, '
+                f'{len(compiled["messages"])} messages -> {path}')
+    return compiled
+
+
+def _is_current(compiled, version, spec_dir):
+    if compiled.get('cache_version') != CACHE_VERSION or compiled.get('version') != version:
+        return False
+    paths = [os.path.join(spec_dir, name) for name in FIX_VERSIONS[version]]
+    if not all(os.path.exists(path) for path in paths):
+        return True  # Cache shipped without the XML sources
+    return compiled['source'] == _source_stamp(paths)
+
+
+def load_dictionary(version=None, spec_dir=FIX_SPEC_DIR, cache_dir=None, rebuild=False):
+    """
+    Return the compiled ``FixDictionary`` for a FIX version.
+
+    The compiled cache is used when it is current and rebuilt from the bundled
+    XML otherwise.  Dictionaries are shared per version within the process.
+
+    Args:
+        version (str): FIX version, defaults to the FIX_VERSION environment
+            variable or ``DEFAULT_FIX_VERSION``
+        spec_dir (str): Directory holding the QuickFIX XML files
+        cache_dir (str): Directory for compiled caches
+        rebuild (bool): Recompile even if the cache is current
+
+    Raises:
+        ValueError: If the FIX version is not supported
+    """
+    version = version or os.environ.get('FIX_VERSION') or DEFAULT_FIX_VERSION
+    if version not in FIX_VERSIONS:
+        raise ValueError(f'Unsupported FIX version {version}; choose one of {", ".join(FIX_VERSIONS)}')
+    cache_dir = cache_dir or os.environ.get('FIX_DICTIONARY_CACHE') or DEFAULT_CACHE_DIR
+
+    with _dictionaries_lock:
+        key = (version, spec_dir, cache_dir)
+        if not rebuild and key in _dictionaries:
+            return _dictionaries[key]
+
+        compiled = None
+        path = _cache_path(version, cache_dir)
+        if not rebuild and os.path.exists(path):
+            try:
+                with open(path, 'rb') as file:
+                    compiled = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                logger.warning(f'Ignoring unreadable FIX dictionary cache {path}: {e}')
+            if compiled is not None and not _is_current(compiled, version, spec_dir):
+                compiled = None
+
+        if compiled is None:
+            compiled = rebuild_cache(version, spec_dir, cache_dir)
+
+        dictionary = _dictionaries[key] = FixDictionary(compiled)
+        return dictionary
+
+
+class FixDictionary:
+    """
+    One compiled FIX version: fields by tag, name lookups, enum descriptions
+    and message / component / repeating-group layouts.
+
+    Layouts are tuples of members: ``(FIELD, tag, required)``,
+    ``(GROUP, count_tag, required, members)`` or ``(COMPONENT, name, required)``.
+    """
+
+    def __init__(self, compiled):
+        self.version = compiled['version']
+        self.fields = compiled['fields']
+        self.lookup = compiled['lookup']
+        self.components = compiled['components']
+        self.messages = compiled['messages']
+        self.header = compiled['header']
+        self.trailer = compiled['trailer']
+
+    def __repr__(self):
+        return f'<FixDictionary {self.version}: {len(self.fields)} fields, {len(self.messages)} messages>'
+
+    def tag(self, name):
+        """Tag number for a field name (case and punctuation insensitive), or None"""
+        tag = self.lookup.get(name)
+        if tag is None:
+            for variant in name_variants(name)[1:]:
+                tag = self.lookup.get(variant)
+                if tag is not None:
+                    break
+        return tag
+
+    def name(self, tag):
+        field = self.fields.get(int(tag))
+        return field[0] if field else None
+
+    def field_type(self, tag):
+        field = self.fields.get(int(tag))
+        return field[1] if field else None
+
+    def enum_description(self, tag, value):
+        field = self.fields.get(int(tag))
+        return field[2].get(value) if field else None
+
+    def message(self, msg_type):
+        """(name, category, members) for a MsgType, or None"""
+        return self.messages.get(msg_type)
+
+    def message_type(self, name):
+        """MsgType for a message name such as 'TradeCaptureReport', or None"""
+        for msg_type, (message_name, _, _) in self.messages.items():
+            if message_name == name:
+                return msg_type
+        return None
+
+    def expand(self, members):
+        """Inline components, returning only field and group members"""
+        expanded = []
+        for member in members:
+            if member[0] == COMPONENT:
+                expanded.extend(self.expand(self.components[member[1]]))
+            elif member[0] == GROUP:
+                expanded.append((GROUP, member[1], member[2], tuple(self.expand(member[3]))))
+            else:
+                expanded.append(member)
+        return tuple(expanded)
+
+
+def main():
+    """
+    Command-line interface for compiling the dictionary caches.
+    """
+    parser = argparse.ArgumentParser(description='Compile the bundled FIX dictionaries')
+    parser.add_argument('--version', choices=sorted(FIX_VERSIONS), action='append',
+                        help='FIX version to compile (repeatable, default: all)')
+    parser.add_argument('--rebuild', action='store_true', help='Recompile even if the cache is current')
+    parser.add_argument('--spec-dir', default=FIX_SPEC_DIR, help='Directory holding the QuickFIX XML files')
+    parser.add_argument('--cache-dir', default=None, help='Directory for the compiled caches')
+
+    args = parser.parse_args()
+
+    for version in args.version or sorted(FIX_VERSIONS):
+        dictionary = load_dictionary(version, args.spec_dir, args.cache_dir, rebuild=args.rebuild)
+        print(f'{dictionary.version}: {len(dictionary.fields)} fields, {len(dictionary.messages)} messages, '
+              f'{len(dictionary.components)} components')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,268 @@
+"""
+Bulk FIXML-versus-FIX equivalence checking.
+
+Trades delivered both as FIXML ``TrdCaptRpt`` messages and as FIX 35=AE
+messages are joined by a trade key (TradeID(1003) by default), the FIXML side
+is converted to tags with the compiled FIX dictionary and FIXML schema trie
+the converter uses, and field values are compared after nesting repeating
+groups.  Numeric fields are compared by value, so ``130.5`` equals
+``130.50``.
+
+The FIX log is opened through its sidecar index (see ``fix_log_store``), so
+each FIXML trade reads just its partner's bytes; conversion and comparison
+run in batches, optionally across worker processes::
+
+    python fix_equivalence.py trades.xml session.log --key trade_id --workers 4
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal, InvalidOperation
+from xml.sax.saxutils import unescape
+
+from fix_dictionary import load_dictionary
+from fix_log_store import KEY_TAGS, FixLogStore
+from fix_parser import FixParser, diff_messages
+from fix_replay import DEFAULT_EXCLUDED_TAGS, ReplayReport, parse_tags
+from fixml_messages import FixmlMessageEngine, iter_fixml_messages
+
+logger = logging.getLogger(__name__)
+
+# Header fields that legitimately differ between the two channels
+DEFAULT_EQUIVALENCE_EXCLUDED_TAGS = DEFAULT_EXCLUDED_TAGS + (49, 56, 1128)
+
+# FIX types compared as numbers
+NUMERIC_TYPES = {'PRICE', 'PRICEOFFSET', 'QTY', 'FLOAT', 'AMT', 'PERCENTAGE', 'INT', 'LENGTH', 'NUMINGROUP',
+                 'SEQNUM'}
+
+FIXML_MESSAGE = 'TrdCaptRpt'
+FIX_MSG_TYPE = 'AE'
+BATCH_SIZE = 200
+
+
+def canonical_value(field_type, value):
+    """Comparable form of a value: numbers normalised, everything else as-is"""
+    if field_type in NUMERIC_TYPES:
+        try:
+            number = Decimal(value)
+        except InvalidOperation:
+            return value
+        return format(number.normalize(), 'f') if number else '0'
+    return value
+
+
+class EquivalenceChecker:
+    """
+    Converts FIXML trades and compares them with their FIX counterparts.
+
+    Args:
+        fix_version (str): Dictionary version, as loaded by ``load_dictionary``
+        exclude: Tags dropped from both sides before comparing
+        engine (FixmlMessageEngine): Engine to reuse, e.g. one built on a
+            converter's dictionary and path resolver
+    """
+
+    def __init__(self, fix_version=None, exclude=DEFAULT_EQUIVALENCE_EXCLUDED_TAGS, engine=None):
+        self.engine = engine or FixmlMessageEngine(load_dictionary(fix_version))
+        self.dictionary = self.engine.dictionary
+        self.parser = FixParser(self.dictionary.version)
+        self.excluded = set(exclude)
+        self._types = {tag: field[1] for tag, field in self.dictionary.fields.items() if field[1] in NUMERIC_TYPES}
+
+    def _entries(self, fields):
+        types = self._types
+        kept = [(tag, canonical_value(types.get(tag), value)) for tag, value in fields if tag not in self.excluded]
+        return self.parser.structure(kept).fields
+
+    def compare(self, fixml, fix_message, delimiter):
+        """
+        Diff one FIXML message (text) with one FIX message (text).
+
+        Returns:
+            dict: Changed fields, as ``fix_parser.diff_messages(..., changes_only=True)``; FIXML is side a
+        """
+        converted = self.engine.convert_string(fixml)
+        fix_fields = self.parser.split_messages(fix_message, delimiter)[0]
+        return diff_messages(self._entries(converted.fields), self._entries(fix_fields), ignore=(),
+                             changes_only=True)
+
+    def compare_batch(self, pairs, delimiter):
+        """(key, diff) for each (key, FIXML text, FIX text) pair; unparsable pairs give (key, error)"""
+        results = []
+        for key, fixml, fix_message in pairs:
+            try:
+                results.append((key, self.compare(fixml, fix_message, delimiter)))
+            except ValueError as e:  # Includes XML parse errors
+                results.append((key, str(e)))
+        return results
+
+
+_worker_checker = None
+
+
+def _init_worker(fix_version, exclude):
+    global _worker_checker
+    _worker_checker = EquivalenceChecker(fix_version, exclude)
+
+
+def _compare_batch(pairs, delimiter):
+    return _worker_checker.compare_batch(pairs, delimiter)
+
+
+def _key_pattern(engine, key_tag):
+    """Regex reading the key attribute from a TrdCaptRpt start tag"""
+    root = engine.resolver.roots[FIXML_MESSAGE]
+    attribute = next((abbr for abbr, tag in root.attributes.items() if tag == key_tag), None)
+    if attribute is None:
+        raise ValueError(f'Tag {key_tag} is not an attribute of {FIXML_MESSAGE}')
+    return re.compile(rf'\s{re.escape(attribute)}\s*=\s*(["\'])(.*?)\1', re.DOTALL)
+
+
+def check_equivalence(fixml_file, fix_log, key='trade_id', exclude=DEFAULT_EQUIVALENCE_EXCLUDED_TAGS,
+                      workers=1, batch_size=BATCH_SIZE, fix_version=None, engine=None):
+    """
+    Join a FIXML corpus with a FIX log by trade key and compare every pair.
+
+    The nth FIXML trade with a key pairs with the nth 35=AE message with that
+    key in the log, so corrections and amendments line up in order.
+
+    Args:
+        fixml_file (str): File of FIXML TrdCaptRpt messages
+        fix_log (str): FIX log file (indexed on first use)
+        key (str): Join key, one of ``fix_log_store.KEY_TAGS``
+        exclude: Tags ignored on both sides
+        workers (int): Process pool size; 1 compares in-process
+        batch_size (int): Pairs per pool task
+        fix_version (str): FIX dictionary version
+        engine (FixmlMessageEngine): In-process engine to reuse
+
+    Returns:
+        dict: Pair counts, trades missing on either side, per-tag mismatch
+        statistics and example differences
+    """
+    if key not in KEY_TAGS:
+        raise ValueError(f'Unknown key {key}; choose from {", ".join(KEY_TAGS)}')
+    start = time.perf_counter()
+    checker = EquivalenceChecker(fix_version, exclude, engine)
+    key_pattern = _key_pattern(checker.engine, KEY_TAGS[key])
+    report = ReplayReport()
+    errors = []
+    missing_in_fix = []
+    matched = set()
+    occurrences = Counter()
+    lookups = {}  # trade key -> FIX message numbers
+
+    def drain(results):
+        for pair_key, diff in results:
+            if isinstance(diff, str):
+                errors.append({'key': pair_key[1], 'error': diff})
+            else:
+                report.add(pair_key, diff)
+
+    with FixLogStore(fix_log) as store, open(fixml_file, 'rb') as source:
+        delimiter = store.delimiter.decode('ascii')
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(checker.dictionary.version, tuple(exclude))) if workers > 1 else None
+        pending = []
+        batch = []
+
+        def submit(batch):
+            if executor is None:
+                drain(checker.compare_batch(batch, delimiter))
+                return
+            pending.append(executor.submit(_compare_batch, batch, delimiter))
+            if len(pending) >= workers * 2:
+                drain(pending.pop(0).result())
+
+        try:
+            for fixml in iter_fixml_messages(source, (FIXML_MESSAGE,)):
+                start_tag = fixml[:fixml.find('>') + 1]
+                match = key_pattern.search(start_tag)
+                trade_key = unescape(match.group(2), {'&quot;': '"', '&apos;': "'"}) if match else None
+                occurrence = occurrences[trade_key]
+                occurrences[trade_key] += 1
+                pair_key = (FIX_MSG_TYPE, trade_key, occurrence)
+
+                numbers = lookups.get(trade_key)
+                if numbers is None:
+                    numbers = lookups[trade_key] = store.find(FIX_MSG_TYPE, **{key: trade_key}) if trade_key else []
+                if occurrence >= len(numbers):
+                    missing_in_fix.append(pair_key)
+                    continue
+                matched.add(numbers[occurrence])
+                batch.append((pair_key, fixml, store.message(numbers[occurrence])))
+                if len(batch) >= batch_size:
+                    submit(batch)
+                    batch = []
+
+            if batch:
+                submit(batch)
+            for future in pending:
+                drain(future.result())
+        finally:
+            if executor:
+                executor.shutdown()
+
+        # FIX trades no FIXML message claimed
+        missing_in_fixml = []
+        seen = Counter()
+        for number in store.find(FIX_MSG_TYPE):
+            value = store.field(number, KEY_TAGS[key])
+            value = value.decode('utf-8', 'replace') if value is not None else None
+            if number not in matched:
+                missing_in_fixml.append((FIX_MSG_TYPE, value, seen[value]))
+            seen[value] += 1
+
+    result = report.to_dict(checker.dictionary, (missing_in_fix, missing_in_fixml))
+    result['key'] = {'name': key, 'tag': KEY_TAGS[key]}
+    result['errors'] = len(errors)
+    result['error_samples'] = errors[:report.max_samples]
+    elapsed = time.perf_counter() - start
+    result['elapsed'] = round(elapsed, 3)
+    result['pairs_per_second'] = round(report.pairs / max(elapsed, 1e-9), 1)
+    logger.info(f"Compared {report.pairs} trades in {elapsed:.2f}s ({result['pairs_per_second']:,.0f} trades/s): "
+                f"{result['with_differences']} differ, {len(missing_in_fix)} missing in FIX, "
+                f"{len(missing_in_fixml)} missing in FIXML, {len(errors)} errors")
+    return result
+
+
+def main():
+    """
+    Command-line interface for checking FIXML against FIX.
+    """
+    parser = argparse.ArgumentParser(description='Check that FIXML trade reports match their FIX 35=AE messages')
+    parser.add_argument('fixml', help='File of FIXML TrdCaptRpt messages')
+    parser.add_argument('fix_log', help='FIX log with the 35=AE messages')
+    parser.add_argument('--key', choices=sorted(KEY_TAGS), default='trade_id', help='Join key (default: trade_id)')
+    parser.add_argument('--exclude', default=','.join(map(str, DEFAULT_EQUIVALENCE_EXCLUDED_TAGS)),
+                        help='Comma-separated tags to ignore')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes (0 = one per CPU)')
+    parser.add_argument('--fix-version', default=None, help='FIX dictionary version')
+    parser.add_argument('--output', help='Write the full JSON report to this file')
+
+    args = parser.parse_args()
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    result = check_equivalence(args.fixml, args.fix_log, args.key, parse_tags(args.exclude), workers,
+                               fix_version=args.fix_version)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+    print(f"{result['pairs']} trades compared: {result['identical']} equivalent, "
+          f"{result['with_differences']} with differences, {result['errors']} errors; "
+          f"{result['unmatched_a']} missing in FIX, {result['unmatched_b']} missing in FIXML")
+    for stat in result['tag_stats'][:30]:
+        print(f"{stat['tag']:>20} {stat['name'] or '':<28} differ {stat['different']:>8}  "
+              f"only FIXML {stat['only_in_a']:>8}  only FIX {stat['only_in_b']:>8}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
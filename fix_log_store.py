@@ -0,0 +1,470 @@
+"""
+Indexed FIX session logs.
+
+A FIX log is memory-mapped and scanned once into a compact sidecar index
+(``<log>.fixidx.npz``) of message offsets, MsgType, SendingTime and hashed
+business keys (ClOrdID, TradeReportID, TradeID).  Lookups then read only the
+matching byte ranges of the log, so multi-GB logs can be searched and single
+messages compared without parsing the whole file.  The index is rebuilt when
+the log's size or modification time changes::
+
+    python fix_log_store.py index session.log
+    python fix_log_store.py find session.log --msg-type AE --trade-id 100071
+    python fix_log_store.py compare session.log 10 42 [--other uat.log]
+"""
+import argparse
+import calendar
+import hashlib
+import logging
+import mmap
+import os
+import re
+import threading
+import time
+import weakref
+
+import numpy as np
+
+from fix_parser import FixParser, diff_messages
+
+logger = logging.getLogger(__name__)
+
+# Bump when the index layout changes so stale sidecars are rebuilt
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.fixidx.npz'
+
+# Business keys indexed by hash: lookup name -> tag
+KEY_TAGS = {'cl_ord_id': 11, 'trade_report_id': 571, 'trade_id': 1003}
+MSG_TYPE_TAG = 35
+SENDING_TIME_TAG = 52
+
+# Bytes inspected to detect the field delimiter
+DELIMITER_SAMPLE = 1 << 16
+
+_TIMESTAMP_RE = re.compile(rb'^(\d{4})(\d{2})(\d{2})-(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,9}))?$')
+
+
+def detect_log_delimiter(sample):
+    """Field delimiter of a log, from a bytes sample (SOH, ``^A`` or ``|``)"""
+    for delimiter in (b'\x01', b'^A', b'|'):
+        if delimiter in sample:
+            return delimiter
+    return b'\x01'
+
+
+def key_hash(value):
+    """Stable 64-bit hash of a key value (str or bytes)"""
+    if isinstance(value, str):
+        value = value.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(value, digest_size=8).digest(), 'little')
+
+
+def sending_time_ns(value):
+    """UTCTIMESTAMP bytes ('20240516-14:32:15.123') as nanoseconds since the epoch, or -1"""
+    match = _TIMESTAMP_RE.match(value.strip())
+    if not match:
+        return -1
+    year, month, day, hour, minute, second, fraction = match.groups()
+    seconds = calendar.timegm((int(year), int(month), int(day), int(hour), int(minute), int(second)))
+    nanos = int(fraction.ljust(9, b'0')) if fraction else 0
+    return seconds * 1_000_000_000 + nanos
+
+
+def parse_time(value):
+    """A time filter ('20240516-14:32:15', ISO 8601 or epoch nanoseconds) as epoch nanoseconds"""
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    text = str(value).strip()
+    if 'T' in text:
+        date, _, clock = text.partition('T')
+        text = f"{date.replace('-', '')}-{clock.rstrip('Z')}"
+    nanos = sending_time_ns(text.encode('ascii', 'replace'))
+    if nanos < 0:
+        raise ValueError(f'Invalid timestamp: {value}')
+    return nanos
+
+
+def index_path_for(log_path):
+    return f'{log_path}{INDEX_SUFFIX}'
+
+
+def _source_stamp(log_path):
+    stat = os.stat(log_path)
+    return np.array([stat.st_size, stat.st_mtime_ns], dtype=np.int64)
+
+
+def build_index(log_path, index_path=None):
+    """
+    Scan a FIX log and write its sidecar index.
+
+    Messages run from each ``8=FIX`` to the end of the following CheckSum(10)
+    field, so log prefixes between messages are skipped.
+
+    Returns:
+        dict: The index arrays as written
+    """
+    index_path = index_path or index_path_for(log_path)
+    start_time = time.perf_counter()
+
+    offsets, lengths, msg_types, sending_times = [], [], [], []
+    keys = {name: ([], []) for name in KEY_TAGS}  # name -> (hashes, message numbers)
+    type_codes = {}
+    tag_names = {tag: name for name, tag in KEY_TAGS.items()}
+
+    with open(log_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size == 0:
+            delimiter = b'\x01'
+            mapped = b''
+        else:
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            delimiter = detect_log_delimiter(mapped[:DELIMITER_SAMPLE])
+
+        wanted = '|'.join(str(tag) for tag in [MSG_TYPE_TAG, SENDING_TIME_TAG, *KEY_TAGS.values()])
+        field_re = re.compile(re.escape(delimiter) + rb'(' + wanted.encode() + rb')=(.*?)(?=' +
+                              re.escape(delimiter) + rb')', re.DOTALL)
+        checksum = delimiter + b'10='
+
+        try:
+            position = 0
+            while True:
+                start = mapped.find(b'8=FIX', position)
+                if start == -1:
+                    break
+                trailer = mapped.find(checksum, start)
+                if trailer == -1:
+                    logger.warning(f'Incomplete message at offset {start} in {log_path}')
+                    break
+                end = mapped.find(delimiter, trailer + len(checksum))
+                end = size if end == -1 else end + len(delimiter)
+
+                number = len(offsets)
+                offsets.append(start)
+                lengths.append(end - start)
+
+                found = {}
+                for match in field_re.finditer(mapped[start:end]):
+                    found.setdefault(int(match.group(1)), match.group(2))
+
+                msg_type = found.get(MSG_TYPE_TAG, b'').decode('ascii', 'replace')
+                msg_types.append(type_codes.setdefault(msg_type, len(type_codes)))
+                sending_times.append(sending_time_ns(found[SENDING_TIME_TAG])
+                                     if SENDING_TIME_TAG in found else -1)
+                for tag, name in tag_names.items():
+                    if tag in found:
+                        keys[name][0].append(key_hash(found[tag]))
+                        keys[name][1].append(number)
+
+                position = end
+        finally:
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    arrays = {
+        'version': np.array([INDEX_VERSION], dtype=np.int64),
+        'source': _source_stamp(log_path),
+        'delimiter': np.frombuffer(delimiter, dtype=np.uint8),
+        'offsets': np.array(offsets, dtype=np.uint64),
+        'lengths': np.array(lengths, dtype=np.uint32),
+        'msg_types': np.array(msg_types, dtype=np.uint16),
+        'msg_type_names': np.array(list(type_codes) or [''], dtype=str),
+        'sending_times': np.array(sending_times, dtype=np.int64),
+    }
+    for name, (hashes, numbers) in keys.items():
+        hashes = np.array(hashes, dtype=np.uint64)
+        order = np.argsort(hashes, kind='stable')
+        arrays[f'{name}_hash'] = hashes[order]
+        arrays[f'{name}_msg'] = np.array(numbers, dtype=np.uint32)[order]
+
+    temp_path = f'{index_path}.tmp.npz'
+    np.savez(temp_path, **arrays)
+    os.replace(temp_path, index_path)
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(f'Indexed {len(offsets)} messages of {log_path} in {elapsed:.2f}s '
+                f'({size / max(elapsed, 1e-9) / 1e6:,.0f} MB/s) -> {index_path}')
+    return arrays
+
+
+def _release_mapping(mapped, file):
+    if isinstance(mapped, mmap.mmap):
+        mapped.close()
+    file.close()
+
+
+class FixLogStore:
+    """
+    A memory-mapped FIX log with its sidecar index.
+
+    Args:
+        log_path (str): FIX log file
+        index_path (str): Sidecar index, defaults to ``<log>.fixidx.npz``
+        rebuild (bool): Rebuild the index even if it is current
+    """
+
+    def __init__(self, log_path, index_path=None, rebuild=False):
+        self.log_path = log_path
+        self.index_path = index_path or index_path_for(log_path)
+        self._parser = None
+
+        arrays = None
+        if not rebuild and os.path.exists(self.index_path):
+            try:
+                with np.load(self.index_path) as stored:
+                    arrays = {name: stored[name] for name in stored.files}
+            except (OSError, ValueError) as e:
+                logger.warning(f'Ignoring unreadable FIX log index {self.index_path}: {e}')
+            if arrays is not None and (
+                    int(arrays['version'][0]) != INDEX_VERSION
+                    or not np.array_equal(arrays['source'], _source_stamp(log_path))):
+                arrays = None
+        if arrays is None:
+            arrays = build_index(log_path, self.index_path)
+
+        self.delimiter = arrays['delimiter'].tobytes()
+        self.offsets = arrays['offsets']
+        self.lengths = arrays['lengths']
+        self.msg_types = arrays['msg_types']
+        self.msg_type_names = [str(name) for name in arrays['msg_type_names']]
+        self.sending_times = arrays['sending_times']
+        self.keys = {name: (arrays[f'{name}_hash'], arrays[f'{name}_msg']) for name in KEY_TAGS}
+
+        self._file = open(log_path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        # Released by close(), or once the store is no longer referenced
+        self._release = weakref.finalize(self, _release_mapping, self._mapped, self._file)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._release()
+
+    def raw(self, number):
+        """Bytes of message ``number`` (0-based), read straight from the log"""
+        offset = int(self.offsets[number])
+        return self._mapped[offset:offset + int(self.lengths[number])]
+
+    def message(self, number):
+        """Text of message ``number``"""
+        return self.raw(number).decode('utf-8', 'replace')
+
+    def msg_type(self, number):
+        return self.msg_type_names[self.msg_types[number]]
+
+    def field(self, number, tag):
+        """First value of ``tag`` in a message, as bytes, or None"""
+        raw = self.raw(number)
+        marker = self.delimiter + str(tag).encode() + b'='
+        start = raw.find(marker)
+        if start == -1:
+            return None
+        start += len(marker)
+        end = raw.find(self.delimiter, start)
+        return raw[start:end if end != -1 else len(raw)]
+
+    def find(self, msg_type=None, start=None, end=None, limit=None, **keys):
+        """
+        Message numbers matching every given filter, in log order.
+
+        Args:
+            msg_type (str): MsgType(35)
+            start, end: SendingTime(52) range, epoch nanoseconds or timestamps;
+                ``end`` is exclusive
+            limit (int): Maximum number of results
+            **keys: Business keys from ``KEY_TAGS``, e.g. trade_id='100071'
+
+        Raises:
+            ValueError: For an unknown key name or invalid timestamp
+        """
+        # Key lookups narrow the candidates first, so keyed finds never scan the whole index
+        candidates = None
+        for name, value in keys.items():
+            if value is None:
+                continue
+            if name not in KEY_TAGS:
+                raise ValueError(f'Unknown key {name}; choose from {", ".join(KEY_TAGS)}')
+            hashes, numbers = self.keys[name]
+            target = np.uint64(key_hash(value))
+            low, high = np.searchsorted(hashes, target, 'left'), np.searchsorted(hashes, target, 'right')
+            # Confirm against the log so hash collisions cannot match
+            expected = value.encode('utf-8') if isinstance(value, str) else value
+            matched = {int(number) for number in numbers[low:high]
+                       if self.field(int(number), KEY_TAGS[name]) == expected}
+            candidates = matched if candidates is None else candidates & matched
+
+        found = np.arange(len(self)) if candidates is None else np.array(sorted(candidates), dtype=np.int64)
+        if msg_type is not None:
+            if msg_type not in self.msg_type_names:
+                return []
+            found = found[self.msg_types[found] == self.msg_type_names.index(msg_type)]
+        if start is not None:
+            found = found[self.sending_times[found] >= parse_time(start)]
+        if end is not None:
+            times = self.sending_times[found]
+            found = found[(times >= 0) & (times < parse_time(end))]
+
+        if limit is not None:
+            found = found[:limit]
+        return found.tolist()
+
+    def parsed(self, number):
+        """Message ``number`` parsed into compact entries (see ``fix_parser``)"""
+        if self._parser is None:
+            self._parser = FixParser()
+        return self._parser.parse(self.message(number), self.delimiter.decode('ascii'))[0]
+
+    def compare(self, number, other_number, other=None, ignore=(8, 9, 10)):
+        """
+        Diff message ``number`` with ``other_number`` of this or another store.
+
+        Returns:
+            dict: See ``fix_parser.diff_messages``
+        """
+        other = other or self
+        return diff_messages(self.parsed(number).fields, other.parsed(other_number).fields, ignore)
+
+    def summary(self):
+        """Message counts per MsgType and the SendingTime range"""
+        counts = np.bincount(self.msg_types, minlength=len(self.msg_type_names)) if len(self) else []
+        times = self.sending_times[self.sending_times >= 0]
+        return {
+            'log': os.path.basename(self.log_path),
+            'messages': len(self),
+            'msg_types': {name: int(count) for name, count in zip(self.msg_type_names, counts) if count},
+            'first_sending_time': int(times.min()) if len(times) else None,
+            'last_sending_time': int(times.max()) if len(times) else None,
+        }
+
+
+class FixLogCatalog:
+    """
+    Open ``FixLogStore``s for the logs in one directory, shared between requests.
+
+    Args:
+        directory (str): Directory holding the FIX logs
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._stores = {}
+        self._opening = {}  # name -> lock held while that log's store is opened
+        self._lock = threading.Lock()
+
+    def path(self, name):
+        """Path of log ``name``, which must be a file directly in the directory"""
+        if not name or os.path.basename(name) != name or name.endswith(INDEX_SUFFIX):
+            raise KeyError(name)
+        path = os.path.join(self.directory, name)
+        if not os.path.isfile(path):
+            raise KeyError(name)
+        return path
+
+    def list_logs(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name for name in os.listdir(self.directory)
+                      if not name.endswith((INDEX_SUFFIX, '.tmp.npz'))
+                      and os.path.isfile(os.path.join(self.directory, name)))
+
+    def get(self, name):
+        """
+        The store for log ``name``, reopened when the log has changed.
+
+        A replaced store is not closed here: requests still holding it keep
+        reading, and its mapping is released once the last reference goes.
+        Indexing a log only blocks other requests for the same log.
+
+        Raises:
+            KeyError: If there is no such log
+        """
+        path = self.path(name)
+        stamp = _source_stamp(path).tolist()
+        with self._lock:
+            entry = self._stores.get(name)
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+            opening = self._opening.setdefault(name, threading.Lock())
+
+        with opening:
+            # Another request may have opened it while this one waited
+            with self._lock:
+                entry = self._stores.get(name)
+                if entry is not None and entry[0] == stamp:
+                    return entry[1]
+            store = FixLogStore(path)
+            with self._lock:
+                self._stores[name] = (stamp, store)
+            return store
+
+
+def main():
+    """
+    Command-line interface for indexing, searching and comparing FIX logs.
+    """
+    parser = argparse.ArgumentParser(description='Index and query FIX session logs')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = commands.add_parser('index', help='Build (or refresh) the sidecar index of logs')
+    index_parser.add_argument('logs', nargs='+', help='FIX log files')
+    index_parser.add_argument('--rebuild', action='store_true', help='Rebuild even if the index is current')
+
+    find_parser = commands.add_parser('find', help='Print messages matching the filters')
+    find_parser.add_argument('log', help='FIX log file')
+    find_parser.add_argument('--msg-type', help='MsgType(35)')
+    for name in KEY_TAGS:
+        find_parser.add_argument(f'--{name.replace("_", "-")}', dest=name, help=f'Tag {KEY_TAGS[name]} value')
+    find_parser.add_argument('--start', help='SendingTime from (YYYYMMDD-HH:MM:SS[.fff])')
+    find_parser.add_argument('--end', help='SendingTime before (YYYYMMDD-HH:MM:SS[.fff])')
+    find_parser.add_argument('--limit', type=int, default=20, help='Maximum messages to print (default: 20)')
+
+    compare_parser = commands.add_parser('compare', help='Diff two messages by message number')
+    compare_parser.add_argument('log', help='FIX log file of the first message')
+    compare_parser.add_argument('number', type=int, help='Message number in the first log')
+    compare_parser.add_argument('other_number', type=int, help='Message number in the other log')
+    compare_parser.add_argument('--other', help='FIX log file of the second message (default: same log)')
+
+    args = parser.parse_args()
+
+    if args.command == 'index':
+        for log in args.logs:
+            with FixLogStore(log, rebuild=args.rebuild) as store:
+                summary = store.summary()
+                print(f"{log}: {summary['messages']} messages {summary['msg_types']}")
+
+    elif args.command == 'find':
+        with FixLogStore(args.log) as store:
+            keys = {name: getattr(args, name) for name in KEY_TAGS}
+            numbers = store.find(args.msg_type, args.start, args.end, args.limit, **keys)
+            for number in numbers:
+                print(f'#{number}\t{store.message(number).replace(store.delimiter.decode("ascii"), "|")}')
+            print(f'{len(numbers)} messages')
+
+    elif args.command == 'compare':
+        with FixLogStore(args.log) as store:
+            other = FixLogStore(args.other) if args.other else store
+            try:
+                diff = store.compare(args.number, args.other_number, other)
+            finally:
+                if other is not store:
+                    other.close()
+        for path, value_a, value_b in diff['different']:
+            print(f'~ {path}: {value_a} != {value_b}')
+        for path, value in diff['only_in_a']:
+            print(f'- {path}={value}')
+        for path, value in diff['only_in_b']:
+            print(f'+ {path}={value}')
+        print(f"{len(diff['matching'])} fields match, {len(diff['different'])} differ, "
+              f"{len(diff['only_in_a'])} only in first, {len(diff['only_in_b'])} only in second")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,329 @@
+"""
+FIX tag=value message parsing and comparison.
+
+Messages may be delimited by SOH, ``|`` or a literal ``^A`` and may be pasted
+as whole logs: text before each ``8=FIX`` is skipped and every BeginString
+starts a new message.  Raw data fields (e.g. RawData(96)) are read by the
+length given in their preceding Length field, so values may contain the
+delimiter or ``=``.  Repeating groups are nested using the FIX dictionary of
+the message's BeginString.
+
+Parsed messages are compact lists of ``[tag, value]`` entries, with group
+count entries carrying their instances as a third element:
+``[453, '2', [[[448, 'A'], [452, '1']], [[448, 'B'], [452, '3']]]]``.
+"""
+import logging
+import re
+from collections import namedtuple
+
+from fix_dictionary import GROUP, load_dictionary
+
+logger = logging.getLogger(__name__)
+
+SOH = '\x01'
+
+# Delimiters tried, in order, when none is given
+DELIMITERS = (SOH, '^A', '|')
+
+# Dictionary used for each BeginString; others use the default dictionary
+DICTIONARY_VERSIONS = {'FIX.4.4': 'FIX.4.4', 'FIXT.1.1': 'FIX.5.0SP2'}
+
+ParsedMessage = namedtuple('ParsedMessage', ['msg_type', 'fields'])
+
+_MESSAGE_START = re.compile(r'8=FIX')
+
+
+class FixParseError(ValueError):
+    """Raised when text holds no parsable FIX message"""
+
+
+def detect_delimiter(text):
+    """The field delimiter used in ``text`` (SOH, ``^A`` or ``|``)"""
+    for delimiter in DELIMITERS:
+        if delimiter in text:
+            return delimiter
+    return '|'
+
+
+def normalize_delimiter(delimiter, text):
+    """Map a user-supplied delimiter to the one actually in ``text``"""
+    if not delimiter:
+        return detect_delimiter(text)
+    if delimiter in ('^A', SOH, '\\x01', '\\u0001', 'SOH', 'soh'):
+        return '^A' if '^A' in text else SOH
+    return delimiter
+
+
+class _GroupSpec:
+    """A repeating group: its delimiter (first) tag and the tags an instance may hold"""
+    __slots__ = ('delimiter', 'tags', 'groups')
+
+    def __init__(self, members):
+        self.delimiter = members[0][1] if members else None
+        self.tags = set()
+        self.groups = {}  # count tag -> _GroupSpec
+        for member in members:
+            self.tags.add(member[1])
+            if member[0] == GROUP:
+                self.groups[member[1]] = _GroupSpec(member[3])
+
+
+class FixParser:
+    """
+    Splits FIX logs into messages and nests their repeating groups.
+
+    Args:
+        default_version (str): Dictionary for BeginStrings not in
+            ``DICTIONARY_VERSIONS`` (default: ``load_dictionary()``'s)
+    """
+
+    def __init__(self, default_version=None):
+        self.default_version = default_version
+        self._dictionaries = {}
+        self._raw_lengths = {}
+        self._layouts = {}
+
+    def dictionary(self, begin_string=None):
+        """The FixDictionary used for messages with ``begin_string``"""
+        version = DICTIONARY_VERSIONS.get(begin_string, self.default_version)
+        dictionary = self._dictionaries.get(version)
+        if dictionary is None:
+            dictionary = self._dictionaries[version] = load_dictionary(version)
+        return dictionary
+
+    def raw_lengths(self, dictionary):
+        """Length tag -> the raw data tag whose byte count it gives"""
+        lengths = self._raw_lengths.get(dictionary.version)
+        if lengths is None:
+            lengths = {}
+            for tag, (name, field_type, _) in dictionary.fields.items():
+                if field_type != 'LENGTH':
+                    continue
+                data_tag = tag + 1
+                if dictionary.field_type(data_tag) != 'DATA':
+                    data_tag = dictionary.tag(re.sub(r'Len(gth)?$', '', name))
+                if data_tag is not None and dictionary.field_type(data_tag) == 'DATA':
+                    lengths[tag] = data_tag
+            self._raw_lengths[dictionary.version] = lengths
+        return lengths
+
+    def _layout(self, dictionary, msg_type):
+        """Groups of a message (with its header and trailer), keyed by count tag"""
+        key = (dictionary.version, msg_type)
+        layout = self._layouts.get(key)
+        if layout is None:
+            message = dictionary.message(msg_type)
+            members = dictionary.header + (message[2] if message else ()) + dictionary.trailer
+            layout = self._layouts[key] = _GroupSpec(dictionary.expand(members)).groups
+        return layout
+
+    def split_messages(self, text, delimiter=None):
+        """
+        Split text into messages of flat (tag, value) pairs.
+
+        Returns:
+            list: One list of (int tag, str value) per message
+
+        Raises:
+            FixParseError: If no message is found, or a message has no
+                MsgType(35) (usually a wrong delimiter)
+        """
+        delimiter = normalize_delimiter(delimiter, text)
+        raw_lengths = self.raw_lengths(self.dictionary())
+        parts = text.split(delimiter)
+        messages = []
+        fields = None
+        raw_pending = None  # (data tag, length) announced by the previous field
+        carry = None  # Text after a line break inside a part
+        index, count = 0, len(parts)
+
+        while carry is not None or index < count:
+            if carry is not None:
+                part, carry = carry, None
+            else:
+                part = parts[index]
+                index += 1
+            tag_text, equals, value = part.partition('=')
+            if not equals:
+                continue
+            tag_text = tag_text.strip()
+            if not tag_text.isdigit():
+                # Log prefixes and other noise: resume at the next message
+                start = _MESSAGE_START.search(part)
+                if start is None:
+                    continue
+                tag_text, _, value = part[start.start():].partition('=')
+
+            tag = int(tag_text)
+            if raw_pending is not None and raw_pending[0] == tag:
+                # Raw data may contain the delimiter: take parts until the announced length
+                while len(value) < raw_pending[1] and index < count:
+                    value = f'{value}{delimiter}{parts[index]}'
+                    index += 1
+            elif '\n' in value:
+                value, _, rest = value.partition('\n')
+                if rest.strip():
+                    carry = rest
+                value = value.rstrip()
+
+            if tag == 8:
+                fields = []
+                messages.append(fields)
+                raw_lengths = self.raw_lengths(self.dictionary(value.strip()))
+            elif fields is None:
+                # Fields before any BeginString form a message of their own
+                fields = []
+                messages.append(fields)
+            fields.append((tag, value))
+
+            raw_pending = None
+            data_tag = raw_lengths.get(tag)
+            if data_tag is not None and value.isdigit():
+                raw_pending = (data_tag, int(value))
+            if tag == 10:
+                fields = None
+
+        messages = [fields for fields in messages if fields]
+        if not messages:
+            raise FixParseError('No FIX fields found')
+        for number, fields in enumerate(messages, 1):
+            if not any(tag == 35 for tag, _ in fields):
+                raise FixParseError(f'Message {number} has no MsgType(35); check the delimiter ({delimiter!r})')
+        return messages
+
+    def structure(self, fields):
+        """
+        Nest a message's flat fields into repeating groups.
+
+        Returns:
+            ParsedMessage: MsgType and compact entries
+        """
+        begin_string = fields[0][1] if fields and fields[0][0] == 8 else None
+        msg_type = next((value for tag, value in fields if tag == 35), None)
+        groups = self._layout(self.dictionary(begin_string), msg_type)
+
+        entries, _ = self._entries(fields, 0, groups)
+        return ParsedMessage(msg_type, entries)
+
+    def _entries(self, fields, position, groups, spec=None):
+        """
+        Compact entries from ``position``: the whole message, or one instance
+        of ``spec``'s group, which ends at a tag outside the group or a repeat.
+        """
+        entries = []
+        seen = set() if spec is not None else None
+        count = len(fields)
+        while position < count:
+            tag, value = fields[position]
+            if spec is not None:
+                if tag not in spec.tags or tag in seen:
+                    break
+                seen.add(tag)
+            position += 1
+            group = groups.get(tag)
+            if group is None or not value.isdigit():
+                entries.append([tag, value])
+                continue
+
+            instances = []
+            for _ in range(int(value)):
+                if position >= count or fields[position][0] != group.delimiter:
+                    break
+                instance, position = self._entries(fields, position, group.groups, group)
+                instances.append(instance)
+            entries.append([tag, value, instances])
+        return entries, position
+
+    def parse(self, text, delimiter=None):
+        """Split ``text`` into messages and nest their groups"""
+        return [self.structure(fields) for fields in self.split_messages(text, delimiter)]
+
+
+def flatten(entries, prefix=''):
+    """
+    Flatten compact entries to ``{path: value}``.
+
+    Top-level fields are keyed by tag ('55'), group fields by count tag and
+    1-based instance ('453[2].448'); repeated tags outside known groups get
+    an occurrence suffix ('448#2').
+    """
+    flat = {}
+    for entry in entries:
+        path = f'{prefix}{entry[0]}'
+        if path in flat:
+            occurrence = 2
+            while f'{path}#{occurrence}' in flat:
+                occurrence += 1
+            path = f'{path}#{occurrence}'
+        flat[path] = entry[1]
+        if len(entry) > 2:
+            for index, instance in enumerate(entry[2], 1):
+                flat.update(flatten(instance, f'{path}[{index}].'))
+    return flat
+
+
+def diff_messages(a, b, ignore=(8, 9, 10), changes_only=False):
+    """
+    Compare two parsed messages field by field.
+
+    Args:
+        a, b: Compact entries (``ParsedMessage.fields``)
+        ignore: Top-level tags left out of the comparison (framing by default)
+        changes_only (bool): Return only ``only_in_a``, ``only_in_b`` and
+            ``different``, skipping the matching and cross-field passes
+
+    Returns:
+        dict: ``only_in_a``/``only_in_b`` as [path, value], ``different`` as
+        [path, a value, b value], ``matching`` as [path, value] and
+        ``same_value_different_field`` as [path in a, path in b, value]
+    """
+    ignored = {str(tag) for tag in ignore}
+    flat_a = {path: value for path, value in flatten(a).items() if path not in ignored}
+    flat_b = {path: value for path, value in flatten(b).items() if path not in ignored}
+
+    diff = {'only_in_a': [], 'only_in_b': [], 'different': []}
+    matching = []
+    for path, value in flat_a.items():
+        if path not in flat_b:
+            diff['only_in_a'].append([path, value])
+        elif flat_b[path] == value:
+            if not changes_only:
+                matching.append([path, value])
+        else:
+            diff['different'].append([path, value, flat_b[path]])
+    diff['only_in_b'] = [[path, value] for path, value in flat_b.items() if path not in flat_a]
+    if changes_only:
+        return diff
+
+    diff['matching'] = matching
+    diff['same_value_different_field'] = []
+
+    paths_by_value = {}
+    for path, value in flat_a.items():
+        paths_by_value.setdefault(value, []).append(path)
+    for path, value in flat_b.items():
+        if flat_a.get(path) == value:
+            continue
+        for path_a in paths_by_value.get(value, ()):
+            if path_a != path:
+                diff['same_value_different_field'].append([path_a, path, value])
+    return diff
+
+
+def field_names(dictionary, messages):
+    """Dictionary names of every tag used in compact ``messages``, keyed by tag"""
+    names = {}
+
+    def visit(entries):
+        for entry in entries:
+            if entry[0] not in names:
+                name = dictionary.name(entry[0])
+                if name:
+                    names[entry[0]] = name
+            if len(entry) > 2:
+                for instance in entry[2]:
+                    visit(instance)
+
+    for message in messages:
+        visit(message)
+    return names
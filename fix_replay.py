@@ -0,0 +1,349 @@
+"""
+Environment-to-environment FIX log replay diff.
+
+Two FIX logs of the same replayed order flow (e.g. UAT and production) are
+streamed side by side.  Messages are aligned by MsgType plus a configurable
+business key (ClOrdID by default) and the occurrence of that key, so the
+third execution report for an order in one log pairs with the third in the
+other.  Only messages still waiting for their partner are held in memory.
+
+Aligned pairs are parsed and diffed in batches, optionally in a process
+pool.  Volatile tags (timestamps, sequence numbers, framing) are dropped
+while parsing, and the report counts differences per tag::
+
+    python fix_replay.py uat.log prod.log --key 11 --exclude 52,60,10,9,34 --workers 4
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from fix_dictionary import load_dictionary
+from fix_parser import FixParser, diff_messages
+
+logger = logging.getLogger(__name__)
+
+# Tags that change between runs of the same flow
+DEFAULT_EXCLUDED_TAGS = (8, 9, 10, 34, 52, 60, 122)
+
+# Default alignment key: ClOrdID
+DEFAULT_KEY_TAGS = (11,)
+
+READ_CHUNK_SIZE = 1 << 20
+BATCH_SIZE = 200
+
+# Differing pairs kept in full in the report
+MAX_SAMPLES = 20
+
+_INDEX_RE = re.compile(r'\[\d+\]|#\d+')
+
+
+def parse_tags(value):
+    """'52, 60,10' -> (52, 60, 10)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(int(tag) for tag in value)
+    return tuple(int(tag) for tag in str(value).replace(' ', '').split(',') if tag)
+
+
+def iter_log_messages(stream, chunk_size=READ_CHUNK_SIZE):
+    """
+    Stream messages (bytes) out of a binary FIX log.
+
+    Each message runs from ``8=FIX`` to the end of its CheckSum(10) field;
+    anything in between (log prefixes, line breaks) is skipped.
+
+    Yields:
+        tuple: (delimiter, message bytes)
+    """
+    buffer = b''
+    delimiter = None
+    position = 0
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if chunk:
+            buffer = buffer[position:] + chunk
+            position = 0
+        if delimiter is None:
+            delimiter = next((candidate for candidate in (b'\x01', b'^A', b'|') if candidate in buffer), None)
+            if delimiter is None:
+                if chunk:
+                    continue
+                return
+
+        while True:
+            start = buffer.find(b'8=FIX', position)
+            if start == -1:
+                # Keep a tail that could hold the start of a split '8=FIX'
+                position = max(len(buffer) - 8, position)
+                break
+            trailer = buffer.find(delimiter + b'10=', start)
+            end = buffer.find(delimiter, trailer + len(delimiter) + 3) if trailer != -1 else -1
+            if end == -1:
+                if not chunk and trailer != -1:
+                    # The last message may lack its final delimiter
+                    yield delimiter, buffer[start:].rstrip()
+                position = start
+                break
+            yield delimiter, buffer[start:end + len(delimiter)]
+            position = end + len(delimiter)
+
+        if not chunk:
+            return
+
+
+class MessageAligner:
+    """
+    Pairs messages of two streams by (MsgType, key values, occurrence).
+
+    Args:
+        key_tags: Tags whose values identify a message across environments
+    """
+
+    def __init__(self, key_tags=DEFAULT_KEY_TAGS):
+        self.key_tags = tuple(key_tags)
+        self.pending = ({}, {})  # side -> {key: message}, in arrival order
+        self.occurrences = (Counter(), Counter())
+        self._patterns = {}
+
+    def key(self, delimiter, message):
+        pattern = self._patterns.get(delimiter)
+        if pattern is None:
+            tags = '|'.join(str(tag) for tag in (35, *self.key_tags))
+            pattern = self._patterns[delimiter] = re.compile(
+                rb'(?:^|' + re.escape(delimiter) + rb')(' + tags.encode() + rb')=(.*?)(?=' + re.escape(delimiter) + rb'|$)')
+        found = {}
+        for match in pattern.finditer(message):
+            found.setdefault(int(match.group(1)), match.group(2).decode('utf-8', 'replace'))
+        return (found.get(35),) + tuple(found.get(tag) for tag in self.key_tags)
+
+    def add(self, side, delimiter, message):
+        """
+        Add a message from side 0 or 1.
+
+        Returns:
+            tuple: (key, message a, message b) when it completes a pair, else None
+        """
+        base = self.key(delimiter, message)
+        occurrence = self.occurrences[side][base]
+        self.occurrences[side][base] += 1
+        key = base + (occurrence,)
+
+        other = self.pending[1 - side]
+        partner = other.pop(key, None)
+        if partner is None:
+            self.pending[side][key] = message
+            return None
+        return (key, message, partner) if side == 0 else (key, partner, message)
+
+
+_worker_parser = None
+
+
+def _init_worker():
+    global _worker_parser
+    _worker_parser = FixParser()
+
+
+def diff_pairs(pairs, exclude, delimiters, parser=None):
+    """
+    Parse and diff aligned pairs, dropping ``exclude`` tags while parsing.
+
+    Returns:
+        list: (key, diff) per pair, with only the changed fields of ``diff_messages``
+    """
+    parser = parser or _worker_parser or FixParser()
+    excluded = set(exclude)
+    results = []
+    for key, message_a, message_b in pairs:
+        parsed = []
+        for message, delimiter in ((message_a, delimiters[0]), (message_b, delimiters[1])):
+            text = message.decode('utf-8', 'replace')
+            fields = parser.split_messages(text, delimiter.decode('ascii'))[0]
+            parsed.append(parser.structure([field for field in fields if field[0] not in excluded]).fields)
+        results.append((key, diff_messages(parsed[0], parsed[1], ignore=(), changes_only=True)))
+    return results
+
+
+def _tag_of(path):
+    """'552[1].453[2].448' -> '552.453.448'"""
+    return _INDEX_RE.sub('', path)
+
+
+class ReplayReport:
+    """Accumulates aligned-pair diffs into per-tag statistics"""
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.pairs = 0
+        self.identical = 0
+        self.tags = {}  # tag path -> Counter of different / only_in_a / only_in_b
+        self.samples = []
+        self.max_samples = max_samples
+
+    def add(self, key, diff):
+        self.pairs += 1
+        changed = diff['different'] or diff['only_in_a'] or diff['only_in_b']
+        if not changed:
+            self.identical += 1
+            return
+        for kind in ('different', 'only_in_a', 'only_in_b'):
+            for entry in diff[kind]:
+                self.tags.setdefault(_tag_of(entry[0]), Counter())[kind] += 1
+        if len(self.samples) < self.max_samples:
+            self.samples.append({
+                'msg_type': key[0],
+                'key': list(key[1:-1]),
+                'occurrence': key[-1],
+                'different': diff['different'],
+                'only_in_a': diff['only_in_a'],
+                'only_in_b': diff['only_in_b'],
+            })
+
+    def to_dict(self, dictionary=None, unmatched=((), ())):
+        tag_stats = []
+        for path, counts in self.tags.items():
+            last = path.rsplit('.', 1)[-1]
+            tag_stats.append({
+                'tag': path,
+                'name': dictionary.name(last) if dictionary and last.isdigit() else None,
+                'different': counts['different'],
+                'only_in_a': counts['only_in_a'],
+                'only_in_b': counts['only_in_b'],
+                'total': counts['different'] + counts['only_in_a'] + counts['only_in_b'],
+            })
+        tag_stats.sort(key=lambda stat: (-stat['total'], stat['tag']))
+
+        return {
+            'pairs': self.pairs,
+            'identical': self.identical,
+            'with_differences': self.pairs - self.identical,
+            'unmatched_a': len(unmatched[0]),
+            'unmatched_b': len(unmatched[1]),
+            'unmatched_a_keys': [_describe_key(key) for key in list(unmatched[0])[:self.max_samples]],
+            'unmatched_b_keys': [_describe_key(key) for key in list(unmatched[1])[:self.max_samples]],
+            'tag_stats': tag_stats,
+            'samples': self.samples,
+        }
+
+
+def _describe_key(key):
+    return {'msg_type': key[0], 'key': list(key[1:-1]), 'occurrence': key[-1]}
+
+
+def replay_diff(log_a, log_b, key_tags=DEFAULT_KEY_TAGS, exclude=DEFAULT_EXCLUDED_TAGS, workers=1,
+                batch_size=BATCH_SIZE, fix_version=None):
+    """
+    Align and diff two FIX logs.
+
+    Args:
+        log_a, log_b (str): FIX log files (A = e.g. UAT, B = production)
+        key_tags: Tags that identify a message across the logs
+        exclude: Tags dropped before comparing
+        workers (int): Process pool size; 1 diffs in-process
+        batch_size (int): Pairs per pool task
+        fix_version (str): Dictionary used for tag names in the report
+
+    Returns:
+        dict: Pair counts, unmatched messages, per-tag statistics and samples
+    """
+    start = time.perf_counter()
+    aligner = MessageAligner(key_tags)
+    report = ReplayReport()
+    delimiters = [None, None]
+    batch = []
+
+    def drain(results):
+        for key, diff in results:
+            report.add(key, diff)
+
+    with open(log_a, 'rb') as file_a, open(log_b, 'rb') as file_b:
+        streams = [iter_log_messages(file_a), iter_log_messages(file_b)]
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+        parser = None if executor else FixParser()
+        pending = []
+        try:
+            # Alternate between the logs so matching messages meet early
+            active = [True, True]
+            while any(active):
+                for side in (0, 1):
+                    if not active[side]:
+                        continue
+                    item = next(streams[side], None)
+                    if item is None:
+                        active[side] = False
+                        continue
+                    delimiters[side], message = item
+                    pair = aligner.add(side, *item)
+                    if pair is None:
+                        continue
+                    batch.append(pair)
+                    if len(batch) >= batch_size:
+                        if executor:
+                            pending.append(executor.submit(diff_pairs, batch, exclude, tuple(delimiters)))
+                            if len(pending) >= workers * 2:
+                                drain(pending.pop(0).result())
+                        else:
+                            drain(diff_pairs(batch, exclude, tuple(delimiters), parser))
+                        batch = []
+
+            if batch:
+                if executor:
+                    pending.append(executor.submit(diff_pairs, batch, exclude, tuple(delimiters)))
+                else:
+                    drain(diff_pairs(batch, exclude, tuple(delimiters), parser))
+            for future in pending:
+                drain(future.result())
+        finally:
+            if executor:
+                executor.shutdown()
+
+    dictionary = load_dictionary(fix_version)
+    result = report.to_dict(dictionary, (aligner.pending[0], aligner.pending[1]))
+    elapsed = time.perf_counter() - start
+    result['elapsed'] = round(elapsed, 3)
+    result['pairs_per_second'] = round(report.pairs / max(elapsed, 1e-9), 1)
+    logger.info(f"Compared {report.pairs} aligned pairs in {elapsed:.2f}s ({result['pairs_per_second']:,.0f} pairs/s): "
+                f"{result['with_differences']} differ, {result['unmatched_a']}/{result['unmatched_b']} unmatched")
+    return result
+
+
+def main():
+    """
+    Command-line interface for diffing two replayed FIX logs.
+    """
+    parser = argparse.ArgumentParser(description='Align and diff the FIX logs of two environments')
+    parser.add_argument('log_a', help='FIX log of the first environment (e.g. UAT)')
+    parser.add_argument('log_b', help='FIX log of the second environment (e.g. production)')
+    parser.add_argument('--key', default=','.join(map(str, DEFAULT_KEY_TAGS)),
+                        help='Comma-separated tags that identify a message across logs (default: 11)')
+    parser.add_argument('--exclude', default=','.join(map(str, DEFAULT_EXCLUDED_TAGS)),
+                        help='Comma-separated volatile tags to ignore')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes (0 = one per CPU)')
+    parser.add_argument('--output', help='Write the full JSON report to this file')
+    parser.add_argument('--fix-version', default=None, help='FIX dictionary version for tag names')
+
+    args = parser.parse_args()
+
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    result = replay_diff(args.log_a, args.log_b, parse_tags(args.key), parse_tags(args.exclude),
+                         workers, fix_version=args.fix_version)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(result, file, indent=2)
+
+    print(f"{result['pairs']} aligned pairs: {result['identical']} identical, "
+          f"{result['with_differences']} with differences; "
+          f"{result['unmatched_a']} only in {args.log_a}, {result['unmatched_b']} only in {args.log_b}")
+    for stat in result['tag_stats'][:30]:
+        print(f"{stat['tag']:>20} {stat['name'] or '':<28} differ {stat['different']:>8}  "
+              f"only A {stat['only_in_a']:>8}  only B {stat['only_in_b']:>8}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
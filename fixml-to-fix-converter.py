@@ -1,43 +1,167 @@
+import time
+
 import pandas as pd
 import requests
 from bs4 import BeautifulSoup
 import re
 import logging
 import argparse
+import os
+
+from fix_dictionary import DEFAULT_FIX_VERSION, FIX_VERSIONS, load_dictionary, name_variants
+from fixml_messages import SOH, convert_fixml_file
+from fixml_paths import FIXML_FALLBACK_TAGS, FixmlPathResolver
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+# Output formats of convert_spreadsheet, chosen by file extension by default
+OUTPUT_FORMATS = ('xlsx', 'csv', 'parquet')
+
+# Rows per chunk when streaming CSV input
+CSV_CHUNK_ROWS = 100000
+
+# Rows per worksheet (Excel's limit)
+XLSX_MAX_ROWS = 1048576
+
+
+def output_format_for(output_file):
+    """Output format implied by a file name ('xlsx' unless it ends in .csv or .parquet)"""
+    extension = os.path.splitext(str(output_file))[1].lower().lstrip('.')
+    return {'csv': 'csv', 'parquet': 'parquet', 'pq': 'parquet'}.get(extension, 'xlsx')
+
+
+class CsvTableWriter:
+    """Appends dataframe chunks to a CSV file"""
+
+    def __init__(self, output):
+        self.output = output
+        self.header = True
+
+    def write(self, df):
+        df.to_csv(self.output, mode='w' if self.header else 'a', header=self.header, index=False)
+        self.header = False
+
+    def close(self):
+        if self.header:
+            pd.DataFrame().to_csv(self.output, index=False)
+
+
+class ParquetTableWriter:
+    """Appends dataframe chunks to a Parquet file as row groups"""
+
+    def __init__(self, output):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError('Parquet output requires pyarrow (pip install pyarrow)')
+        self.pa = pa
+        self.pq = pq
+        self.output = output
+        self.writer = None
+
+    def write(self, df):
+        # Every column is written as a string, as in the CSV output: a column's
+        # dtype can differ between chunks (ints become floats once a NaN appears)
+        table = self.pa.Table.from_pandas(df.astype('string'), preserve_index=False)
+        if self.writer is None:
+            self.writer = self.pq.ParquetWriter(self.output, table.schema)
+        self.writer.write_table(table)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+class XlsxTableWriter:
+    """Streams dataframe chunks into a worksheet row by row, in constant memory"""
+
+    def __init__(self, output):
+        try:
+            import xlsxwriter
+        except ImportError:
+            raise RuntimeError('Streaming Excel output requires xlsxwriter (pip install xlsxwriter)')
+        options = {'constant_memory': True} if isinstance(output, (str, os.PathLike)) else {'in_memory': True}
+        self.workbook = xlsxwriter.Workbook(output, options)
+        self.worksheet = self.workbook.add_worksheet()
+        self.row = 0
+
+    def write(self, df):
+        if self.row == 0:
+            self.worksheet.write_row(0, 0, [str(column) for column in df.columns])
+            self.row = 1
+        if self.row + len(df) > XLSX_MAX_ROWS:
+            raise ValueError(f'More than {XLSX_MAX_ROWS - 1} rows do not fit in an Excel sheet; use CSV or Parquet output')
+
+        values = df.astype(object).where(df.notna(), None)
+        for record in values.itertuples(index=False, name=None):
+            self.worksheet.write_row(self.row, 0, record)
+            self.row += 1
+
+    def close(self):
+        self.workbook.close()
+
+
+TABLE_WRITERS = {'csv': CsvTableWriter, 'parquet': ParquetTableWriter, 'xlsx': XlsxTableWriter}
+
+
 class FIXMLToFIXConverter:
     """
     A tool to convert FIXML paths to FIX tags.
     """
 
-    def __init__(self, spec_url=None):
+    def __init__(self, spec_url=None, fix_version=None, rebuild_dictionary=False):
         """
         Initialize the converter.
 
         Args:
-            spec_url (str): URL to the FIX specification.
+            spec_url (str): URL to a fiximate-style FIX specification page. When
+                omitted, the compiled local dictionary is used instead.
+            fix_version (str): FIX version of the local dictionary
+            rebuild_dictionary (bool): Recompile the local dictionary cache
         """
-        self.spec_url = spec_url or "https://fiximate.fixtrading.org/en/FIX.Latest/fields_sorted_by_tagnum.html"
+        self.spec_url = spec_url
+        self.dictionary = None
+        self.path_resolver = None
 
         # Load field to tag mappings
         self.field_to_tag = {}
+        self._tag_cache = {}  # Field name -> resolved tag, filled on first lookup
 
-        # Load mappings from FIX specification
-        self.load_fix_specification()
+        # Load mappings from the local dictionary, or the FIX specification website if requested
+        if spec_url:
+            self.load_fix_specification()
+        else:
+            self.load_fix_dictionary(fix_version, rebuild_dictionary)
 
         # Add known FIXML-specific mappings
         self.add_fixml_mappings()
 
         logger.info(f"Loaded {len(self.field_to_tag)} field-to-tag mappings")
 
+    def load_fix_dictionary(self, fix_version=None, rebuild=False):
+        """
+        Load field-to-tag mappings from the compiled local FIX dictionary.
+
+        Args:
+            fix_version (str): FIX version, see ``fix_dictionary.FIX_VERSIONS``
+            rebuild (bool): Recompile the dictionary cache first
+        """
+        self.dictionary = load_dictionary(fix_version, rebuild=rebuild)
+        self.path_resolver = FixmlPathResolver(self.dictionary)
+        self.field_to_tag.update(self.dictionary.lookup)
+        self._tag_cache.clear()
+        logger.info(f"Loaded {len(self.dictionary.fields)} fields from the {self.dictionary.version} dictionary")
+
     def load_fix_specification(self):
         """
         Load field-to-tag mappings from the FIX specification website.
+
+        Raises:
+            RuntimeError: If the page could not be loaded or had no tag table
         """
         try:
             logger.info(f"Loading FIX specification from {self.spec_url}")
@@ -70,11 +194,13 @@ class FIXMLToFIXConverter:
                                 self.field_to_tag[re.sub(r'[^a-zA-Z0-9]', '', name)] = tag
                                 self.field_to_tag[re.sub(r'[^a-zA-Z0-9]', '', name).lower()] = tag
 
-            logger.info(f"Loaded {len(self.field_to_tag)} mappings from FIX specification")
-
         except Exception as e:
             logger.error(f"Error loading FIX specification: {e}")
-            logger.error(str(e))
+            raise RuntimeError(f"Could not load FIX specification from {self.spec_url}: {e}") from e
+
+        if not self.field_to_tag:
+            raise RuntimeError(f"No field-to-tag mappings found at {self.spec_url}")
+        logger.info(f"Loaded {len(self.field_to_tag)} mappings from FIX specification")
 
     def add_fixml_mappings(self):
         """
@@ -82,60 +208,12 @@ class FIXMLToFIXConverter:
         These mappings are based on the FIX standard but may need adjustments
         for specific implementations.
         """
-        # Common FIXML to FIX tag mappings
-        # The actual mappings would be more extensive in a production system
-        fixml_mappings = {
-            # Date/Time fields
-            "EndDt": 432,  # ExpireDate
-            "StartDt": 75,  # TradeDate
-
-            # Header fields
-            "SID": 49,  # SenderCompID
-            "SSub": 50,  # SenderSubID
-            "Snt": 52,  # SendingTime
-            "TID": 1003,  # TradeID
-
-            # Instrument fields
-            "AltIDSrc": 455,  # SecurityAltIDSource
-            "AltID": 454,  # SecurityAltID
-            "CFI": 461,  # CFICode
-            "Desc": 107,  # SecurityDesc
-            "Exch": 207,  # SecurityExchange
-            "GUID": 354,  # EncodedTextLen
-            "ID": 48,  # SecurityID
-            "PxQteCcy": 15,  # Currency
-            "SecTyp": 167,  # SecurityType
-            "Src": 22,  # IDSource
-            "SubTyp": 762,  # SecuritySubType
-            "Sym": 55,  # Symbol
-
-            # Common market identifiers
-            "CME": 207,  # SecurityExchange (Chicago Mercantile Exchange)
-            "QDMFI": 762,  # SecuritySubType
-            "BTEU": 207,  # SecurityExchange (Bloomberg Trading)
-            "BTUS": 207,  # SecurityExchange
-
-            # Currency codes - these would typically be values for tag 15
-            "EUR": 15,  # Currency
-            "GBP": 15,  # Currency
-            "USD": 15,  # Currency
-
-            # Security types - these would typically be values for tag 167
-            "EUSOV": 167,  # SecurityType
-            "EUSUP": 167,  # SecurityType
-            "MLEG": 167,  # SecurityType
-            "REPO": 167,  # SecurityType
-            "TBOND": 167,  # SecurityType
-            "TNOTE": 167,  # SecurityType
-            "GC": 167,  # SecurityType
-            "GCF": 167,  # SecurityType
-            "RB": 167,  # SecurityType
-            "RV": 167,  # SecurityType
-            "SPEC": 167,  # SecurityType
-        }
+        # Common FIXML to FIX tag mappings, used when a path is not in the FIXML schema
+        fixml_mappings = FIXML_FALLBACK_TAGS
 
         # Add the mappings to our dictionary
         self.field_to_tag.update(fixml_mappings)
+        self._tag_cache.clear()
         logger.info(f"Added {len(fixml_mappings)} FIXML-specific mappings")
 
     def extract_field_from_path(self, fixml_path):
@@ -160,6 +238,10 @@ class FIXMLToFIXConverter:
         """
         Map a FIXML path to a FIX tag.
 
+        The full path is resolved in its FIXML component context first; the
+        field-name lookup on the last segment is the fallback for paths outside
+        the schema.
+
         Args:
             fixml_path (str): FIXML path like "TrdCaptRpt/FinDetls/@EndDt"
 
@@ -167,27 +249,16 @@ class FIXMLToFIXConverter:
             str or int: FIX tag number or "Unknown" message
         """
         try:
+            if self.path_resolver is not None:
+                tag = self.path_resolver.resolve(fixml_path)
+                if tag is not None:
+                    return tag
+
             # Extract the field name
             field_name = self.extract_field_from_path(fixml_path)
 
             # Look up the tag number
-            tag = self.field_to_tag.get(field_name)
-            if tag is not None:
-                return tag
-
-            # Try normalized versions
-            normalized = field_name.lower()
-            tag = self.field_to_tag.get(normalized)
-            if tag is not None:
-                return tag
-
-            normalized = re.sub(r'[^a-zA-Z0-9]', '', field_name)
-            tag = self.field_to_tag.get(normalized)
-            if tag is not None:
-                return tag
-
-            normalized = re.sub(r'[^a-zA-Z0-9]', '', field_name).lower()
-            tag = self.field_to_tag.get(normalized)
+            tag = self.lookup_field_tag(field_name)
             if tag is not None:
                 return tag
 
@@ -197,45 +268,151 @@ class FIXMLToFIXConverter:
             logger.error(f"Error mapping {fixml_path}: {e}")
             return f"Error ({fixml_path})"
 
-    def convert_spreadsheet(self, input_file, output_file, fixml_column=None):
+    def lookup_field_tag(self, field_name):
+        """
+        Resolve a field name to a tag, trying the exact name first and then its
+        lower-case and punctuation-stripped forms.  Results are cached per name.
+
+        Returns:
+            int or None: The tag, or None if the name is unknown
+        """
+        try:
+            return self._tag_cache[field_name]
+        except KeyError:
+            pass
+
+        tag = None
+        for variant in name_variants(field_name):
+            tag = self.field_to_tag.get(variant)
+            if tag is not None:
+                break
+        self._tag_cache[field_name] = tag
+        return tag
+
+    def map_fixml_paths(self, paths):
+        """
+        Map a column of FIXML paths to FIX tags.
+
+        Each distinct path is mapped once and the results are broadcast back to
+        the rows, so repeated paths cost a single array lookup.
+
+        Args:
+            paths (Series): FIXML paths
+
+        Returns:
+            Series: FIX tags (or "Unknown"/"Error" messages), aligned with ``paths``
+        """
+        codes, uniques = pd.factorize(paths)
+        mapped = [self.map_fixml_to_fix_tag(path) for path in uniques]
+        if (codes < 0).any():
+            mapped.append(self.map_fixml_to_fix_tag(float('nan')))  # Code -1 marks missing cells
+        return pd.Series(pd.array(mapped, dtype=object)[codes], index=paths.index, dtype=object)
+
+    def convert_dataframe(self, df, fixml_column=None):
+        """
+        Add a FIX_Tag column to a dataframe of FIXML paths (in place).
+
+        Args:
+            df (DataFrame): Spreadsheet contents
+            fixml_column (str): Name of column containing FIXML paths, defaults
+                to the first column
+
+        Returns:
+            DataFrame: ``df`` with the FIX_Tag column
+
+        Raises:
+            KeyError: If ``fixml_column`` is not in the dataframe
+        """
+        # Determine which column contains FIXML paths
+        if fixml_column is None:
+            fixml_column = df.columns[0]  # Default to first column
+
+        logger.info(f"Using column '{fixml_column}' for FIXML paths")
+
+        # Add a new column with FIX tags, mapping each distinct path once
+        start = time.perf_counter()
+        df['FIX_Tag'] = self.map_fixml_paths(df[fixml_column])
+        elapsed = time.perf_counter() - start
+        logger.info(f"Mapped {len(df)} rows in {elapsed:.3f}s "
+                    f"({len(df) / max(elapsed, 1e-9):,.0f} rows/s)")
+        return df
+
+    def convert_spreadsheet(self, input_file, output_file, fixml_column=None, output_format=None,
+                            chunk_rows=CSV_CHUNK_ROWS):
         """
         Convert FIXML paths in a spreadsheet to FIX tags.
 
+        CSV input is read and written in chunks, so memory stays flat however
+        many paths the file holds.
+
         Args:
             input_file (str): Path to input spreadsheet (Excel or CSV)
-            output_file (str): Path to output spreadsheet (Excel)
+            output_file (str): Path to output file
             fixml_column (str): Name of column containing FIXML paths
+            output_format (str): One of ``OUTPUT_FORMATS``, defaults to the
+                format implied by the output file extension
+            chunk_rows (int): Rows per chunk when reading CSV input
 
         Returns:
-            DataFrame: The processed dataframe, or None on error
+            int: Number of rows converted, or None on error
         """
+        writer = None
         try:
+            output_format = output_format or output_format_for(output_file)
+            if output_format not in TABLE_WRITERS:
+                raise ValueError(f"Unsupported output format {output_format}; choose one of {', '.join(OUTPUT_FORMATS)}")
+
             # Read the input file
             logger.info(f"Reading input file: {input_file}")
 
             if input_file.lower().endswith('.csv'):
-                df = pd.read_csv(input_file)
+                chunks = pd.read_csv(input_file, chunksize=chunk_rows)
             else:
-                df = pd.read_excel(input_file)
-
-            # Determine which column contains FIXML paths
-            if fixml_column is None:
-                fixml_column = df.columns[0]  # Default to first column
+                chunks = [pd.read_excel(input_file)]
+
+            logger.info(f"Saving {output_format} output to: {output_file}")
+            writer = TABLE_WRITERS[output_format](output_file)
+            rows = 0
+            start = time.perf_counter()
+            for df in chunks:
+                writer.write(self.convert_dataframe(df, fixml_column))
+                rows += len(df)
+            writer.close()
+            writer = None
+
+            elapsed = time.perf_counter() - start
+            logger.info(f"Converted {rows} rows in {elapsed:.3f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+            return rows
 
-            logger.info(f"Using column '{fixml_column}' for FIXML paths")
+        except Exception as e:
+            logger.error(f"Error processing spreadsheet: {e}")
+            return None
 
-            # Add a new column with FIX tags
-            df['FIX_Tag'] = df[fixml_column].apply(self.map_fixml_to_fix_tag)
+        finally:
+            if writer is not None:
+                try:
+                    writer.close()
+                except Exception:
+                    pass
 
-            # Save to output file
-            logger.info(f"Saving output to: {output_file}")
-            df.to_excel(output_file, index=False)
+    def convert_fixml_messages(self, input_file, output_file, delimiter=SOH, workers=1):
+        """
+        Convert whole FIXML messages to FIX tag=value messages, one per line.
 
-            return df
+        Args:
+            input_file (str): FIXML file with one or more messages
+            output_file (str): Path to the output file
+            delimiter (str): Field delimiter of the written messages
+            workers (int): Worker processes for large files
 
+        Returns:
+            dict: Conversion statistics, or None on error
+        """
+        fix_version = self.dictionary.version if self.dictionary else None
+        try:
+            return convert_fixml_file(input_file, output_file, fix_version, delimiter, workers)
         except Exception as e:
-            logger.error(f"Error processing spreadsheet: {e}")
-            logger.error(str(e))
+            logger.error(f"Error converting FIXML messages: {e}")
             return None
 
 
@@ -244,15 +421,41 @@ def main():
     Main function for command-line interface.
     """
     parser = argparse.ArgumentParser(description='Convert FIXML paths to FIX tags')
-    parser.add_argument('input', help='Input spreadsheet file (Excel or CSV)')
-    parser.add_argument('output', help='Output spreadsheet file (Excel)')
-    parser.add_argument('--spec', help='URL to FIX specification', default=None)
+    parser.add_argument('input', help='Input spreadsheet file (Excel or CSV), or FIXML file with --messages')
+    parser.add_argument('output', help='Output file (Excel, CSV or Parquet by extension), or FIX message file with --messages')
+    parser.add_argument('--spec', help='URL to FIX specification (default: compiled local dictionary)', default=None)
+    parser.add_argument('--fix-version', choices=sorted(FIX_VERSIONS), default=None,
+                        help=f'FIX version of the local dictionary (default: {DEFAULT_FIX_VERSION})')
+    parser.add_argument('--rebuild-dictionary', action='store_true',
+                        help='Recompile the local FIX dictionary cache before converting')
     parser.add_argument('--column', help='Column containing FIXML paths', default=None)
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default=None,
+                        help='Output format (default: from the output file extension, else xlsx)')
+    parser.add_argument('--chunk-rows', type=int, default=CSV_CHUNK_ROWS,
+                        help=f'Rows per chunk when reading CSV input (default: {CSV_CHUNK_ROWS})')
+    parser.add_argument('--messages', action='store_true',
+                        help='Convert whole FIXML messages to FIX tag=value messages')
+    parser.add_argument('--delimiter', choices=['soh', 'pipe'], default='soh',
+                        help='Field delimiter of converted messages (default: soh)')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes for --messages (0 = one per CPU)')
 
     args = parser.parse_args()
 
-    converter = FIXMLToFIXConverter(args.spec)
-    result = converter.convert_spreadsheet(args.input, args.output, args.column)
+    converter = FIXMLToFIXConverter(args.spec, args.fix_version, args.rebuild_dictionary)
+
+    if args.messages:
+        delimiter = SOH if args.delimiter == 'soh' else '|'
+        workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+        stats = converter.convert_fixml_messages(args.input, args.output, delimiter, workers)
+        if stats is not None:
+            print(f"Converted {stats['messages']} messages ({stats['errors']} errors) at "
+                  f"{stats['messages_per_second']:,.0f} msgs/s. Results saved to {args.output}")
+        else:
+            print("Conversion failed. Check the logs for details.")
+        return
+
+    result = converter.convert_spreadsheet(args.input, args.output, args.column, args.format, args.chunk_rows)
 
     if result is not None:
         print(f"Conversion completed successfully. Results saved to {args.output}")
@@ -0,0 +1,451 @@
+"""
+FIXML message to FIX tag=value conversion.
+
+Each FIXML message element (e.g. ``TrdCaptRpt``) is resolved through the
+``FixmlPathResolver`` trie and laid out by the FIX dictionary: attributes
+become fields, non-repeating components are inlined, repeating elements
+become group instances with their NoXxx count, and the message is framed with
+BeginString, BodyLength and CheckSum.
+
+Files of many messages are split into messages as they are read, so memory
+stays bounded by the largest message, and batches of messages can be
+converted in a process pool.
+"""
+import argparse
+import codecs
+import logging
+import os
+import re
+import time
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+from fix_dictionary import COMPONENT, GROUP, load_dictionary
+from fixml_paths import FixmlPathResolver
+
+logger = logging.getLogger(__name__)
+
+SOH = '\x01'
+
+# FIX session protocol for each dictionary version (FIX 5.0+ runs over FIXT)
+BEGIN_STRINGS = {'FIX.4.4': 'FIX.4.4', 'FIX.5.0SP2': 'FIXT.1.1'}
+APPL_VER_IDS = {'FIX.5.0SP2': '9'}
+
+# Bytes read from the input per chunk while splitting messages
+READ_CHUNK_SIZE = 1 << 20
+
+# Messages per task when converting in a process pool
+BATCH_SIZE = 500
+
+FixConversion = namedtuple('FixConversion', ['msg_type', 'fields', 'message', 'unmapped'])
+
+# FIX field types whose FIXML (XML Schema) representation differs
+CONVERTED_TYPES = ('LOCALMKTDATE', 'UTCDATEONLY', 'DATE', 'MONTHYEAR', 'UTCTIMESTAMP', 'TZTIMESTAMP')
+
+_NOT_FOUND = object()
+_DATE_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})$')
+_MONTH_YEAR_RE = re.compile(r'^(\d{4})-(\d{2})(.*)$')
+_TIMESTAMP_RE = re.compile(r'^(\d{4})-(\d{2})-(\d{2})T(\d{2}:\d{2}(?::\d{2}(?:\.\d+)?)?)(Z|[+-]\d{2}:?\d{2})?$')
+
+
+def local_name(tag):
+    """Element name without its namespace ('{ns}TrdCaptRpt' -> 'TrdCaptRpt')"""
+    return tag.rpartition('}')[2]
+
+
+def fix_value(field_type, value):
+    """Convert a FIXML (XML Schema) value to its FIX tag=value representation"""
+    if field_type in ('LOCALMKTDATE', 'UTCDATEONLY', 'DATE'):
+        match = _DATE_RE.match(value)
+        return ''.join(match.groups()) if match else value
+    if field_type == 'MONTHYEAR':
+        match = _MONTH_YEAR_RE.match(value)
+        return ''.join(match.groups()) if match else value
+    if field_type in ('UTCTIMESTAMP', 'TZTIMESTAMP'):
+        match = _TIMESTAMP_RE.match(value)
+        if not match:
+            return value
+        year, month, day, clock, zone = match.groups()
+        if field_type == 'UTCTIMESTAMP' and zone and zone != 'Z':
+            # Normalise offset timestamps to UTC, keeping the given precision
+            try:
+                moment = datetime.fromisoformat(value).astimezone(timezone.utc)
+            except ValueError:
+                return value
+            fraction = clock.partition('.')[2]
+            stamp = moment.strftime('%Y%m%d-%H:%M:%S')
+            return f'{stamp}.{moment.strftime("%f")[:len(fraction)]}' if fraction else stamp
+        suffix = zone if field_type == 'TZTIMESTAMP' and zone else ''
+        return f'{year}{month}{day}-{clock}{suffix}'
+    return value
+
+
+def frame_message(begin_string, body_fields, delimiter=SOH):
+    """
+    Build a complete tag=value message.
+
+    Args:
+        begin_string (str): BeginString(8) value
+        body_fields: (tag, value) pairs from MsgType(35) onwards
+        delimiter (str): Field delimiter in the returned text; BodyLength and
+            CheckSum are always computed over the SOH-delimited form
+
+    Returns:
+        str: The framed message ending with CheckSum(10)
+    """
+    body = ''.join(f'{tag}={value}{SOH}' for tag, value in body_fields).encode('utf-8')
+    head = f'8={begin_string}{SOH}9={len(body)}{SOH}'.encode('utf-8')
+    checksum = (sum(head) + sum(body)) % 256
+    message = f'{head.decode("utf-8")}{body.decode("utf-8")}10={checksum:03d}{SOH}'
+    return message if delimiter == SOH else message.replace(SOH, delimiter)
+
+
+class _Scope:
+    """Field values and group instances collected for one message or group instance"""
+    __slots__ = ('fields', 'groups')
+
+    def __init__(self):
+        self.fields = {}  # tag -> value
+        self.groups = {}  # count tag -> [_Scope]
+
+
+class FixmlMessageEngine:
+    """
+    Converts FIXML message elements to FIX tag=value messages.
+
+    Args:
+        dictionary (FixDictionary): Defaults to ``load_dictionary()``
+        resolver (FixmlPathResolver): Defaults to one built on ``dictionary``
+        delimiter (str): Field delimiter of the produced messages
+    """
+
+    def __init__(self, dictionary=None, resolver=None, delimiter=SOH):
+        self.dictionary = dictionary or load_dictionary()
+        self.resolver = resolver or FixmlPathResolver(self.dictionary)
+        self.delimiter = delimiter
+        self.begin_string = BEGIN_STRINGS.get(self.dictionary.version, self.dictionary.version)
+        self._locations = {}
+        self._layouts = {}
+        self._converted = {tag: field[1] for tag, field in self.dictionary.fields.items()
+                           if field[1] in CONVERTED_TYPES}
+
+        # Schema root element -> MsgType, from the dictionary's message names
+        self.msg_types = {}
+        for abbr, node in self.resolver.roots.items():
+            msg_type = self.dictionary.message_type(node.type_name)
+            if msg_type is not None:
+                self.msg_types[abbr] = msg_type
+
+    def _locate(self, members, type_name):
+        """
+        Where an element of schema type ``type_name`` sits within ``members``.
+
+        Returns the GROUP member it is an instance of, None when it is an
+        inline component, or _NOT_FOUND.
+        """
+        key = (id(members), type_name)
+        location = self._locations.get(key, _NOT_FOUND)
+        if location is not _NOT_FOUND or key in self._locations:
+            return location
+
+        components = self.dictionary.components
+        location = _NOT_FOUND
+        for member in members:
+            if member[0] != COMPONENT:
+                continue
+            component = components.get(member[1], ())
+            single_group = len(component) == 1 and component[0][0] == GROUP
+            if member[1] == type_name:
+                location = component[0] if single_group else None
+            elif single_group:
+                # e.g. UnderlyingInstrument elements are instances of UndInstrmtGrp's group
+                if self._locate(component[0][3], type_name) is None:
+                    location = component[0]
+            else:
+                location = self._locate(component, type_name)
+            if location is not _NOT_FOUND:
+                break
+
+        self._locations[key] = location
+        return location
+
+    def _collect(self, element, node, scope, members, header, unmapped, path):
+        converted = self._converted
+        for abbr, value in element.attrib.items():
+            tag = node.attributes.get(abbr)
+            if tag is None:
+                unmapped.append(f'{path}/@{abbr}')
+                continue
+            field_type = converted.get(tag)
+            scope.fields[tag] = fix_value(field_type, value) if field_type else value
+
+        for child in element:
+            name = local_name(child.tag)
+            child_node = node.children.get(name)
+            child_path = f'{path}/{name}'
+            if child_node is None:
+                unmapped.append(child_path)
+                continue
+
+            if header is not None and name == 'Hdr':
+                self._collect(child, child_node, header, (), None, unmapped, child_path)
+                continue
+
+            location = self._locate(members, child_node.type_name)
+            if location is None or location is _NOT_FOUND:
+                # Non-repeating component: its fields belong to the current scope
+                component = self.dictionary.components.get(child_node.type_name, ())
+                self._collect(child, child_node, scope, component or members, None, unmapped, child_path)
+            else:
+                instance = _Scope()
+                scope.groups.setdefault(location[1], []).append(instance)
+                self._collect(child, child_node, instance, location[3], None, unmapped, child_path)
+
+    def _layout(self, members):
+        """
+        Position of every field and group count tag in a flattened layout.
+
+        Returns:
+            dict: tag -> (position, group members or None), first occurrence wins
+        """
+        layout = self._layouts.get(id(members))
+        if layout is None:
+            layout = {}
+            for member in self.dictionary.expand(members):
+                if member[1] not in layout:
+                    layout[member[1]] = (len(layout), member[3] if member[0] == GROUP else None)
+            self._layouts[id(members)] = (members, layout)
+        else:
+            layout = layout[1]
+        return layout
+
+    def _emit(self, scope, members, output):
+        """Append the scope's fields and groups to output in dictionary order, unknown tags last"""
+        layout = self._layout(members)
+        unplaced = len(layout)
+        keys = sorted(
+            list(scope.fields) + list(scope.groups),
+            key=lambda tag: layout.get(tag, (unplaced,))[0])
+        for tag in keys:
+            if tag in scope.groups:
+                group_members = layout[tag][1] if tag in layout and layout[tag][1] is not None else ()
+                instances = scope.groups[tag]
+                output.append((tag, str(len(instances))))
+                for instance in instances:
+                    self._emit(instance, group_members, output)
+            else:
+                output.append((tag, scope.fields[tag]))
+
+    def convert_element(self, element):
+        """
+        Convert one FIXML message element.
+
+        Returns:
+            FixConversion: MsgType, body (tag, value) pairs, the framed message
+            and the FIXML paths that had no mapping
+
+        Raises:
+            ValueError: If the element is not a known FIXML message
+        """
+        name = local_name(element.tag)
+        node = self.resolver.roots.get(name)
+        msg_type = self.msg_types.get(name)
+        if node is None or msg_type is None:
+            raise ValueError(f'Unsupported FIXML message: {name}')
+
+        _, _, members = self.dictionary.message(msg_type)
+        header, body, unmapped = _Scope(), _Scope(), []
+        self._collect(element, node, body, members, header, unmapped, name)
+
+        fields = [(35, msg_type)]
+        applied_version = APPL_VER_IDS.get(self.dictionary.version)
+        if applied_version and 1128 not in header.fields:
+            header.fields[1128] = applied_version
+        header.fields.pop(35, None)
+        self._emit(header, self.dictionary.header, fields)
+        self._emit(body, members, fields)
+
+        return FixConversion(msg_type, fields, frame_message(self.begin_string, fields, self.delimiter), unmapped)
+
+    def convert_string(self, fixml):
+        """Convert one FIXML message given as text"""
+        return self.convert_element(ET.fromstring(fixml))
+
+
+def iter_fixml_messages(stream, names, chunk_size=READ_CHUNK_SIZE):
+    """
+    Split a FIXML file into the text of each message element.
+
+    Messages may be bare, wrapped in ``FIXML``/``Batch`` or concatenated; only
+    the current chunk and the message being assembled are held in memory.
+
+    Args:
+        stream: Binary or text file object
+        names: Message element names to extract, e.g. ('TrdCaptRpt',)
+        chunk_size (int): Bytes read per chunk
+    """
+    alternatives = '|'.join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    start_re = re.compile(rf'<(?:[\w.-]+:)?({alternatives})(?=[\s/>])')
+    end_res = {name: re.compile(rf'</(?:[\w.-]+:)?{re.escape(name)}\s*>') for name in names}
+    # Characters split across chunks are completed by the next read
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    position = 0
+    exhausted = False
+
+    while True:
+        match = start_re.search(buffer, position)
+        if match:
+            tag_end = buffer.find('>', match.end())
+            if tag_end != -1:
+                if buffer[tag_end - 1] == '/':
+                    yield buffer[match.start():tag_end + 1]
+                    position = tag_end + 1
+                    continue
+                close = end_res[match.group(1)].search(buffer, tag_end)
+                if close:
+                    yield buffer[match.start():close.end()]
+                    position = close.end()
+                    continue
+            # Keep the partial message and read more
+            buffer, position = buffer[match.start():], 0
+        else:
+            # Keep a tail that could hold the start of a split start tag
+            keep = max(len(buffer) - position, 0)
+            buffer, position = buffer[-min(keep, 256):] if keep else '', 0
+
+        if exhausted:
+            if match:
+                logger.warning(f'Input ended inside a {match.group(1)} message')
+            return
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            exhausted = True
+            buffer += decoder.decode(b'', final=True)  # Raises if the input ends mid-character
+            continue
+        buffer += decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+
+
+_worker_engine = None
+
+
+def _init_worker(fix_version, delimiter):
+    global _worker_engine
+    _worker_engine = FixmlMessageEngine(load_dictionary(fix_version), delimiter=delimiter)
+
+
+def _convert_batch(messages):
+    results = []
+    for text in messages:
+        try:
+            results.append(_worker_engine.convert_string(text))
+        except (ET.ParseError, ValueError) as e:
+            results.append(e)
+    return results
+
+
+def _batches(messages, size):
+    batch = []
+    for message in messages:
+        batch.append(message)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert_fixml_stream(stream, engine=None, workers=1, batch_size=BATCH_SIZE, fix_version=None):
+    """
+    Convert every message in a FIXML stream, in input order.
+
+    Args:
+        stream: Binary or text file object
+        engine (FixmlMessageEngine): Engine for in-process conversion
+        workers (int): Process pool size; 1 converts in-process
+        batch_size (int): Messages per pool task
+        fix_version (str): Dictionary version used by pool workers
+
+    Yields:
+        FixConversion, or the exception raised for a message that could not
+        be parsed or converted
+    """
+    engine = engine or FixmlMessageEngine(load_dictionary(fix_version))
+    messages = iter_fixml_messages(stream, engine.msg_types)
+
+    if workers <= 1:
+        for text in messages:
+            try:
+                yield engine.convert_string(text)
+            except (ET.ParseError, ValueError) as e:
+                yield e
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(engine.dictionary.version, engine.delimiter)) as executor:
+        # Bounded look-ahead keeps memory flat while every worker stays busy
+        pending = []
+        for batch in _batches(messages, batch_size):
+            pending.append(executor.submit(_convert_batch, batch))
+            if len(pending) >= workers * 2:
+                yield from pending.pop(0).result()
+        for future in pending:
+            yield from future.result()
+
+
+def convert_fixml_file(input_file, output_file, fix_version=None, delimiter=SOH, workers=1):
+    """
+    Convert a FIXML file to a file of tag=value messages, one per line.
+
+    Returns:
+        dict: Message, error and unmapped-path counts, elapsed seconds and
+        messages per second
+    """
+    engine = FixmlMessageEngine(load_dictionary(fix_version), delimiter=delimiter)
+    stats = {'messages': 0, 'errors': 0, 'unmapped_paths': 0}
+    start = time.perf_counter()
+
+    with open(input_file, 'rb') as source, open(output_file, 'w', encoding='utf-8', newline='\n') as target:
+        for result in convert_fixml_stream(source, engine, workers):
+            if isinstance(result, Exception):
+                stats['errors'] += 1
+                logger.error(f'Could not convert message: {result}')
+                continue
+            stats['messages'] += 1
+            stats['unmapped_paths'] += len(result.unmapped)
+            target.write(result.message)
+            target.write('\n')
+
+    elapsed = time.perf_counter() - start
+    stats['elapsed'] = round(elapsed, 3)
+    stats['messages_per_second'] = round(stats['messages'] / max(elapsed, 1e-9), 1)
+    logger.info(f"Converted {stats['messages']} messages in {elapsed:.3f}s "
+                f"({stats['messages_per_second']:,.0f} msgs/s, {stats['errors']} errors)")
+    return stats
+
+
+def main():
+    """
+    Command-line interface for converting FIXML message files.
+    """
+    parser = argparse.ArgumentParser(description='Convert FIXML messages to FIX tag=value messages')
+    parser.add_argument('input', help='FIXML file with one or more messages')
+    parser.add_argument('output', help='Output file, one FIX message per line')
+    parser.add_argument('--fix-version', default=None, help='FIX dictionary version')
+    parser.add_argument('--delimiter', choices=['soh', 'pipe'], default='soh', help='Field delimiter')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes (default: 1)')
+
+    args = parser.parse_args()
+
+    delimiter = SOH if args.delimiter == 'soh' else '|'
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    stats = convert_fixml_file(args.input, args.output, args.fix_version, delimiter, workers)
+    print(f"Converted {stats['messages']} messages ({stats['errors']} errors) "
+          f"at {stats['messages_per_second']:,.0f} msgs/s. Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,251 @@
+"""
+Context-aware resolution of FIXML paths to FIX tags.
+
+FIXML abbreviates attributes per component, so the same attribute means
+different fields in different places (``Instrmt/@ID`` is SecurityID(48),
+``Pty/@ID`` is PartyID(448)).  The FIXML schema - each complex type's
+attribute abbreviations and child elements - is compiled against a
+``FixDictionary`` into a trie of element nodes, and a full path such as
+``TrdCaptRpt/RptSide/Pty/@ID`` resolves with one dictionary probe per segment.
+
+The schema is read from ``fix_spec/fixml_schema.json``, which covers the
+trade capture messages used here.  It can be regenerated from the full FIXML
+schema files with::
+
+    python fixml_paths.py --xsd-dir <directory with the FIXML .xsd files>
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import xml.etree.ElementTree as ET
+
+from fix_dictionary import FIX_SPEC_DIR, load_dictionary
+
+logger = logging.getLogger(__name__)
+
+FIXML_SCHEMA_PATH = os.path.join(FIX_SPEC_DIR, 'fixml_schema.json')
+
+# Envelope elements that carry no field context
+FIXML_ENVELOPE = ('FIXML', 'Batch')
+
+# Common FIXML attribute abbreviations -> FIX tags, used by name-based lookups
+# when a path is not in the FIXML schema
+FIXML_FALLBACK_TAGS = {
+    # Date/Time fields
+    "EndDt": 917,  # EndDate
+    "StartDt": 916,  # StartDate
+
+    # Header fields
+    "SID": 49,  # SenderCompID
+    "SSub": 50,  # SenderSubID
+    "Snt": 52,  # SendingTime
+    "TID": 1003,  # TradeID
+
+    # Instrument fields
+    "AltIDSrc": 456,  # SecurityAltIDSource
+    "AltID": 455,  # SecurityAltID
+    "CFI": 461,  # CFICode
+    "Desc": 107,  # SecurityDesc
+    "Exch": 207,  # SecurityExchange
+    "ID": 48,  # SecurityID
+    "PxQteCcy": 1524,  # PriceQuoteCurrency
+    "SecTyp": 167,  # SecurityType
+    "Src": 22,  # SecurityIDSource
+    "SubTyp": 762,  # SecuritySubType
+    "Sym": 55,  # Symbol
+}
+
+_XS = '{http://www.w3.org/2001/XMLSchema}'
+
+
+def load_fixml_schema(path=None):
+    """Load the FIXML schema summary ({'roots': ..., 'types': ...})"""
+    path = path or os.environ.get('FIXML_SCHEMA') or FIXML_SCHEMA_PATH
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _type_name(qualified):
+    """'fm:Instrument_Block_t' -> 'Instrument', 'Symbol_t' -> 'Symbol'"""
+    name = qualified.split(':')[-1]
+    for suffix in ('_Block_t', '_message_t', '_t'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def load_fixml_xsd(directory):
+    """
+    Summarise the FIXML schema files in ``directory`` in the
+    ``fixml_schema.json`` format.
+
+    Attribute and element groups and ``extension`` bases are followed, so each
+    type lists every attribute abbreviation (mapped to the FIX field named by
+    its ``<Field>_t`` type) and child element it allows.  Only types reachable
+    from message elements are kept.
+    """
+    complex_types, groups, attribute_groups, roots = {}, {}, {}, {}
+    for path in sorted(glob.glob(os.path.join(directory, '*.xsd'))):
+        for child in ET.parse(path).getroot():
+            name = child.get('name')
+            if child.tag == _XS + 'complexType':
+                complex_types[name] = child
+            elif child.tag == _XS + 'group':
+                groups[name] = child
+            elif child.tag == _XS + 'attributeGroup':
+                attribute_groups[name] = child
+            elif child.tag == _XS + 'element' and child.get('type', '').endswith('_message_t'):
+                roots[name] = _type_name(child.get('type'))
+
+    def collect(node, attributes, elements):
+        for child in node:
+            ref = child.get('ref', '').split(':')[-1]
+            if child.tag == _XS + 'attribute' and child.get('name') and child.get('type'):
+                attributes[child.get('name')] = _type_name(child.get('type'))
+            elif child.tag == _XS + 'attributeGroup' and ref in attribute_groups:
+                collect(attribute_groups[ref], attributes, elements)
+            elif child.tag == _XS + 'element' and child.get('name') and child.get('type'):
+                elements[child.get('name')] = _type_name(child.get('type'))
+            elif child.tag == _XS + 'group' and ref in groups:
+                collect(groups[ref], attributes, elements)
+            else:
+                if child.tag == _XS + 'extension':
+                    base = child.get('base', '').split(':')[-1]
+                    if base in complex_types:
+                        collect(complex_types[base], attributes, elements)
+                collect(child, attributes, elements)
+
+    summarised = {_type_name(name): node for name, node in complex_types.items()}
+    types = {}
+    pending = list(roots.values())
+    while pending:
+        type_name = pending.pop()
+        if type_name in types or type_name not in summarised:
+            continue
+        attributes, elements = {}, {}
+        collect(summarised[type_name], attributes, elements)
+        types[type_name] = {'attributes': attributes, 'elements': elements}
+        pending.extend(elements.values())
+
+    return {'roots': roots, 'types': types}
+
+
+class _FixmlNode:
+    __slots__ = ('type_name', 'attributes', 'children')
+
+    def __init__(self, type_name):
+        self.type_name = type_name
+        self.attributes = {}  # attribute abbreviation -> tag
+        self.children = {}  # element abbreviation -> node
+
+
+class FixmlPathResolver:
+    """
+    FIXML paths resolved to tags through a trie compiled from the schema.
+
+    Nodes are built once per schema type and shared wherever that type is
+    used.  Paths may start at a message element (``TrdCaptRpt/...``), inside
+    the ``FIXML``/``Batch`` envelope, or at any element of the schema
+    (``Pty/@ID``).
+    """
+
+    def __init__(self, dictionary=None, schema=None):
+        self.dictionary = dictionary or load_dictionary()
+        schema = schema or load_fixml_schema()
+        types = schema['types']
+        nodes = {}
+        unknown_fields = set()
+
+        def build(type_name):
+            node = nodes.get(type_name)
+            if node is None:
+                node = nodes[type_name] = _FixmlNode(type_name)
+                spec = types.get(type_name, {})
+                for abbr, field_name in spec.get('attributes', {}).items():
+                    tag = self.dictionary.lookup.get(field_name)
+                    if tag is None:
+                        unknown_fields.add(field_name)
+                    else:
+                        node.attributes[abbr] = tag
+                for abbr, child_type in spec.get('elements', {}).items():
+                    node.children[abbr] = build(child_type)
+            return node
+
+        self.roots = {abbr: build(type_name) for abbr, type_name in schema['roots'].items()}
+
+        # Entry points for paths that do not start at a message element
+        self.elements = {}
+        for node in nodes.values():
+            for abbr, child in node.children.items():
+                self.elements.setdefault(abbr, child)
+
+        self.nodes = nodes
+        if unknown_fields:
+            logger.warning(f"{len(unknown_fields)} FIXML schema fields are not in the "
+                           f"{self.dictionary.version} dictionary")
+
+    def node(self, path):
+        """
+        Walk the element part of ``path``.
+
+        Returns:
+            tuple: (node, attribute) where attribute is the trailing ``@name``
+            without the ``@`` (or None), and node is None if the element chain
+            is not in the schema
+        """
+        segments = [segment.strip() for segment in path.strip().strip('/').split('/')]
+        attribute = None
+        if segments[-1].startswith('@'):
+            attribute = segments.pop()[1:]
+
+        start = 0
+        while start < len(segments) - 1 and segments[start] in FIXML_ENVELOPE:
+            start += 1
+        if start >= len(segments):
+            return None, attribute
+
+        node = self.roots.get(segments[start]) or self.elements.get(segments[start])
+        for segment in segments[start + 1:]:
+            if node is None:
+                break
+            node = node.children.get(segment)
+        return node, attribute
+
+    def resolve(self, path):
+        """Tag for a FIXML attribute path, or None if it is not in the schema"""
+        node, attribute = self.node(path)
+        if node is None or attribute is None:
+            return None
+        return node.attributes.get(attribute)
+
+
+def main():
+    """
+    Command-line interface: regenerate the schema summary, or resolve paths.
+    """
+    parser = argparse.ArgumentParser(description='Compile or query the FIXML path-to-tag schema')
+    parser.add_argument('paths', nargs='*', help='FIXML paths to resolve, e.g. TrdCaptRpt/RptSide/Pty/@ID')
+    parser.add_argument('--xsd-dir', help='Directory with the FIXML .xsd files to summarise')
+    parser.add_argument('--output', default=FIXML_SCHEMA_PATH, help='Where to write the schema summary')
+
+    args = parser.parse_args()
+
+    if args.xsd_dir:
+        schema = load_fixml_xsd(args.xsd_dir)
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(schema, file, indent=2, sort_keys=True)
+        print(f"Wrote {len(schema['roots'])} messages and {len(schema['types'])} types to {args.output}")
+
+    if args.paths:
+        resolver = FixmlPathResolver()
+        for path in args.paths:
+            tag = resolver.resolve(path)
+            name = resolver.dictionary.name(tag) if tag is not None else 'Unknown'
+            print(f"{path}\t{tag if tag is not None else '-'}\t{name}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
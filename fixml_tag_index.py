@@ -0,0 +1,342 @@
+"""
+Reverse index from FIX tags to the FIXML paths that carry them.
+
+The index is built from two sources: every attribute path in the compiled
+FIXML schema trie (see ``fixml_paths``), and every FIXML path found in the
+mapping spreadsheets, resolved as the converter resolves them.  It is
+written next to the compiled dictionaries and rebuilt when the dictionary,
+the schema or a spreadsheet changes, so answering "which paths carry tag
+448?" is a dictionary lookup::
+
+    python fixml_tag_index.py 448 55 PartyRole --spreadsheet fixml.xlsx
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+
+import pandas as pd
+
+from fix_dictionary import DEFAULT_CACHE_DIR, load_dictionary, name_variants
+from fixml_paths import FIXML_FALLBACK_TAGS, FIXML_SCHEMA_PATH, FixmlPathResolver
+
+logger = logging.getLogger(__name__)
+
+# Bump when the persisted layout changes so stale indexes are rebuilt
+INDEX_VERSION = 2
+
+SCHEMA_SOURCE = 'schema'
+
+# Recorded for indexes built with ``default_mapper``
+DEFAULT_MAPPER = 'default'
+
+# Spreadsheet cells that look like FIXML paths: 'TrdCaptRpt/Instrmt/@Exch', 'Pty/@ID'
+_PATH_PATTERN = re.compile(r'^\s*/?[A-Za-z]\w*(?:/[A-Za-z]\w*)*/@?[A-Za-z]\w*\s*$')
+
+# Characters of a mapper id not used in index file names
+_UNSAFE_NAME = re.compile(r'[^\w.]+')
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _source_stamp(paths):
+    return [[os.path.abspath(path), os.path.getsize(path), os.stat(path).st_mtime_ns]
+            for path in paths if os.path.exists(path)]
+
+
+def _schema_path():
+    return os.environ.get('FIXML_SCHEMA') or FIXML_SCHEMA_PATH
+
+
+def mapper_id(mapper):
+    """Name of the mapper an index is built with, e.g. 'module.Class.method'; ``DEFAULT_MAPPER`` for None"""
+    if mapper is None:
+        return DEFAULT_MAPPER
+    return f"{getattr(mapper, '__module__', '')}.{getattr(mapper, '__qualname__', type(mapper).__name__)}"
+
+
+def index_path_for(version, cache_dir=None, mapper=DEFAULT_MAPPER):
+    """Where the index for a FIX version and mapper (a ``mapper_id``) is persisted"""
+    cache_dir = cache_dir or os.environ.get('FIX_DICTIONARY_CACHE') or DEFAULT_CACHE_DIR
+    name = f'fixml_tag_index.{version}'
+    if mapper != DEFAULT_MAPPER:
+        name = f"{name}.{_UNSAFE_NAME.sub('_', mapper)}"
+    return os.path.join(cache_dir, f'{name}.v{INDEX_VERSION}.json')
+
+
+def schema_paths(resolver):
+    """
+    Every attribute path of the schema trie as (path, attribute, tag).
+
+    Paths start at message elements; a type is not re-entered below itself,
+    so recursive components are listed once per route.
+    """
+    found = []
+    pending = [(abbr, node, (node.type_name,)) for abbr, node in sorted(resolver.roots.items(), reverse=True)]
+    while pending:
+        path, node, types = pending.pop()
+        for attribute, tag in sorted(node.attributes.items()):
+            found.append((f'{path}/@{attribute}', attribute, tag))
+        for abbr, child in sorted(node.children.items(), reverse=True):
+            if child.type_name not in types:
+                pending.append((f'{path}/{abbr}', child, types + (child.type_name,)))
+    return found
+
+
+def spreadsheet_paths(path, column=None):
+    """
+    Distinct FIXML paths in a mapping spreadsheet (every sheet of a workbook).
+
+    Args:
+        path (str): Excel or CSV file
+        column (str): Only read this column; by default every cell that looks
+            like a FIXML path is taken
+
+    Returns:
+        list: (path, sheet) pairs in first-seen order
+    """
+    if path.lower().endswith('.csv'):
+        sheets = {os.path.basename(path): pd.read_csv(path, dtype=str, usecols=[column] if column else None)}
+    else:
+        sheets = pd.read_excel(path, sheet_name=None, dtype=str)
+
+    found = {}
+    for sheet, df in sheets.items():
+        columns = [column] if column else df.columns
+        for name in columns:
+            if name not in df.columns:
+                continue
+            for value in df[name].dropna().unique():
+                if _PATH_PATTERN.match(value):
+                    found.setdefault(value.strip().strip('/'), sheet)
+    return list(found.items())
+
+
+def default_mapper(resolver):
+    """
+    FIXML path -> tag as the converter maps it: the schema first, then the
+    last segment's name in the dictionary with ``FIXML_FALLBACK_TAGS`` on top.
+    """
+    lookup = {**resolver.dictionary.lookup, **FIXML_FALLBACK_TAGS}
+
+    def mapper(path):
+        tag = resolver.resolve(path)
+        if tag is None:
+            field_name = path.split('@')[-1] if '@' in path else path.split('/')[-1]
+            tag = next((lookup[variant] for variant in name_variants(field_name) if variant in lookup), None)
+        return tag
+
+    return mapper
+
+
+def build_tag_index(resolver=None, spreadsheets=(), mapper=None, column=None):
+    """
+    Build the reverse index.
+
+    Args:
+        resolver (FixmlPathResolver): Schema trie (default: the bundled schema)
+        spreadsheets: Mapping spreadsheets whose FIXML paths are added
+        mapper: Callable mapping a spreadsheet path to a tag (or a non-int
+            for unknown paths); defaults to ``default_mapper(resolver)``
+        column (str): Spreadsheet column holding the paths (default: any)
+
+    Returns:
+        dict: The persisted form - ``tags`` maps tag -> path -> [attribute,
+        sources], ``unmapped`` lists spreadsheet paths with no tag
+    """
+    resolver = resolver or FixmlPathResolver()
+    mapper_name = mapper_id(mapper)
+    mapper = mapper or default_mapper(resolver)
+    tags = {}
+    unmapped = []
+
+    def add(tag, path, attribute, source):
+        entry = tags.setdefault(str(tag), {}).setdefault(path, [attribute, []])
+        if source not in entry[1]:
+            entry[1].append(source)
+
+    for path, attribute, tag in schema_paths(resolver):
+        add(tag, path, attribute, SCHEMA_SOURCE)
+
+    for spreadsheet in spreadsheets:
+        name = os.path.basename(spreadsheet)
+        for path, sheet in spreadsheet_paths(spreadsheet, column):
+            tag = mapper(path)
+            source = name if sheet == name else f'{name}:{sheet}'
+            if isinstance(tag, int):
+                attribute = path.split('@')[-1] if '@' in path else None
+                add(tag, path, attribute, source)
+            else:
+                unmapped.append([path, source])
+
+    return {
+        'index_version': INDEX_VERSION,
+        'version': resolver.dictionary.version,
+        'source': _source_stamp([_schema_path(), *spreadsheets]),
+        'spreadsheets': [os.path.abspath(path) for path in spreadsheets],
+        'mapper': mapper_name,
+        'tags': tags,
+        'unmapped': unmapped,
+    }
+
+
+class FixmlTagIndex:
+    """
+    Tag -> FIXML paths lookups over a built index.
+
+    Args:
+        data (dict): ``build_tag_index`` output
+        dictionary (FixDictionary): For field names; the index's version by default
+    """
+
+    def __init__(self, data, dictionary=None):
+        self.data = data
+        self.dictionary = dictionary or load_dictionary(data['version'])
+        self.tags = {int(tag): paths for tag, paths in data['tags'].items()}
+
+    def __len__(self):
+        return len(self.tags)
+
+    def tag(self, query):
+        """Tag for a number or field name (any case / punctuation), or None"""
+        if isinstance(query, int):
+            return query
+        query = str(query).strip()
+        if query.isdigit():
+            return int(query)
+        lookup = self.dictionary.lookup
+        return next((lookup[variant] for variant in name_variants(query) if variant in lookup), None)
+
+    def paths(self, query):
+        """
+        The FIXML paths carrying one tag.
+
+        Returns:
+            dict: ``tag``, ``name``, ``attributes`` (distinct abbreviations)
+            and ``paths`` as [{path, attribute, sources}]; ``tag`` is None
+            for unknown names
+        """
+        tag = self.tag(query)
+        entries = self.tags.get(tag, {}) if tag is not None else {}
+        paths = [{'path': path, 'attribute': attribute, 'sources': sources}
+                 for path, (attribute, sources) in sorted(entries.items())]
+        return {
+            'query': query,
+            'tag': tag,
+            'name': self.dictionary.name(tag) if tag is not None else None,
+            'attributes': sorted({entry['attribute'] for entry in paths if entry['attribute']}),
+            'paths': paths,
+        }
+
+    def lookup(self, queries):
+        """``paths`` for each of many tags or names, in order"""
+        return [self.paths(query) for query in queries]
+
+
+def _is_current(data, version, spreadsheets, mapper):
+    if data.get('index_version') != INDEX_VERSION or data.get('version') != version:
+        return False
+    if data.get('mapper') != mapper:
+        return False
+    if data.get('spreadsheets') != [os.path.abspath(path) for path in spreadsheets]:
+        return False
+    return data.get('source') == _source_stamp([_schema_path(), *spreadsheets])
+
+
+def load_tag_index(version=None, spreadsheets=(), index_path=None, rebuild=False, mapper=None, resolver=None,
+                   column=None):
+    """
+    Return the ``FixmlTagIndex`` for a dictionary and set of spreadsheets.
+
+    The persisted index is used when it is current and rebuilt otherwise;
+    loaded indexes are shared within the process until a source changes.
+    Indexes built with a custom mapper are persisted apart from the default.
+
+    Args:
+        version (str): FIX dictionary version (``load_dictionary``'s default)
+        spreadsheets: Mapping spreadsheets to include
+        index_path (str): Where the index is persisted (``index_path_for``)
+        rebuild (bool): Rebuild even if the persisted index is current
+        mapper: Spreadsheet path -> tag mapping (see ``build_tag_index``)
+        resolver (FixmlPathResolver): Schema trie to build from
+        column (str): Spreadsheet column holding the paths
+    """
+    dictionary = resolver.dictionary if resolver else load_dictionary(version)
+    spreadsheets = [path for path in spreadsheets if os.path.exists(path)]
+    mapper_name = mapper_id(mapper)
+    index_path = index_path or index_path_for(dictionary.version, mapper=mapper_name)
+
+    with _indexes_lock:
+        index = _indexes.get(index_path)
+        if not rebuild and index is not None and _is_current(index.data, dictionary.version, spreadsheets,
+                                                             mapper_name):
+            return index
+
+        data = None
+        if not rebuild and os.path.exists(index_path):
+            try:
+                with open(index_path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+            except (OSError, ValueError) as e:
+                logger.warning(f'Ignoring unreadable FIXML tag index {index_path}: {e}')
+            if data is not None and not _is_current(data, dictionary.version, spreadsheets, mapper_name):
+                data = None
+
+        if data is None:
+            data = build_tag_index(resolver or FixmlPathResolver(dictionary), spreadsheets, mapper, column)
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            temp_path = f'{index_path}.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(temp_path, index_path)
+            logger.info(f"Indexed {sum(len(paths) for paths in data['tags'].values())} FIXML paths for "
+                        f"{len(data['tags'])} tags ({len(data['unmapped'])} unmapped) -> {index_path}")
+
+        index = _indexes[index_path] = FixmlTagIndex(data, dictionary)
+        return index
+
+
+def main():
+    """
+    Command-line interface: look up the FIXML paths of many tags at once.
+    """
+    parser = argparse.ArgumentParser(description='Find the FIXML paths that carry FIX tags')
+    parser.add_argument('tags', nargs='*', help='Tag numbers or field names, e.g. 448 PartyRole')
+    parser.add_argument('--tags-file', help='File with one tag or field name per line')
+    parser.add_argument('--spreadsheet', action='append', default=[], help='Mapping spreadsheet to include '
+                                                                            '(repeatable)')
+    parser.add_argument('--column', help='Spreadsheet column holding FIXML paths (default: any cell)')
+    parser.add_argument('--fix-version', default=None, help='FIX dictionary version')
+    parser.add_argument('--index', help='Index file (default: next to the compiled dictionaries)')
+    parser.add_argument('--rebuild', action='store_true', help='Rebuild the index even if it is current')
+    parser.add_argument('--json', action='store_true', help='Print the results as JSON')
+
+    args = parser.parse_args()
+
+    queries = list(args.tags)
+    if args.tags_file:
+        with open(args.tags_file, 'r', encoding='utf-8') as file:
+            queries.extend(line.strip() for line in file if line.strip())
+
+    index = load_tag_index(args.fix_version, args.spreadsheet, args.index, args.rebuild, column=args.column)
+    results = index.lookup(queries)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for result in results:
+        if result['tag'] is None:
+            print(f"{result['query']}\tUnknown field")
+            continue
+        if not result['paths']:
+            print(f"{result['tag']}\t{result['name'] or ''}\t-")
+        for entry in result['paths']:
+            print(f"{result['tag']}\t{result['name'] or ''}\t{entry['path']}\t{','.join(entry['sources'])}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
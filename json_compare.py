@@ -0,0 +1,1028 @@
+"""
+Streaming helpers for the CDO JSON comparison tool.
+
+Documents are flattened into (path, value) pairs with an explicit stack, so
+deeply nested input never hits the recursion limit.  When ijson is available
+the pairs are produced straight from the incremental parser; the pairs are
+then sorted by path (spilling sorted runs to disk for very large documents)
+so two documents can be diffed with a single merge pass.
+
+Arrays are indexed by position by default.  An ``ArrayAligner`` labels
+elements by an identity key or a structural hash instead, so an element
+inserted near the top of an array does not shift every later path.
+
+Named exclusion profiles are stored server-side and compiled into a
+``PathTrie``; excluded subtrees are skipped while flattening.
+
+Uploaded documents can be indexed once with ``JsonPathIndex`` so the path
+picker and exclusion UIs can look up thousands of paths per request.
+
+Newline-delimited exports are compared record by record with
+``compare_ndjson_streams``: records are hash-partitioned by id on disk and
+each partition pair is diffed in a worker process.
+"""
+import bisect
+import hashlib
+import heapq
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from fnmatch import fnmatchcase
+from operator import itemgetter
+
+from deepdiff import DeepDiff
+
+try:
+    import ijson
+except ImportError:  # Fall back to json.load when ijson is not installed
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+# Number of flattened pairs kept in memory before a sorted run is spilled to disk
+SORT_CHUNK_SIZE = 200000
+
+# Exceptions raised for malformed input by whichever parser is in use
+JSON_ERRORS = (json.JSONDecodeError, ijson.JSONError) if ijson else (json.JSONDecodeError,)
+
+# Values accepted for the array_mode option of /compare_json
+ARRAY_MODES = ('index', 'key', 'hash', 'deepdiff')
+
+# NDJSON comparison: number of id partitions, bytes per raw chunk handed to a
+# worker, and how many ids / record diffs are returned as examples
+NDJSON_PARTITIONS = 64
+NDJSON_CHUNK_BYTES = 32 * 1024 * 1024
+NDJSON_SAMPLE_LIMIT = 100
+
+_INDEX_SEGMENT_RE = re.compile(r'\[[^\]]*\]')
+
+_path_key = itemgetter(0)
+
+
+def key_path(prefix, key):
+    """Build the dotted path of a dictionary member"""
+    return f"{prefix}.{key}" if prefix else str(key)
+
+
+def structural_hash(value):
+    """Return a short, key-order independent hash of a JSON value"""
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':'))
+    return hashlib.blake2b(canonical.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ArrayAligner:
+    """
+    Labels array elements by identity instead of position.
+
+    Objects carrying one of the identity ``keys`` are labelled ``key=value``,
+    scalars by their JSON literal (``="USD"``) and any other container by its
+    structural hash (``#1f2e...``).
+    Repeated labels within one array get an occurrence suffix (``~1``, ``~2``)
+    so duplicates are still paired up one-to-one.
+    """
+
+    def __init__(self, keys=None):
+        self.keys = tuple(keys or ())
+
+    def label(self, element, seen):
+        label = None
+        if isinstance(element, dict):
+            for key in self.keys:
+                value = element.get(key)
+                if value is not None and not isinstance(value, (dict, list)):
+                    label = f"{key}={value}"
+                    break
+        elif not isinstance(element, list):
+            label = '=' + json.dumps(element)
+        if label is None:
+            label = '#' + structural_hash(element)
+
+        occurrence = seen.get(label, 0)
+        seen[label] = occurrence + 1
+        return label if occurrence == 0 else f"{label}~{occurrence}"
+
+
+# Returned by PathTrie.step when the segment lands inside an excluded subtree
+EXCLUDED = object()
+
+_SEGMENT_RE = re.compile(r'\[[^\]]*\]|[^.\[]+')
+
+
+def split_path(path):
+    """Split a flattened path into key segments and bracketed [index] segments"""
+    return _SEGMENT_RE.findall(path)
+
+
+class _TrieNode:
+    __slots__ = ('children', 'globs', 'deep', 'loop', 'terminal')
+
+    def __init__(self, loop=False):
+        self.children = {}
+        self.globs = []
+        self.deep = None
+        self.loop = loop
+        self.terminal = False
+
+
+class PathTrie:
+    """
+    Exclusion patterns compiled into a trie of path segments.
+
+    Patterns use the flattened path syntax (``a.b[0].c``) with globs:
+    ``*`` matches one key, ``[*]`` / ``[1?]`` / ``[id=*]`` match array
+    segments and ``**`` matches any number of segments.  A path is excluded
+    as soon as a prefix of it reaches the end of a pattern, so whole subtrees
+    are dropped at their root.
+
+    Matching is incremental: ``start()`` returns the active states for the
+    document root and ``step()`` advances them by one segment, returning
+    ``EXCLUDED`` or the (possibly empty) tuple of states for the child.
+    Transitions are memoised, since documents repeat the same keys.
+    """
+
+    # Memoised transitions kept before the memo is reset
+    MAX_MEMO_SIZE = 100000
+
+    def __init__(self, patterns=()):
+        self.root = _TrieNode()
+        self.patterns = []
+        self._memo = {}
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern):
+        if not isinstance(pattern, str) or not split_path(pattern):
+            raise ValueError(f"Invalid exclusion pattern: {pattern!r}")
+
+        node = self.root
+        for token in split_path(pattern):
+            if token == '**':
+                if node.deep is None:
+                    node.deep = _TrieNode(loop=True)
+                node = node.deep
+                continue
+
+            is_index = token.startswith('[')
+            inner = token[1:-1] if is_index else token
+            if any(char in inner for char in '*?['):
+                for glob_is_index, glob, child in node.globs:
+                    if glob_is_index == is_index and glob == inner:
+                        node = child
+                        break
+                else:
+                    child = _TrieNode()
+                    node.globs.append((is_index, inner, child))
+                    node = child
+            else:
+                node = node.children.setdefault(token, _TrieNode())
+
+        node.terminal = True
+        self.patterns.append(pattern)
+        self._memo.clear()
+
+    def start(self):
+        return self._closure([self.root])
+
+    def step(self, states, segment):
+        memo_key = (states, segment)
+        result = self._memo.get(memo_key)
+        if result is None:
+            if len(self._memo) >= self.MAX_MEMO_SIZE:
+                self._memo.clear()
+            result = self._memo[memo_key] = self._step(states, segment)
+        return result
+
+    def _step(self, states, segment):
+        is_index = segment.startswith('[')
+        inner = segment[1:-1] if is_index else segment
+
+        matched = []
+        for node in states:
+            child = node.children.get(segment)
+            if child is not None:
+                matched.append(child)
+            for glob_is_index, glob, child in node.globs:
+                if glob_is_index == is_index and fnmatchcase(inner, glob):
+                    matched.append(child)
+            if node.loop:
+                matched.append(node)
+
+        closure = self._closure(matched)
+        if any(node.terminal for node in closure):
+            return EXCLUDED
+        return closure
+
+    def matches(self, path):
+        """Return True when ``path`` lies inside an excluded subtree"""
+        states = self.start()
+        for segment in split_path(path):
+            states = self.step(states, segment)
+            if states is EXCLUDED:
+                return True
+            if not states:
+                return False
+        return False
+
+    @staticmethod
+    def _closure(nodes):
+        # A '**' node is active as soon as its parent is (it can match zero segments)
+        result = []
+        seen = set()
+        while nodes:
+            node = nodes.pop()
+            if id(node) in seen:
+                continue
+            seen.add(id(node))
+            result.append(node)
+            if node.deep is not None:
+                nodes.append(node.deep)
+        return tuple(result)
+
+
+def prune_excluded(obj, exclusions):
+    """Return a copy of ``obj`` without the subtrees matched by ``exclusions``"""
+    if not isinstance(obj, (dict, list)):
+        return obj
+
+    pruned = {} if isinstance(obj, dict) else []
+    stack = [(obj, pruned, exclusions.start())]
+    while stack:
+        source, target, states = stack.pop()
+        is_dict = isinstance(source, dict)
+        for key, value in (source.items() if is_dict else enumerate(source)):
+            child_states = exclusions.step(states, key if is_dict else f"[{key}]")
+            if child_states is EXCLUDED:
+                continue
+            if child_states and isinstance(value, (dict, list)):
+                copy = {} if isinstance(value, dict) else []
+                stack.append((value, copy, child_states))
+                value = copy
+            if is_dict:
+                target[key] = value
+            else:
+                target.append(value)
+    return pruned
+
+
+class ExclusionProfileStore:
+    """Named exclusion profiles persisted in a JSON file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._compiled = {}
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        with open(self.path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _write(self, profiles):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(profiles, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self.path)
+
+    def list_profiles(self):
+        profiles = self._load()
+        return [{'name': name, **profile} for name, profile in sorted(profiles.items())]
+
+    def get(self, name):
+        return self._load().get(name)
+
+    def _put(self, profiles, name, patterns):
+        # Callers hold self._lock and have loaded ``profiles``
+        patterns = list(dict.fromkeys(patterns))
+        PathTrie(patterns)  # Validate before persisting
+        profiles[name] = {
+            'patterns': patterns,
+            'updated': datetime.now().isoformat(timespec='seconds')
+        }
+        self._write(profiles)
+        return profiles[name]
+
+    def save(self, name, patterns):
+        with self._lock:
+            return self._put(self._load(), name, patterns)
+
+    def update_pattern(self, name, pattern, exclude=True):
+        """Add (or remove) a single pattern, creating the profile if needed"""
+        with self._lock:
+            profiles = self._load()
+            profile = profiles.get(name) or {'patterns': []}
+            patterns = [p for p in profile['patterns'] if p != pattern]
+            if exclude:
+                patterns.append(pattern)
+            return self._put(profiles, name, patterns)
+
+    def delete(self, name):
+        with self._lock:
+            profiles = self._load()
+            if name not in profiles:
+                return False
+            del profiles[name]
+            self._write(profiles)
+        return True
+
+    def compile(self, name):
+        """Return the PathTrie for a profile, or None if the profile does not exist"""
+        profile = self.get(name)
+        if profile is None:
+            return None
+        patterns = tuple(profile['patterns'])
+        cached = self._compiled.get(name)
+        if cached is None or cached[0] != patterns:
+            cached = (patterns, PathTrie(patterns))
+            self._compiled[name] = cached
+        return cached[1]
+
+
+def canonical_path(path):
+    """Normalise a dotted path (whitespace, stray dots) to the flattened form"""
+    canonical = ''
+    for segment in split_path(path.replace(' ', '')):
+        canonical = canonical + segment if segment.startswith('[') else key_path(canonical, segment)
+    return canonical
+
+
+class JsonPathIndex:
+    """
+    Every path of one parsed JSON document mapped to its value.
+
+    The index is built in a single iterative walk; values are references into
+    the parsed document, so containers are not copied.  ``lookup`` answers
+    each path with one dictionary probe instead of re-walking from the root.
+    """
+
+    def __init__(self, document):
+        self.document = document
+        self.values = {}
+        self.leaf_count = 0
+        self._sorted_paths = None
+
+        if not isinstance(document, (dict, list)):
+            return
+        stack = [_iter_children(document, '', None)]
+        while stack:
+            for _, path, value in stack[-1]:
+                self.values[path] = value
+                if isinstance(value, (dict, list)):
+                    stack.append(_iter_children(value, path, None))
+                    break
+                self.leaf_count += 1
+            else:
+                stack.pop()
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, path, default=None):
+        value = self.values.get(path, _MISSING)
+        if value is _MISSING:
+            value = self.values.get(canonical_path(path), default)
+        return value
+
+    def lookup(self, paths, full_values=False):
+        """
+        Resolve many paths at once.
+
+        Returns ``(found, missing)``; containers are summarised as
+        ``{'type': ..., 'length': ...}`` unless ``full_values`` is set.
+        """
+        found = {}
+        missing = []
+        for path in paths:
+            value = self.get(path, _MISSING)
+            if value is _MISSING:
+                missing.append(path)
+            elif not full_values and isinstance(value, (dict, list)):
+                found[path] = {'type': 'object' if isinstance(value, dict) else 'array', 'length': len(value)}
+            else:
+                found[path] = value
+        return found, missing
+
+    def paths_with_prefix(self, prefix='', limit=None):
+        """Return (paths, total) for the sorted paths starting with ``prefix``"""
+        if self._sorted_paths is None:
+            self._sorted_paths = sorted(self.values)
+        start = bisect.bisect_left(self._sorted_paths, prefix)
+        end = bisect.bisect_left(self._sorted_paths, prefix + '\U0010ffff')
+        total = end - start
+        if limit is not None:
+            end = min(end, start + limit)
+        return self._sorted_paths[start:end], total
+
+
+class JsonDocumentCache:
+    """Least-recently-used cache of uploaded documents and their path indexes"""
+
+    def __init__(self, max_documents=8):
+        self.max_documents = max_documents
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, content):
+        """Parse and index raw JSON bytes, returning (document_id, index)"""
+        document_id = hashlib.blake2b(content, digest_size=16).hexdigest()
+        with self._lock:
+            index = self._indexes.get(document_id)
+            if index is not None:
+                self._indexes.move_to_end(document_id)
+                return document_id, index
+
+        index = JsonPathIndex(json.loads(content))
+        with self._lock:
+            self._indexes[document_id] = index
+            while len(self._indexes) > self.max_documents:
+                self._indexes.popitem(last=False)
+        return document_id, index
+
+    def get(self, document_id):
+        with self._lock:
+            index = self._indexes.get(document_id)
+            if index is not None:
+                self._indexes.move_to_end(document_id)
+            return index
+
+
+_MISSING = object()
+
+
+def iter_flat_json(obj, prefix='', aligner=None, exclusions=None, states=None):
+    """Yield (path, value) pairs for every leaf of an in-memory JSON object"""
+    if not isinstance(obj, (dict, list)):
+        return
+    if exclusions is not None and states is None:
+        states = exclusions.start()
+
+    stack = [(_iter_children(obj, prefix, aligner), states)]
+    while stack:
+        children, states = stack[-1]
+        for segment, child_path, value in children:
+            child_states = None
+            if states:
+                child_states = exclusions.step(states, segment)
+                if child_states is EXCLUDED:
+                    continue
+            if isinstance(value, (dict, list)):
+                stack.append((_iter_children(value, child_path, aligner), child_states))
+                break
+            yield child_path, value
+        else:
+            stack.pop()
+
+
+def _iter_children(obj, path, aligner):
+    if isinstance(obj, dict):
+        return ((key, key_path(path, key), value) for key, value in obj.items())
+    if aligner is None:
+        return ((f"[{i}]", f"{path}[{i}]", value) for i, value in enumerate(obj))
+    seen = {}
+    return _iter_labelled(obj, path, aligner, seen)
+
+
+def _iter_labelled(obj, path, aligner, seen):
+    for value in obj:
+        segment = f"[{aligner.label(value, seen)}]"
+        yield segment, path + segment, value
+
+
+def iter_flat_events(events, aligner=None, exclusions=None):
+    """
+    Yield (path, value) leaf pairs from ijson basic_parse events.
+
+    Each open container is a [path, is_list, key_or_index, states] frame on
+    the stack, so memory use is proportional to nesting depth rather than
+    document size.  With an ``aligner`` each array element is built on its
+    own (one element at a time) so it can be labelled before its leaves are
+    emitted.  Subtrees matched by ``exclusions`` are skipped without being
+    built or flattened.
+    """
+    events = iter(events)
+    stack = []
+    root_states = exclusions.start() if exclusions is not None else None
+    for event, value in events:
+        if event == 'map_key':
+            stack[-1][2] = value
+            continue
+        if event in ('end_map', 'end_array'):
+            stack.pop()
+            continue
+
+        if stack and stack[-1][1] and aligner is not None:
+            frame = stack[-1]
+            element = _build_value(event, value, events)
+            segment = f"[{aligner.label(element, frame[2])}]"
+            states = frame[3]
+            if states:
+                states = exclusions.step(states, segment)
+                if states is EXCLUDED:
+                    continue
+            if isinstance(element, (dict, list)):
+                yield from iter_flat_json(element, frame[0] + segment, aligner, exclusions, states)
+            else:
+                yield frame[0] + segment, element
+            continue
+
+        states = root_states
+        if stack:
+            frame = stack[-1]
+            if frame[1]:
+                segment = f"[{frame[2]}]"
+                path = frame[0] + segment
+                frame[2] += 1
+            else:
+                segment = frame[2]
+                path = key_path(frame[0], segment)
+            states = frame[3]
+            if states:
+                states = exclusions.step(states, segment)
+                if states is EXCLUDED:
+                    _skip_value(event, events)
+                    continue
+        else:
+            path = ''
+
+        if event == 'start_map':
+            stack.append([path, False, None, states])
+        elif event == 'start_array':
+            # Aligned arrays track the labels seen so far instead of an index
+            stack.append([path, True, {} if aligner is not None else 0, states])
+        elif stack:
+            yield path, value
+
+
+def _build_value(event, value, events):
+    """Assemble the value starting with ``event`` from the remaining events"""
+    if event not in ('start_map', 'start_array'):
+        return value
+
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    for event, value in events:
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                break
+    return builder.value
+
+
+def _skip_value(event, events):
+    """Consume the events of the value starting with ``event`` without building it"""
+    if event not in ('start_map', 'start_array'):
+        return
+
+    depth = 1
+    for event, _ in events:
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                return
+
+
+def iter_flat_stream(stream, aligner=None, exclusions=None):
+    """Flatten a binary JSON stream, incrementally when ijson is installed"""
+    if ijson is not None:
+        return iter_flat_events(ijson.basic_parse(stream, use_float=True), aligner, exclusions)
+    return iter_flat_json(json.load(stream), aligner=aligner, exclusions=exclusions)
+
+
+def sort_flat_pairs(pairs, chunk_size=SORT_CHUNK_SIZE):
+    """
+    Sort (path, value) pairs by path with bounded memory.
+
+    Pairs are collected in chunks of ``chunk_size``; full chunks are sorted and
+    spilled to temporary files and merged back with ``heapq.merge``.  When the
+    same path occurs more than once (duplicate object keys) only the last
+    value is kept, matching ``json.loads``.
+    """
+    runs = []
+    try:
+        chunk = []
+        for pair in pairs:
+            chunk.append(pair)
+            if len(chunk) >= chunk_size:
+                runs.append(_spill_run(chunk))
+                chunk = []
+        chunk.sort(key=_path_key)
+
+        if runs:
+            logger.debug(f"Merging {len(runs)} spilled runs of flattened JSON")
+            merged = heapq.merge(*[_read_run(run) for run in runs], chunk, key=_path_key)
+        else:
+            merged = chunk
+        yield from _last_per_path(merged)
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _spill_run(chunk):
+    chunk.sort(key=_path_key)
+    run = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+    for pair in chunk:
+        run.write(json.dumps(pair))
+        run.write('\n')
+    run.seek(0)
+    return run
+
+
+def _read_run(run):
+    for line in run:
+        path, value = json.loads(line)
+        yield path, value
+
+
+def _last_per_path(pairs):
+    pending = None
+    for pair in pairs:
+        if pending is not None and pair[0] != pending[0]:
+            yield pending
+        pending = pair
+    if pending is not None:
+        yield pending
+
+
+def diff_sorted_pairs(pairs1, pairs2):
+    """
+    Merge two path-sorted pair streams.
+
+    Yields ('only_in_1', path, value, None), ('only_in_2', path, None, value)
+    and ('different', path, value1, value2) tuples in path order.
+    """
+    missing = object()
+    iter1, iter2 = iter(pairs1), iter(pairs2)
+    item1 = next(iter1, missing)
+    item2 = next(iter2, missing)
+
+    while item1 is not missing and item2 is not missing:
+        path1, path2 = item1[0], item2[0]
+        if path1 == path2:
+            if item1[1] != item2[1]:
+                yield 'different', path1, item1[1], item2[1]
+            item1 = next(iter1, missing)
+            item2 = next(iter2, missing)
+        elif path1 < path2:
+            yield 'only_in_1', path1, item1[1], None
+            item1 = next(iter1, missing)
+        else:
+            yield 'only_in_2', path2, None, item2[1]
+            item2 = next(iter2, missing)
+
+    while item1 is not missing:
+        yield 'only_in_1', item1[0], item1[1], None
+        item1 = next(iter1, missing)
+    while item2 is not missing:
+        yield 'only_in_2', item2[0], None, item2[1]
+        item2 = next(iter2, missing)
+
+
+def compare_json_streams(stream1, stream2, aligner=None, exclusions=None, chunk_size=SORT_CHUNK_SIZE):
+    """Compare two binary JSON streams and return only_in_1, only_in_2 and different_values"""
+    only_in_1 = []
+    only_in_2 = []
+    different_values = []
+
+    pairs1 = sort_flat_pairs(iter_flat_stream(stream1, aligner, exclusions), chunk_size)
+    pairs2 = sort_flat_pairs(iter_flat_stream(stream2, aligner, exclusions), chunk_size)
+
+    for kind, path, value1, value2 in diff_sorted_pairs(pairs1, pairs2):
+        if kind == 'only_in_1':
+            only_in_1.append(path)
+        elif kind == 'only_in_2':
+            only_in_2.append(path)
+        else:
+            different_values.append({
+                'path': path,
+                'value1': value1,
+                'value2': value2
+            })
+
+    return only_in_1, only_in_2, different_values
+
+
+def compare_json_deepdiff(json1, json2, exclusions=None):
+    """
+    Compare two parsed documents with DeepDiff's hash-based ``ignore_order``.
+
+    DeepDiff reports whole added/removed subtrees; they are flattened to leaf
+    paths so the result has the same shape as ``compare_json_streams``.
+    """
+    if exclusions is not None:
+        json1 = prune_excluded(json1, exclusions)
+        json2 = prune_excluded(json2, exclusions)
+    diff = DeepDiff(json1, json2, ignore_order=True, view='tree')
+
+    changed1 = {}
+    changed2 = {}
+    for report_type, levels in diff.items():
+        for level in levels:
+            if report_type in ('dictionary_item_added', 'iterable_item_added'):
+                path = _deepdiff_path(level.path(use_t2=True, output_format='list'))
+                changed2.update(_leaf_pairs(path, level.t2))
+            elif report_type in ('dictionary_item_removed', 'iterable_item_removed'):
+                path = _deepdiff_path(level.path(output_format='list'))
+                changed1.update(_leaf_pairs(path, level.t1))
+            elif report_type in ('values_changed', 'type_changes'):
+                path = _deepdiff_path(level.path(output_format='list'))
+                changed1.update(_leaf_pairs(path, level.t1))
+                changed2.update(_leaf_pairs(path, level.t2))
+
+    only_in_1 = sorted(changed1.keys() - changed2.keys())
+    only_in_2 = sorted(changed2.keys() - changed1.keys())
+    different_values = [
+        {'path': path, 'value1': changed1[path], 'value2': changed2[path]}
+        for path in sorted(changed1.keys() & changed2.keys())
+        if changed1[path] != changed2[path]
+    ]
+    return only_in_1, only_in_2, different_values
+
+
+def _deepdiff_path(parts):
+    path = ''
+    for part in parts:
+        path = f"{path}[{part}]" if isinstance(part, int) else key_path(path, part)
+    return path
+
+
+def _leaf_pairs(path, value):
+    if isinstance(value, (dict, list)):
+        return iter_flat_json(value, path)
+    return [(path, value)]
+
+
+def value_at(obj, path):
+    """Return the value at a flattened path in a parsed document, or None"""
+    current = obj
+    for segment in split_path(path):
+        try:
+            current = current[int(segment[1:-1])] if segment.startswith('[') else current[segment]
+        except (KeyError, IndexError, TypeError, ValueError):
+            return None
+    return current
+
+
+def generic_path(path):
+    """Replace array segments with [*] so per-path counts aggregate across elements"""
+    return _INDEX_SEGMENT_RE.sub('[*]', path)
+
+
+def compare_ndjson_streams(stream1, stream2, id_path, array_keys=None, exclusions=None, workers=1,
+                           partitions=NDJSON_PARTITIONS, sample_limit=NDJSON_SAMPLE_LIMIT,
+                           chunk_bytes=NDJSON_CHUNK_BYTES):
+    """
+    Compare two newline-delimited JSON streams record by record.
+
+    Records are matched on the value at ``id_path``.  The streams are cut into
+    raw chunks that workers parse and hash-partition by id into temporary
+    files; each partition pair is then loaded and diffed in a worker, so memory
+    is bounded by the size of one partition rather than the whole export.
+
+    Args:
+        stream1, stream2: Binary NDJSON streams
+        id_path (str): Flattened path of the record id, e.g. "header.id"
+        array_keys (list): None for positional arrays, otherwise the identity
+            keys for ArrayAligner (empty for pure structural hashing)
+        exclusions (PathTrie): Optional exclusion trie
+        workers (int): Worker processes; 1 runs everything in-process
+
+    Returns:
+        dict: Record counts, missing/extra ids, per-path difference counts and
+        example record diffs
+    """
+    exclusion_patterns = exclusions.patterns if exclusions is not None else None
+
+    with tempfile.TemporaryDirectory(prefix='ndjson_compare_') as work_dir:
+        executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+        try:
+            # Map: split each stream into chunks and partition the records by id
+            chunk_futures = {
+                side: _submit_ndjson_chunks(executor, stream, side, work_dir, id_path, partitions, chunk_bytes)
+                for side, stream in (('1', stream1), ('2', stream2))
+            }
+
+            part_files = {side: defaultdict(list) for side in chunk_futures}
+            totals = {side: {'records': 0, 'invalid': 0} for side in chunk_futures}
+            for side, futures in chunk_futures.items():
+                for chunk_no, future in enumerate(futures):
+                    records, invalid, used_partitions = future.result()
+                    totals[side]['records'] += records
+                    totals[side]['invalid'] += invalid
+                    for partition in used_partitions:
+                        part_files[side][partition].append(_partition_file(work_dir, side, chunk_no, partition))
+
+            # Reduce: diff every partition pair
+            diff_futures = [
+                _submit(executor, _diff_ndjson_partition, part_files['1'].get(partition, []),
+                        part_files['2'].get(partition, []), array_keys, exclusion_patterns, sample_limit)
+                for partition in range(partitions)
+                if partition in part_files['1'] or partition in part_files['2']
+            ]
+            partial_results = [future.result() for future in diff_futures]
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    return _merge_ndjson_results(partial_results, totals, sample_limit)
+
+
+def _submit(executor, fn, *args):
+    if executor is not None:
+        return executor.submit(fn, *args)
+    future = Future()
+    try:
+        future.set_result(fn(*args))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+
+def _submit_ndjson_chunks(executor, stream, side, work_dir, id_path, partitions, chunk_bytes):
+    futures = []
+    while True:
+        lines = stream.readlines(chunk_bytes)
+        if not lines:
+            break
+        chunk_path = os.path.join(work_dir, f"chunk-{side}-{len(futures)}.ndjson")
+        with open(chunk_path, 'wb') as chunk:
+            chunk.writelines(lines)
+        futures.append(_submit(executor, _partition_ndjson_chunk, chunk_path, work_dir, side,
+                               len(futures), id_path, partitions))
+    return futures
+
+
+def _partition_file(work_dir, side, chunk_no, partition):
+    return os.path.join(work_dir, f"part-{side}-{chunk_no}-{partition}")
+
+
+def _partition_ndjson_chunk(chunk_path, work_dir, side, chunk_no, id_path, partitions):
+    """Worker: write each record of a chunk as ``id<TAB>record`` to its id partition"""
+    handles = {}
+    records = 0
+    invalid = 0
+    try:
+        with open(chunk_path, 'rb') as chunk:
+            for line in chunk:
+                line = line.strip()
+                if not line:
+                    continue
+                records += 1
+                try:
+                    record_id = value_at(json.loads(line.decode('utf-8')), id_path)
+                except ValueError:
+                    record_id = None
+                if record_id is None or isinstance(record_id, (dict, list)):
+                    invalid += 1
+                    continue
+
+                key = json.dumps(record_id).encode('utf-8')
+                partition = zlib.crc32(key) % partitions
+                handle = handles.get(partition)
+                if handle is None:
+                    handle = handles[partition] = open(_partition_file(work_dir, side, chunk_no, partition), 'wb')
+                handle.write(key + b'\t' + line + b'\n')
+    finally:
+        for handle in handles.values():
+            handle.close()
+        os.remove(chunk_path)
+    return records, invalid, sorted(handles)
+
+
+def _load_partition(part_files):
+    records = {}
+    duplicates = 0
+    for part_file in part_files:
+        with open(part_file, 'rb') as part:
+            for line in part:
+                key, _, record = line.rstrip(b'\n').partition(b'\t')
+                if key in records:
+                    duplicates += 1
+                records[key] = record  # Last occurrence wins
+    return records, duplicates
+
+
+def _diff_ndjson_partition(part_files1, part_files2, array_keys, exclusion_patterns, sample_limit):
+    """Worker: diff the records of one id partition from both sides"""
+    aligner = ArrayAligner(array_keys) if array_keys is not None else None
+    exclusions = PathTrie(exclusion_patterns) if exclusion_patterns else None
+
+    records1, duplicates1 = _load_partition(part_files1)
+    records2, duplicates2 = _load_partition(part_files2)
+
+    result = {
+        'matched': 0,
+        'identical': 0,
+        'different': 0,
+        'duplicates_1': duplicates1,
+        'duplicates_2': duplicates2,
+        'missing_count': 0,
+        'missing_ids': [],
+        'extra_count': 0,
+        'extra_ids': [],
+        'path_counts': {},
+        'samples': []
+    }
+    path_counts = result['path_counts']
+
+    for key, record1 in records1.items():
+        record2 = records2.get(key)
+        if record2 is None:
+            result['missing_count'] += 1
+            if len(result['missing_ids']) < sample_limit:
+                result['missing_ids'].append(json.loads(key))
+            continue
+
+        result['matched'] += 1
+        if record1 == record2:
+            result['identical'] += 1
+            continue
+
+        only_in_1 = []
+        only_in_2 = []
+        different_values = []
+        pairs1 = sorted(iter_flat_json(json.loads(record1.decode('utf-8')), aligner=aligner, exclusions=exclusions), key=_path_key)
+        pairs2 = sorted(iter_flat_json(json.loads(record2.decode('utf-8')), aligner=aligner, exclusions=exclusions), key=_path_key)
+        for kind, path, value1, value2 in diff_sorted_pairs(pairs1, pairs2):
+            counts = path_counts.setdefault(generic_path(path), [0, 0, 0])
+            if kind == 'different':
+                counts[0] += 1
+                different_values.append({'path': path, 'value1': value1, 'value2': value2})
+            elif kind == 'only_in_1':
+                counts[1] += 1
+                only_in_1.append(path)
+            else:
+                counts[2] += 1
+                only_in_2.append(path)
+
+        if not (only_in_1 or only_in_2 or different_values):
+            result['identical'] += 1  # Only formatting or excluded fields differ
+            continue
+
+        result['different'] += 1
+        if len(result['samples']) < sample_limit:
+            result['samples'].append({
+                'id': json.loads(key),
+                'only_in_1': only_in_1,
+                'only_in_2': only_in_2,
+                'different_values': different_values
+            })
+
+    for key in records2.keys() - records1.keys():
+        result['extra_count'] += 1
+        if len(result['extra_ids']) < sample_limit:
+            result['extra_ids'].append(json.loads(key))
+
+    return result
+
+
+def _merge_ndjson_results(partial_results, totals, sample_limit):
+    merged = {
+        'records_1': totals['1']['records'],
+        'records_2': totals['2']['records'],
+        'invalid_1': totals['1']['invalid'],
+        'invalid_2': totals['2']['invalid'],
+        'matched': 0,
+        'identical': 0,
+        'different': 0,
+        'duplicates_1': 0,
+        'duplicates_2': 0,
+        'missing_count': 0,
+        'missing_ids': [],
+        'extra_count': 0,
+        'extra_ids': [],
+        'sample_differences': []
+    }
+    path_counts = defaultdict(lambda: [0, 0, 0])
+
+    for partial in partial_results:
+        for field in ('matched', 'identical', 'different', 'duplicates_1', 'duplicates_2',
+                      'missing_count', 'extra_count'):
+            merged[field] += partial[field]
+        merged['missing_ids'].extend(partial['missing_ids'][:sample_limit - len(merged['missing_ids'])])
+        merged['extra_ids'].extend(partial['extra_ids'][:sample_limit - len(merged['extra_ids'])])
+        merged['sample_differences'].extend(
+            partial['samples'][:sample_limit - len(merged['sample_differences'])])
+        for path, counts in partial['path_counts'].items():
+            total = path_counts[path]
+            for i, count in enumerate(counts):
+                total[i] += count
+
+    merged['path_differences'] = [
+        {'path': path, 'different': counts[0], 'only_in_1': counts[1], 'only_in_2': counts[2]}
+        for path, counts in sorted(path_counts.items(), key=lambda item: (-sum(item[1]), item[0]))
+    ]
+    return merged
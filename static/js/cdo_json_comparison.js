@@ -65,6 +65,25 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
 
+    // Populate the server-side exclusion profiles
+    fetch('/exclusion_profiles')
+        .then(response => response.json())
+        .then(data => {
+            const select = document.getElementById('exclusionProfile');
+            data.profiles.forEach(profile => {
+                const option = document.createElement('option');
+                option.value = profile.name;
+                option.textContent = `${profile.name} (${profile.patterns.length})`;
+                select.appendChild(option);
+            });
+        })
+        .catch(error => console.error('Error loading exclusion profiles:', error));
+
+    // Identity keys only apply to key-based array matching
+    document.getElementById('arrayMode').addEventListener('change', function() {
+        document.getElementById('arrayKey').disabled = this.value !== 'key';
+    });
+
     // Handle the compare button click
     document.getElementById('compareButton').addEventListener('click', function() {
         if (!file1 || !file2) {
@@ -75,6 +94,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const formData = new FormData();
         formData.append('file1', file1);
         formData.append('file2', file2);
+        formData.append('array_mode', document.getElementById('arrayMode').value);
+        formData.append('array_key', document.getElementById('arrayKey').value);
+        formData.append('exclusion_profile', document.getElementById('exclusionProfile').value);
 
         // Show loading state
         this.setAttribute('disabled', 'disabled');
@@ -218,6 +240,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 exclusionList.add(diff.path);
                 console.log('Field excluded:', diff.path);
                 logExcludedFields();
+                persistExclusion(diff.path, 'exclude');
                 if (!showAllChecked) {
                     row.remove();
                 }
@@ -225,6 +248,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 exclusionList.delete(diff.path);
                 console.log('Field un-excluded:', diff.path);
                 logExcludedFields();
+                persistExclusion(diff.path, 'include');
             }
         });
 
@@ -246,6 +270,16 @@ document.addEventListener('DOMContentLoaded', function() {
         console.log('Current excluded fields:', Array.from(exclusionList));
     }
 
+    // Save the change to the selected exclusion profile (if any) on the server
+    function persistExclusion(fieldPath, action) {
+        const profile = document.getElementById('exclusionProfile').value;
+        fetch('/log_excluded_field', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ field_path: fieldPath, action: action, profile: profile || null })
+        }).catch(error => console.error('Error saving exclusion:', error));
+    }
+
     // Handle "Show All Fields" checkbox
     document.getElementById('showAllFields').addEventListener('change', function() {
         if (currentDifferenceData) {
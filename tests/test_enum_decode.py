@@ -0,0 +1,33 @@
+import threading
+
+from enum_decode import EnumDecodeIndex, EnumDecodeStore
+
+ROWS = 'Field,Enum,Shortcode\nReport.Side,BUY,1\nReport.Side,SELL,2\n'
+
+
+def test_build_reuses_index_until_sources_change(tmp_path):
+    source = tmp_path / 'rows.csv'
+    source.write_text(ROWS)
+    store = EnumDecodeStore(str(tmp_path / 'index.pickle'))
+
+    first = store.build([str(source)])
+    assert first.decode('TrdCaptRpt/@Side', '2') == 'SELL'
+    assert store.build([str(source)]) is first
+
+    # Concurrent builds all see a complete index
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(store.build([str(source)]))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(index is first for index in results)
+
+
+def test_array_positions_share_one_memo_entry():
+    index = EnumDecodeIndex.from_rows([('Report.Side', 'BUY', '1'), ('Report.Side', 'SELL', '2')])
+    items = [{'path': f'trades[{number}].side', 'value1': '1', 'value2': '2'} for number in range(1000)]
+
+    assert index.annotate(items) == 1000
+    assert items[999]['label1'] == 'BUY' and items[999]['label2'] == 'SELL'
+    assert len(index._memo) == 1
@@ -0,0 +1,42 @@
+import pytest
+
+from fix_dictionary import load_dictionary
+from fix_equivalence import check_equivalence
+from fixml_messages import FixmlMessageEngine
+
+TRADE = ('<TrdCaptRpt TrdID="{id}" LastPx="{px}" LastQty="5" TrdDt="2019-12-23"><Instrmt Sym="CLH0" ID="CL"/>'
+         '<RptSide Side="2"><Pty R="1" ID="666"/><Pty R="4" ID="777"/></RptSide></TrdCaptRpt>')
+
+
+@pytest.fixture(scope='module')
+def engine():
+    return FixmlMessageEngine(load_dictionary())
+
+
+def _files(tmp_path, engine, fix_prices, fixml_prices=('60.25', '61', '62.5')):
+    trades = [TRADE.format(id=f'T{number}', px=px) for number, px in enumerate(fixml_prices)]
+    fixml = tmp_path / 'trades.xml'
+    fixml.write_text('<FIXML><Batch>\n' + '\n'.join(trades) + '\n</Batch></FIXML>\n')
+    fix_log = tmp_path / 'session.log'
+    fix_log.write_text(''.join(f'IN {engine.convert_string(TRADE.format(id=f"T{number}", px=px)).message}\n'
+                               for number, px in enumerate(fix_prices)))
+    return str(fixml), str(fix_log)
+
+
+def test_converted_trades_round_trip_as_equivalent(tmp_path, engine):
+    # Numeric values compare by value, so 61 and 61.00 are the same price
+    result = check_equivalence(*_files(tmp_path, engine, ('60.25', '61.00', '62.50')), engine=engine)
+
+    assert (result['pairs'], result['identical'], result['unmatched_a'], result['unmatched_b']) == (3, 3, 0, 0)
+    assert result['errors'] == 0
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_changed_and_missing_trades_are_reported(tmp_path, engine, workers):
+    result = check_equivalence(*_files(tmp_path, engine, ('60.25', '61.5', '62.5', '63'),
+                                       fixml_prices=('60.25', '61', '62.5')), workers=workers)
+
+    assert (result['pairs'], result['with_differences']) == (3, 1)
+    assert result['unmatched_b_keys'] == [{'msg_type': 'AE', 'key': ['T3'], 'occurrence': 0}]
+    sample, = result['samples']
+    assert sample['key'] == ['T1'] and sample['different'] == [['31', '61', '61.5']]
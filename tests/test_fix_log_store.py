@@ -0,0 +1,60 @@
+import gc
+import os
+import threading
+
+import fix_log_store
+from fix_log_store import FixLogCatalog
+
+MESSAGE = '8=FIX.4.4\x019=20\x0135=D\x0111=ORDER{0}\x0110=000\x01\n'
+
+
+def test_replaced_store_stays_readable(tmp_path):
+    log = tmp_path / 'session.log'
+    log.write_text(MESSAGE.format(1))
+    catalog = FixLogCatalog(str(tmp_path))
+    old = catalog.get('session.log')
+
+    log.write_text(MESSAGE.format(1) + MESSAGE.format(2))
+    os.utime(log, ns=(1, 1))  # Make sure the change is seen even on coarse clocks
+    new = catalog.get('session.log')
+
+    assert new is not old
+    assert len(new) == 2
+    assert '11=ORDER1' in old.message(0)  # A request holding the old store can finish
+
+    released = old._release
+    del old
+    gc.collect()
+    assert not released.alive
+
+
+def test_indexing_one_log_does_not_block_others(tmp_path, monkeypatch):
+    (tmp_path / 'slow.log').write_text(MESSAGE.format(1))
+    (tmp_path / 'fast.log').write_text(MESSAGE.format(2))
+    catalog = FixLogCatalog(str(tmp_path))
+    indexing, release = threading.Event(), threading.Event()
+    original = fix_log_store.FixLogStore.__init__
+
+    def slow_init(self, log_path, *args, **kwargs):
+        if log_path.endswith('slow.log'):
+            indexing.set()
+            release.wait(5)
+        original(self, log_path, *args, **kwargs)
+
+    monkeypatch.setattr(fix_log_store.FixLogStore, '__init__', slow_init)
+    slow = []
+    thread = threading.Thread(target=lambda: slow.append(catalog.get('slow.log')))
+    thread.start()
+    assert indexing.wait(5)
+
+    fast = []
+    other = threading.Thread(target=lambda: fast.append(catalog.get('fast.log')))
+    other.start()
+    other.join(2)
+    finished = fast[:]  # Before slow.log is let through
+    release.set()
+    thread.join()
+    other.join()
+
+    assert finished and '11=ORDER2' in finished[0].message(0)
+    assert len(slow[0]) == 1 and catalog.get('slow.log') is slow[0]
@@ -0,0 +1,29 @@
+import pytest
+
+from fix_parser import FixParseError, FixParser, ParsedMessage, diff_messages
+
+
+def test_changes_only_skips_matching_and_cross_field_passes():
+    a = [[55, 'AAPL'], [31, '1.5'], [44, '2']]
+    b = [[55, 'AAPL'], [31, '2'], [38, '100']]
+
+    diff = diff_messages(a, b, ignore=(), changes_only=True)
+
+    assert diff == {'only_in_a': [['44', '2']], 'only_in_b': [['38', '100']], 'different': [['31', '1.5', '2']]}
+    full = diff_messages(a, b, ignore=())
+    assert full['matching'] == [['55', 'AAPL']]
+    assert full['same_value_different_field'] == [['44', '31', '2']]
+
+
+def test_caret_is_a_literal_delimiter():
+    parser = FixParser('FIX.4.4')
+
+    messages = parser.parse('8=FIX.4.4^9=50^35=8^55=IBM^10=000^', '^')
+
+    assert messages == [ParsedMessage('8', [[8, 'FIX.4.4'], [9, '50'], [35, '8'], [55, 'IBM'], [10, '000']])]
+    assert parser.parse('8=FIX.4.4^A35=8^A55=IBM^A10=000^A', '^A')[0].fields[2] == [55, 'IBM']
+
+
+def test_wrong_delimiter_is_an_error():
+    with pytest.raises(FixParseError, match='MsgType'):
+        FixParser('FIX.4.4').parse('8=FIX.4.4^9=50^35=8^55=IBM^10=000^', '|')
@@ -0,0 +1,50 @@
+import pytest
+
+from fix_parser import FixParser, diff_messages
+from fix_replay import DEFAULT_EXCLUDED_TAGS, replay_diff
+
+
+def _message(msg_type, cl_ord_id, *fields, sending_time='20261019-10:00:00'):
+    body = '\x01'.join([f'35={msg_type}', f'52={sending_time}', f'11={cl_ord_id}', *fields])
+    return f'8=FIX.4.4\x019=100\x01{body}\x0110=000\x01'
+
+
+UAT = [
+    _message('D', 'A', '55=IBM', '54=1', '38=100'),
+    _message('8', 'A', '150=0', '39=0'),
+    _message('8', 'A', '150=F', '39=2', '31=10.5'),
+    _message('D', 'B', '55=MSFT', '54=2', '38=5'),
+]
+PROD = [
+    _message('D', 'B', '55=MSFT', '54=2', '38=5', sending_time='20261019-11:00:00'),
+    _message('D', 'A', '55=IBM', '54=1', '38=100', sending_time='20261019-11:00:00'),
+    _message('8', 'A', '150=0', '39=0', sending_time='20261019-11:00:01'),
+    _message('8', 'A', '150=F', '39=2', '31=10.75', '6=10.75', sending_time='20261019-11:00:02'),
+    _message('8', 'C', '150=0', '39=0'),
+]
+
+
+def _write_log(path, messages):
+    # Log prefixes and line breaks around the messages are skipped
+    path.write_text(''.join(f'2026-10-19 10:00:00 IN {message}\n' for message in messages))
+    return str(path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_aligned_pairs_diff_like_the_comparison_page(tmp_path, workers):
+    result = replay_diff(_write_log(tmp_path / 'uat.log', UAT), _write_log(tmp_path / 'prod.log', PROD),
+                         workers=workers, batch_size=2)
+
+    assert (result['pairs'], result['identical'], result['unmatched_a'], result['unmatched_b']) == (4, 3, 0, 1)
+    assert result['unmatched_b_keys'] == [{'msg_type': '8', 'key': ['C'], 'occurrence': 0}]
+
+    # The second execution report for A, diffed directly without the volatile tags
+    parser = FixParser()
+    fields = [[field for field in parser.split_messages(text)[0] if field[0] not in DEFAULT_EXCLUDED_TAGS]
+              for text in (UAT[2], PROD[3])]
+    expected = diff_messages(*(parser.structure(message).fields for message in fields), ignore=(),
+                             changes_only=True)
+    sample, = result['samples']
+    assert (sample['msg_type'], sample['key'], sample['occurrence']) == ('8', ['A'], 1)
+    assert {kind: sample[kind] for kind in expected} == expected
+    assert {stat['tag']: stat['total'] for stat in result['tag_stats']} == {'31': 1, '6': 1}
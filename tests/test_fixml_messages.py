@@ -0,0 +1,13 @@
+import io
+
+from fixml_messages import iter_fixml_messages
+
+
+def test_multibyte_character_split_across_reads():
+    message = '<TrdCaptRpt TrdID="é€">x</TrdCaptRpt>'
+    data = f'<FIXML>{message}{message}</FIXML>'.encode('utf-8')
+    boundary = data.index('€'.encode('utf-8')) + 1  # Inside the 3-byte euro sign
+
+    messages = list(iter_fixml_messages(io.BytesIO(data), ('TrdCaptRpt',), chunk_size=boundary))
+
+    assert messages == [message, message]
@@ -0,0 +1,26 @@
+import pytest
+
+from fixml_paths import FixmlPathResolver
+
+
+@pytest.fixture(scope='module')
+def resolver():
+    return FixmlPathResolver()
+
+
+@pytest.mark.parametrize('path, tag', [
+    ('TrdCaptRpt/Instrmt/@ID', 48),  # SecurityID
+    ('TrdCaptRpt/RptSide/Pty/@ID', 448),  # PartyID: the same abbreviation in another component
+    ('FIXML/Batch/TrdCaptRpt/RptSide/Pty/@ID', 448),
+    ('Pty/@R', 452),
+    ('TrdCaptRpt/@LastPx', 31),
+    ('TrdCaptRpt/RptSide/@Side', 54),
+    ('TrdCaptRpt/Hdr/@SID', 49),
+])
+def test_attributes_resolve_in_their_component(resolver, path, tag):
+    assert resolver.resolve(path) == tag
+
+
+def test_paths_outside_the_schema_do_not_resolve(resolver):
+    assert resolver.resolve('TrdCaptRpt/Nope/@ID') is None
+    assert resolver.resolve('CustomMsg/@Sym') is None
@@ -0,0 +1,36 @@
+from fix_dictionary import name_variants
+from fixml_paths import FixmlPathResolver
+from fixml_tag_index import DEFAULT_MAPPER, FixmlTagIndex, build_tag_index, load_tag_index
+
+
+def test_fallback_abbreviation_is_indexed(tmp_path):
+    resolver = FixmlPathResolver()
+    path = 'CustomMsg/Hdr/@SSub'  # Outside the schema; SSub is only in FIXML_FALLBACK_TAGS
+    assert resolver.resolve(path) is None
+    assert not any(variant in resolver.dictionary.lookup for variant in name_variants('SSub'))
+    spreadsheet = tmp_path / 'mapping.csv'
+    spreadsheet.write_text(f'field_name\n{path}\n')
+
+    data = build_tag_index(resolver, [str(spreadsheet)])
+
+    result = FixmlTagIndex(data, resolver.dictionary).paths(50)  # SenderSubID
+    assert {'path': path, 'attribute': 'SSub', 'sources': ['mapping.csv']} in result['paths']
+    assert data['unmapped'] == []
+
+
+def test_custom_mapper_index_is_kept_apart(tmp_path, monkeypatch):
+    monkeypatch.setenv('FIX_DICTIONARY_CACHE', str(tmp_path))
+    resolver = FixmlPathResolver()
+    spreadsheet = tmp_path / 'mapping.csv'
+    spreadsheet.write_text('field_name\nCustomMsg/Hdr/@Custom\n')
+
+    def custom_mapper(path):
+        return 9999
+
+    custom = load_tag_index(spreadsheets=[str(spreadsheet)], mapper=custom_mapper, resolver=resolver)
+    default = load_tag_index(spreadsheets=[str(spreadsheet)], resolver=resolver)
+
+    assert custom.data['mapper'] != default.data['mapper'] == DEFAULT_MAPPER
+    assert custom.paths(9999)['paths'] and not default.paths(9999)['paths']
+    assert load_tag_index(spreadsheets=[str(spreadsheet)], mapper=custom_mapper, resolver=resolver) is custom
+    assert len(list(tmp_path.glob('fixml_tag_index.*.json'))) == 2
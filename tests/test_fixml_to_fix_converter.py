@@ -0,0 +1,42 @@
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+# fixml-to-fix-converter.py is not importable by name
+_spec = importlib.util.spec_from_file_location(
+    'fixml_to_fix_converter', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                           'fixml-to-fix-converter.py'))
+converter = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(converter)
+
+
+def test_parquet_chunks_with_changing_dtypes(tmp_path):
+    pytest.importorskip('pyarrow')
+    output = tmp_path / 'out.parquet'
+    writer = converter.ParquetTableWriter(str(output))
+
+    writer.write(pd.DataFrame({'FIXML_Path': ['Order/@Side'], 'FIX_Tag': [54]}))
+    writer.write(pd.DataFrame({'FIXML_Path': ['Order/@Foo', 'Order/@Px'], 'FIX_Tag': [float('nan'), 44.0]}))
+    writer.close()
+
+    table = pd.read_parquet(output)
+    assert table['FIXML_Path'].tolist() == ['Order/@Side', 'Order/@Foo', 'Order/@Px']
+    assert table['FIX_Tag'].tolist()[0] == '54' and pd.isna(table['FIX_Tag'][1])
+
+
+@pytest.fixture(scope='module')
+def fixml_converter():
+    return converter.FIXMLToFIXConverter()
+
+
+def test_context_first_then_name_lookup(fixml_converter):
+    assert fixml_converter.map_fixml_to_fix_tag('TrdCaptRpt/RptSide/Pty/@ID') == 448
+    assert fixml_converter.map_fixml_to_fix_tag('TrdCaptRpt/Instrmt/@ID') == 48
+    # Outside the schema the last segment is looked up by name, as before
+    assert fixml_converter.map_fixml_to_fix_tag('CustomMsg/@Symbol') == 55
+    assert fixml_converter.map_fixml_to_fix_tag('CustomMsg/@Sym') == 55
+    # The bundled mapping spreadsheet
+    assert [fixml_converter.map_fixml_to_fix_tag(path) for path in (
+        'TrdCaptRpt/FinDelts/@EndDate', 'TrdCaptRpt/FinDelts/@StartDate', 'TrdCaptRpt/Instrmt/@Exch')] == [917, 916, 207]
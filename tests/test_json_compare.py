@@ -0,0 +1,200 @@
+import io
+import json
+import threading
+
+import pytest
+
+from json_compare import (SORT_CHUNK_SIZE, ArrayAligner, ExclusionProfileStore, JsonPathIndex, PathTrie,
+                          compare_json_streams, compare_ndjson_streams, iter_flat_json, iter_flat_stream,
+                          prune_excluded)
+
+
+def test_concurrent_pattern_updates_are_all_kept(tmp_path):
+    store = ExclusionProfileStore(str(tmp_path / 'profiles.json'))
+    patterns = [f'trades[*].field{number}' for number in range(20)]
+
+    threads = [threading.Thread(target=store.update_pattern, args=('daily', pattern)) for pattern in patterns]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(store.get('daily')['patterns']) == sorted(patterns)
+    store.update_pattern('daily', patterns[0], exclude=False)
+    assert patterns[0] not in store.get('daily')['patterns']
+
+
+def test_invalid_pattern_is_rejected(tmp_path):
+    store = ExclusionProfileStore(str(tmp_path / 'profiles.json'))
+
+    with pytest.raises(ValueError):
+        store.update_pattern('daily', 42)
+    assert store.get('daily') is None
+
+
+def _flatten_baseline(obj, prefix=''):
+    """The recursive flatten_json /compare_json used before it streamed"""
+    items = {}
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            new_key = f"{prefix}.{key}" if prefix else str(key)
+            if isinstance(value, (dict, list)):
+                items.update(_flatten_baseline(value, new_key))
+            else:
+                items[new_key] = value
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            new_key = f"{prefix}[{i}]"
+            if isinstance(value, (dict, list)):
+                items.update(_flatten_baseline(value, new_key))
+            else:
+                items[new_key] = value
+    return items
+
+
+def _compare_baseline(json1, json2):
+    flat1, flat2 = _flatten_baseline(json1), _flatten_baseline(json2)
+    return (sorted(flat1.keys() - flat2.keys()), sorted(flat2.keys() - flat1.keys()),
+            [{'path': key, 'value1': flat1[key], 'value2': flat2[key]}
+             for key in sorted(flat1.keys() & flat2.keys()) if flat1[key] != flat2[key]])
+
+
+DOCUMENT_1 = {
+    'header': {'id': 'T-1', 'version': 3, 'flags': [True, False]},
+    'trades': [{'id': 'A', 'side': 'BUY', 'qty': 100}, {'id': 'B', 'side': 'SELL', 'qty': 5.5}],
+    'notes': None,
+    'name': 'café',
+}
+DOCUMENT_2 = {
+    'header': {'id': 'T-1', 'version': 4, 'flags': [True]},
+    'trades': [{'id': 'A', 'side': 'BUY', 'qty': 100}, {'id': 'B', 'side': 'BUY', 'qty': 5.5, 'venue': 'X'}],
+    'extra': {'deep': [1, 2]},
+    'name': 'café',
+}
+
+
+def _stream(document):
+    return io.BytesIO(json.dumps(document).encode('utf-8'))
+
+
+@pytest.mark.parametrize('chunk_size', [SORT_CHUNK_SIZE, 3])  # 3 spills sorted runs to disk
+def test_stream_compare_matches_baseline(chunk_size):
+    result = compare_json_streams(_stream(DOCUMENT_1), _stream(DOCUMENT_2), chunk_size=chunk_size)
+
+    assert result == _compare_baseline(DOCUMENT_1, DOCUMENT_2)
+
+
+def test_deep_nesting_is_flattened_without_recursion():
+    document = value = {}
+    for _ in range(5000):
+        value['a'] = {}
+        value = value['a']
+    value['leaf'] = 1
+    text = '{"a":' * 5000 + '{"leaf":1}' + '}' * 5000  # json.dumps itself would recurse
+
+    pairs = list(iter_flat_json(document))
+
+    assert pairs == [('.'.join(['a'] * 5000 + ['leaf']), 1)]
+    assert list(iter_flat_stream(io.BytesIO(text.encode('ascii')))) == pairs
+
+
+def test_key_alignment_reports_only_the_inserted_element():
+    document_1 = {'trades': [{'id': 'A', 'qty': 1}, {'id': 'B', 'qty': 2}], 'tags': ['x', 'y', 'x']}
+    document_2 = {'trades': [{'id': 'Z', 'qty': 9}, {'id': 'A', 'qty': 1}, {'id': 'B', 'qty': 3}],
+                  'tags': ['x', 'x', 'y']}
+
+    positional = compare_json_streams(_stream(document_1), _stream(document_2))
+    keyed = compare_json_streams(_stream(document_1), _stream(document_2), ArrayAligner(['id']))
+
+    assert positional == _compare_baseline(document_1, document_2)
+    assert len(positional[2]) == 6  # Every element after the insert shifts, as do the reordered tags
+    assert keyed == ([], ['trades[id=Z].id', 'trades[id=Z].qty'],
+                     [{'path': 'trades[id=B].qty', 'value1': 2, 'value2': 3}])
+
+
+def test_structural_hash_ignores_key_order_and_pairs_duplicates():
+    aligner = ArrayAligner()
+    seen = {}
+
+    labels = [aligner.label(element, seen) for element in ({'a': 1, 'b': 2}, {'b': 2, 'a': 1}, 'x')]
+
+    assert labels[1] == f'{labels[0]}~1'
+    assert labels[2] == '="x"'
+
+
+def test_exact_exclusions_match_the_client_side_filter():
+    # The page used to hide excluded paths from the result after diffing everything
+    excluded = {'header.version', 'trades[1].side', 'extra.deep[0]'}
+    only_in_1, only_in_2, different_values = _compare_baseline(DOCUMENT_1, DOCUMENT_2)
+    expected = ([path for path in only_in_1 if path not in excluded],
+                [path for path in only_in_2 if path not in excluded],
+                [diff for diff in different_values if diff['path'] not in excluded])
+
+    result = compare_json_streams(_stream(DOCUMENT_1), _stream(DOCUMENT_2), exclusions=PathTrie(excluded))
+
+    assert result == expected
+
+
+def test_glob_exclusions_drop_whole_subtrees():
+    trie = PathTrie(['trades[*].qty', 'header.**', 'extra'])
+
+    assert trie.matches('trades[3].qty') and trie.matches('header.flags[0]') and trie.matches('extra.deep[1]')
+    assert not trie.matches('trades[3].side') and not trie.matches('name')
+    pairs = dict(iter_flat_json(DOCUMENT_2, exclusions=trie))
+    assert pairs == {path: value for path, value in _flatten_baseline(DOCUMENT_2).items() if not trie.matches(path)}
+    assert dict(iter_flat_json(prune_excluded(DOCUMENT_2, trie))) == pairs
+
+
+def _all_paths_baseline(obj, parent_path=''):
+    """The recursive get_all_paths the path index replaced"""
+    paths = []
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            current_path = f"{parent_path}.{key}" if parent_path else key
+            paths.append(current_path)
+            if isinstance(value, (dict, list)):
+                paths.extend(_all_paths_baseline(value, current_path))
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            current_path = f"{parent_path}[{i}]"
+            if isinstance(value, (dict, list)):
+                paths.extend(_all_paths_baseline(value, current_path))
+    return paths
+
+
+def test_path_index_answers_what_the_recursive_walk_did():
+    index = JsonPathIndex(DOCUMENT_1)
+
+    assert set(_all_paths_baseline(DOCUMENT_1)) <= index.values.keys()
+    leaves = _flatten_baseline(DOCUMENT_1)
+    assert {path: index.get(path) for path in leaves} == leaves
+    assert index.leaf_count == len(leaves)
+    found, missing = index.lookup(['trades[1].qty', 'header . version', 'trades', 'nope'])
+    assert found == {'trades[1].qty': 5.5, 'header . version': 3, 'trades': {'type': 'array', 'length': 2}}
+    assert missing == ['nope']
+    assert index.paths_with_prefix('trades[0]') == (['trades[0]', 'trades[0].id', 'trades[0].qty',
+                                                     'trades[0].side'], 4)
+
+
+def _ndjson(records):
+    return io.BytesIO(b''.join(json.dumps(record).encode('utf-8') + b'\n' for record in records))
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_ndjson_records_diff_like_whole_documents(workers):
+    records_1 = [{'id': number, 'side': 'BUY', 'legs': [number, 1]} for number in range(50)] + ['not a record']
+    records_2 = [{'id': number, 'side': 'SELL' if number % 10 == 0 else 'BUY', 'legs': [number, 1]}
+                 for number in range(1, 52)]
+    by_id = {record['id']: record for record in records_2}
+
+    result = compare_ndjson_streams(_ndjson(records_1), _ndjson(records_2), 'id', workers=workers, partitions=4,
+                                    chunk_bytes=256)
+
+    assert (result['records_1'], result['invalid_1'], result['records_2']) == (51, 1, 51)
+    assert (result['matched'], result['different'], result['identical']) == (49, 4, 45)
+    assert result['missing_ids'] == [0] and result['extra_ids'] == [50, 51]
+    assert sorted(sample['id'] for sample in result['sample_differences']) == [10, 20, 30, 40]
+    for sample in result['sample_differences']:
+        expected = _compare_baseline(records_1[sample['id']], by_id[sample['id']])
+        assert (sample['only_in_1'], sample['only_in_2'], sample['different_values']) == expected
+    assert result['path_differences'] == [{'path': 'side', 'different': 4, 'only_in_1': 0, 'only_in_2': 0}]
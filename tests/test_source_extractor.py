@@ -0,0 +1,57 @@
+import csv
+import json
+
+from sourceExtractor import (extract_batch, extract_report_fields_and_values, extract_report_fields_and_values_regex,
+                             extract_report_file, process_batch, synthetic_export)
+
+
+def test_single_pass_matches_regex_rows():
+    export = synthetic_export(fields=50, values_per_field=4)
+
+    rows = extract_report_fields_and_values(export)
+
+    assert rows == extract_report_fields_and_values_regex(export)
+    assert len(rows) == 200 and rows[5] == {'Field': 'Report.Field1', 'Enum': 'VALUE_1_1', 'Shortcode': '1'}
+
+
+def test_values_stay_with_their_own_field():
+    export = json.dumps({'items': [
+        {'id': 'Report.Note', 'relativePath': 'Report.Note', 'values': []},
+        {'id': 'Report.Side', 'relativePath': 'Report.Side',
+         'values': [{'id': 'BUY', 'alternateId': 1}, {'id': 'SELL', 'alternateId': '2'}]},
+    ]})
+
+    assert extract_report_fields_and_values(export) == [
+        {'Field': 'Report.Note', 'Enum': '', 'Shortcode': ''},
+        {'Field': 'Report.Side', 'Enum': 'BUY', 'Shortcode': '1'},  # Numeric alternateIds are kept
+        {'Field': 'Report.Side', 'Enum': 'SELL', 'Shortcode': '2'},
+    ]
+
+
+def test_text_that_is_not_json_uses_the_regex():
+    text = 'log line "id": "Report.Side" ... "relativePath": "Report.Side", "values": [{"id": "BUY"}]'
+
+    assert extract_report_fields_and_values(text) == extract_report_fields_and_values_regex(text) == [
+        {'Field': 'Report.Side', 'Enum': 'BUY', 'Shortcode': ''}]
+
+
+def test_batch_matches_per_file_extraction(tmp_path):
+    paths = []
+    for index in range(3):
+        path = tmp_path / f'export{index}.json'
+        path.write_text(synthetic_export(fields=10 + index, values_per_field=2), encoding='utf-8')
+        paths.append(str(path))
+    missing = str(tmp_path / 'missing.json')
+
+    results = list(extract_batch(paths + [missing], workers=2))
+
+    assert results[:3] == [(path, [tuple(row.values()) for row in extract_report_file(path)], None)
+                           for path in paths]
+    assert results[3][0] == missing and results[3][1] == [] and results[3][2]
+
+    output = str(tmp_path / 'merged.csv')
+    stats = process_batch([str(tmp_path / '*.json')], output)
+    with open(output, newline='', encoding='utf-8') as file:
+        merged = list(csv.DictReader(file))
+    assert stats['rows'] == len(merged) == 2 * (10 + 11 + 12) and stats['failed'] == 0
+    assert merged[0] == {'Source': paths[0], **extract_report_file(paths[0])[0]}
@@ -0,0 +1,174 @@
+import io
+from collections import defaultdict
+
+import pandas as pd
+import pytest
+
+from venue_analysis import VenueCatalog, VenueFileError, VenuePresenceIndex, ingest_venues, parse_venue_csv
+
+VENUE_CSVS = [
+    ('LSE', b'field_name,enumValues,Presence\nSide,"1,2",Required\nPx,,Optional\nQty,,Required\nSide,3,Required\n'),
+    ('XETRA', b'field_name,enumValues,Presence\nSide,"1, 2",Required\nPx,,Required\nAcct,X,Optional\n'),
+    ('CME', b'field_name,enumValues,Presence\nSide,1,Required\nAcct,"X,Y",\nExch,nan,Optional\n'),
+]
+
+
+def _analyze_baseline(venue_data):
+    """The two-pass analyze_fixml_venues the bitmask index replaced (summary statistics omitted)"""
+    all_fields, all_enum_values, all_presence_values = set(), set(), set()
+    venues = list(venue_data.keys())
+
+    def cells(row):
+        enum_values = str(row['enumValues']).strip() if row['enumValues'] else ''
+        presence = str(row['Presence']).strip() if row['Presence'] else ''
+        enum_list = [val.strip() for val in enum_values.split(',') if val.strip()] if enum_values != 'nan' else []
+        return row['field_name'], enum_list, presence if presence != 'nan' else ''
+
+    for venue_info in venue_data.values():
+        for row in venue_info['data']:
+            field_name, enum_list, presence = cells(row)
+            all_fields.add(field_name)
+            all_enum_values.update(enum_list)
+            if presence:
+                all_presence_values.add(presence)
+
+    field_matrix = {field: {venue: False for venue in venues} for field in all_fields}
+    enum_matrix = {value: {venue: [] for venue in venues} for value in all_enum_values}
+    presence_matrix = {value: {venue: [] for venue in venues} for value in all_presence_values}
+    for venue_key, venue_info in venue_data.items():
+        for row in venue_info['data']:
+            field_name, enum_list, presence = cells(row)
+            field_matrix[field_name][venue_key] = True
+            for enum_val in enum_list:
+                enum_matrix[enum_val][venue_key].append(field_name)
+            if presence:
+                presence_matrix[presence][venue_key].append(field_name)
+
+    field_stats = {}
+    presence_patterns = defaultdict(list)
+    for field in all_fields:
+        field_stats[field] = {
+            'present_in': sum(1 for venue in venues if field_matrix[field][venue]),
+            'venues': [venue_data[venue]['name'] for venue in venues if field_matrix[field][venue]]
+        }
+        presence_patterns[tuple(field_matrix[field][venue] for venue in venues)].append(field)
+
+    return {
+        'success': True,
+        'venue_names': [venue_data[venue]['name'] for venue in venues],
+        'venues': venues,
+        'num_venues': len(venues),
+        'total_fields': len(all_fields),
+        'total_enum_values': len(all_enum_values),
+        'total_presence_values': len(all_presence_values),
+        'field_matrix': field_matrix,
+        'enum_matrix': enum_matrix,
+        'presence_matrix': presence_matrix,
+        'field_stats': field_stats,
+        'presence_patterns': {str(pattern): sorted(fields) for pattern, fields in presence_patterns.items()},
+    }
+
+
+def _baseline_result():
+    venue_data = {f'venue{i}': {'name': name, 'data': pd.read_csv(io.BytesIO(content),
+                                                                   keep_default_na=False).to_dict('records')}
+                  for i, (name, content) in enumerate(VENUE_CSVS, 1)}
+    return _analyze_baseline(venue_data)
+
+
+def _index():
+    index = VenuePresenceIndex()
+    for i, (name, content) in enumerate(VENUE_CSVS, 1):
+        index.add_venue(f'venue{i}', name, parse_venue_csv(content, name))
+    return index
+
+
+def _comparable(result):
+    result = {key: value for key, value in result.items() if key not in ('enum_set_differences', 'summary')}
+    result['presence_patterns'] = {pattern: sorted(fields) for pattern, fields in result['presence_patterns'].items()}
+    return result
+
+
+def test_bitmask_index_matches_two_pass_analysis():
+    result = _index().to_result()
+
+    assert _comparable(result) == _baseline_result()
+    assert result['summary'] == {'fields_in_all_venues': 1, 'fields_in_one_venue': 2, 'fields_in_multiple_venues': 2}
+
+
+def test_pooled_ingestion_matches_sequential_parsing():
+    assert ingest_venues(VENUE_CSVS, max_workers=2) == [parse_venue_csv(content, name) for name, content in VENUE_CSVS]
+
+    with pytest.raises(VenueFileError, match='Missing required columns in BAD: Presence'):
+        ingest_venues(VENUE_CSVS + [('BAD', b'field_name,enumValues\nSide,1\n')], max_workers=2)
+
+
+def _expand_compact(data):
+    """What the page's decodeCompactAnalysis does, for the matrices"""
+    strings, venues = data['strings'], data['venues']
+    fields = [strings[field_id] for field_id in data['fields']]
+
+    def matrix(entries):
+        return {strings[value_id]: {venue: [fields[field_id] for field_id in dict(by_venue).get(i, [])]
+                                    for i, venue in enumerate(venues)}
+                for value_id, by_venue in entries}
+
+    return {
+        'field_matrix': {field: {venue: bool(int(mask, 16) >> i & 1) for i, venue in enumerate(venues)}
+                         for field, mask in zip(fields, data['field_masks'])},
+        'enum_matrix': matrix(data['enums']),
+        'presence_matrix': matrix(data['presences']),
+    }
+
+
+def test_compact_result_expands_to_the_full_result():
+    index = _index()
+    full, compact = index.to_result(), index.to_compact_result()
+
+    assert _expand_compact(compact) == {key: full[key] for key in ('field_matrix', 'enum_matrix', 'presence_matrix')}
+    assert compact['summary'] == full['summary']
+
+
+def test_enum_set_differences_match_set_arithmetic():
+    differences = {entry['field']: entry for entry in _index().enum_set_differences()}
+
+    assert sorted(differences) == ['Acct', 'Side']
+    side = differences['Side']
+    assert (side['common'], sorted(side['union'])) == (['1'], ['1', '2', '3'])
+    assert side['extras'] == {'venue1': ['2', '3'], 'venue2': ['2']}
+    assert {venue: sorted(values) for venue, values in side['missing'].items()} == {'venue2': ['3'],
+                                                                                  'venue3': ['2', '3']}
+    assert differences['Acct']['missing'] == {'venue2': ['Y']}
+
+
+def test_catalog_reanalysis_matches_a_fresh_analysis(tmp_path):
+    catalog = VenueCatalog(str(tmp_path))
+    for name, content in VENUE_CSVS:
+        catalog.put(name, content)
+    names = [name for name, _ in VENUE_CSVS]
+    assert catalog.analyze(names) == _index().to_result()
+
+    updated = b'field_name,enumValues,Presence\nSide,"1,2,3",Required\nQty,,Optional\n'
+    version, created = catalog.put('XETRA', updated)
+    assert created and version['version'] == 2
+    assert catalog.put('XETRA', updated) == (version, False)
+
+    fresh = VenuePresenceIndex()
+    for i, (name, content) in enumerate([VENUE_CSVS[0], ('XETRA', updated), VENUE_CSVS[2]], 1):
+        fresh.add_venue(f'venue{i}', name, parse_venue_csv(content, name))
+    assert catalog.analyze(names) == fresh.to_result()  # Only XETRA is recomputed
+    assert VenueCatalog(str(tmp_path)).analyze(names, versions={'XETRA': 1}) == _index().to_result()
+
+
+def test_similarity_matches_field_set_jaccard():
+    field_sets = [set(parse_venue_csv(content, name)['fields']) for name, content in VENUE_CSVS]
+
+    result = _index().similarity()
+
+    for i, fields_i in enumerate(field_sets):
+        for j, fields_j in enumerate(field_sets):
+            assert result['shared_fields'][i][j] == len(fields_i & fields_j)
+            assert result['jaccard'][i][j] == round(len(fields_i & fields_j) / len(fields_i | fields_j), 4)
+    assert result['nearest'][0]['matches'][0]['venue'] == 'XETRA'  # Shares Side and Px with LSE
+    if result['clustering'] is not None:
+        assert sorted(result['clustering']['order']) == ['CME', 'LSE', 'XETRA']
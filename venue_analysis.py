@@ -0,0 +1,655 @@
+"""
+Presence / enum analysis of FIXML field specs across venues.
+
+Each venue spec (field_name, enumValues, Presence rows) is reduced once to a
+partial structure, and the partials are merged into a ``VenuePresenceIndex``
+where a field's presence across venues is a single integer bitmask (bit i is
+set when venue i has the field).  Counts, patterns and the "in all / one /
+several venues" statistics are then bit operations on those masks.
+
+Venue CSVs are parsed and reduced in a shared worker pool (``ingest_venues``)
+so a many-venue analysis takes roughly as long as its slowest venue.  The
+``VenueCatalog`` keeps reduced venues on disk so analyses can be re-run over
+any catalogued subset without re-uploading, recomputing only changed venues.
+"""
+import hashlib
+import io
+import json
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+try:
+    from scipy.cluster.hierarchy import leaves_list, linkage
+    from scipy.spatial.distance import squareform
+except ImportError:  # Similarity is still reported, just without clustering
+    linkage = None
+
+REQUIRED_COLUMNS = ['field_name', 'enumValues', 'Presence']
+
+# Bump when the shape of ``reduce_venue_rows`` output changes; catalogued
+# venues are then re-reduced from their stored CSV on next use
+REDUCTION_VERSION = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+if hasattr(int, 'bit_count'):
+    popcount = int.bit_count
+else:  # Python < 3.10
+    def popcount(mask):
+        return bin(mask).count('1')
+
+
+def normalize_cell(value):
+    """Normalise a CSV cell the way the analysis expects ('' for empty / nan)"""
+    value = str(value).strip() if value else ''
+    return '' if value == 'nan' else value
+
+
+def reduce_venue_rows(rows):
+    """
+    Reduce one venue's rows to the structures needed for the analysis.
+
+    Args:
+        rows: Iterable of (field_name, enumValues, Presence) tuples
+
+    Returns:
+        dict: 'fields' (unique field names in first-seen order), 'enums'
+        ({enum: [field, ...]}), 'field_enums' ({field: [enum, ...]}, only for
+        fields with enum values) and 'presences' ({presence: [field, ...]})
+    """
+    fields = {}
+    enums = defaultdict(list)
+    field_enums = defaultdict(dict)
+    presences = defaultdict(list)
+    split_cache = {}  # Specs repeat the same enumValues strings across many fields
+
+    for field_name, enum_values, presence in rows:
+        fields[field_name] = None
+
+        enum_values = normalize_cell(enum_values)
+        if enum_values:
+            enum_list = split_cache.get(enum_values)
+            if enum_list is None:
+                # Split enum values if they contain multiple values
+                enum_list = split_cache[enum_values] = [val.strip() for val in enum_values.split(',') if val.strip()]
+            for enum_val in enum_list:
+                enums[enum_val].append(field_name)
+            field_enums[field_name].update(dict.fromkeys(enum_list))
+
+        presence = normalize_cell(presence)
+        if presence:
+            presences[presence].append(field_name)
+
+    return {
+        'fields': list(fields),
+        'enums': dict(enums),
+        'field_enums': {field: list(values) for field, values in field_enums.items()},
+        'presences': dict(presences)
+    }
+
+
+class VenueFileError(ValueError):
+    """A venue CSV could not be parsed or is missing required columns"""
+
+
+def parse_venue_csv(content, venue_name):
+    """Parse one venue CSV (bytes) and reduce it with ``reduce_venue_rows``"""
+    try:
+        df = pd.read_csv(io.BytesIO(content), keep_default_na=False)
+    except Exception as e:
+        raise VenueFileError(f'Error processing {venue_name}: {str(e)}')
+
+    # Validate required columns
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in df.columns]
+    if missing_columns:
+        raise VenueFileError(f'Missing required columns in {venue_name}: {", ".join(missing_columns)}')
+
+    # tolist() yields native Python values, as to_dict('records') did
+    return reduce_venue_rows(zip(*(df[col].tolist() for col in REQUIRED_COLUMNS)))
+
+
+def get_executor(max_workers=None):
+    """Return the shared process pool used for venue ingestion"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+        return _executor
+
+
+def ingest_venues(venue_files, max_workers=None):
+    """
+    Parse and reduce venue CSVs concurrently.
+
+    Args:
+        venue_files: List of (venue_name, csv_bytes) in venue order
+        max_workers (int): Pool size, defaults to the number of CPUs
+
+    Returns:
+        list: One ``reduce_venue_rows`` partial per venue, in the same order
+
+    Raises:
+        VenueFileError: For the first venue (in order) that failed
+    """
+    if len(venue_files) < 2 or (os.cpu_count() or 1) < 2:
+        return [parse_venue_csv(content, name) for name, content in venue_files]
+
+    executor = get_executor(max_workers)
+    futures = [executor.submit(parse_venue_csv, content, name) for name, content in venue_files]
+    partials = []
+    for (name, _), future in zip(venue_files, futures):
+        try:
+            partials.append(future.result())
+        except VenueFileError:
+            raise
+        except Exception as e:
+            raise VenueFileError(f'Error processing {name}: {str(e)}')
+    return partials
+
+
+def iter_bits(mask):
+    """Yield the indexes of the set bits of ``mask`` in ascending order"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class VenuePresenceIndex:
+    """
+    Field presence across venues stored as one integer bitmask per field.
+
+    Venues are added with ``add_venue`` in order; venue i owns bit i.  Enum
+    and presence values keep their per-venue field lists as well, since the
+    response reports which fields carry each value.
+    """
+
+    def __init__(self):
+        self.venues = []
+        self.venue_names = []
+        self.field_masks = {}
+        self.enum_fields = {}  # enum -> {venue index: [fields]}
+        self.presence_fields = {}  # presence -> {venue index: [fields]}
+        self.enum_ids = {}  # enum -> bit in the enum-set masks
+        self.field_enum_masks = {}  # field -> {venue index: enum-set mask}
+        self.partials = []
+
+    @property
+    def full_mask(self):
+        return (1 << len(self.venues)) - 1
+
+    def add_venue(self, venue_key, venue_name, partial):
+        """Merge a venue's ``reduce_venue_rows`` result into the index"""
+        index = len(self.venues)
+        self.venues.append(venue_key)
+        self.venue_names.append(venue_name)
+        self.partials.append(partial)
+        self._merge(index, partial)
+        return index
+
+    def replace_venue(self, index, venue_name, partial):
+        """Swap venue ``index`` for a new version, leaving other venues untouched"""
+        self._unmerge(index, self.partials[index])
+        self.venue_names[index] = venue_name
+        self.partials[index] = partial
+        self._merge(index, partial)
+
+    def _merge(self, index, partial):
+        bit = 1 << index
+        field_masks = self.field_masks
+        for field in partial['fields']:
+            field_masks[field] = field_masks.get(field, 0) | bit
+        for enum_val, fields in partial['enums'].items():
+            self.enum_fields.setdefault(enum_val, {})[index] = fields
+        for presence, fields in partial['presences'].items():
+            self.presence_fields.setdefault(presence, {})[index] = fields
+
+        enum_ids = self.enum_ids
+        for field, values in partial['field_enums'].items():
+            mask = 0
+            for value in values:
+                enum_id = enum_ids.get(value)
+                if enum_id is None:
+                    enum_id = enum_ids[value] = len(enum_ids)
+                mask |= 1 << enum_id
+            self.field_enum_masks.setdefault(field, {})[index] = mask
+
+    def _unmerge(self, index, partial):
+        clear = ~(1 << index)
+        field_masks = self.field_masks
+        for field in partial['fields']:
+            mask = field_masks[field] & clear
+            if mask:
+                field_masks[field] = mask
+            else:
+                del field_masks[field]
+
+        for by_value, values in ((self.enum_fields, partial['enums']),
+                                 (self.presence_fields, partial['presences']),
+                                 (self.field_enum_masks, partial['field_enums'])):
+            for value in values:
+                by_venue = by_value[value]
+                del by_venue[index]
+                if not by_venue:
+                    del by_value[value]
+
+    def presence_patterns(self):
+        """Group fields by their presence bitmask"""
+        patterns = defaultdict(list)
+        for field, mask in self.field_masks.items():
+            patterns[mask].append(field)
+        return patterns
+
+    def summary(self):
+        full_mask = self.full_mask
+        in_all = in_one = in_multiple = 0
+        for mask in self.field_masks.values():
+            is_all = mask == full_mask
+            is_one = mask & (mask - 1) == 0  # Exactly one bit set
+            in_all += is_all
+            in_one += is_one
+            in_multiple += not (is_all or is_one)
+        return {
+            'fields_in_all_venues': in_all,
+            'fields_in_one_venue': in_one,
+            'fields_in_multiple_venues': in_multiple
+        }
+
+    def enum_set_differences(self):
+        """
+        Compare each field's set of enum values across the venues that have it.
+
+        Enum values are interned to bits, so a field's enum set at a venue is a
+        single integer; common values, the union and each venue's extras and
+        missing values are AND / OR / AND-NOT of those masks.  A venue that
+        has the field without enum values counts as the empty set.
+
+        Returns:
+            list: One entry per field whose enum sets differ between venues
+        """
+        enum_values = list(self.enum_ids)
+        venues = self.venues
+        venue_names = self.venue_names
+
+        def values_of(mask):
+            return [enum_values[i] for i in iter_bits(mask)]
+
+        differences = []
+        for field, by_venue in self.field_enum_masks.items():
+            present = list(iter_bits(self.field_masks[field]))
+            if len(present) < 2:
+                continue
+
+            masks = [by_venue.get(i, 0) for i in present]
+            union = common = masks[0]
+            for mask in masks[1:]:
+                union |= mask
+                common &= mask
+            if union == common:
+                continue
+
+            differences.append({
+                'field': field,
+                'venues': [venue_names[i] for i in present],
+                'common': values_of(common),
+                'union': values_of(union),
+                'values': {venues[i]: values_of(mask) for i, mask in zip(present, masks)},
+                'extras': {venues[i]: values_of(mask & ~common) for i, mask in zip(present, masks) if mask != common},
+                'missing': {venues[i]: values_of(union & ~mask) for i, mask in zip(present, masks) if mask != union}
+            })
+        return differences
+
+    def presence_bits(self):
+        """
+        Field presence as a (fields x venues) uint8 0/1 array.
+
+        Each field's mask is written out as little-endian bytes and the bits
+        are unpacked in one call, rather than testing every bit in Python.
+        """
+        num_venues = len(self.venues)
+        width = max(1, (num_venues + 7) // 8)
+        packed = b''.join(mask.to_bytes(width, 'little') for mask in self.field_masks.values())
+        packed = np.frombuffer(packed, dtype=np.uint8).reshape(len(self.field_masks), width)
+        return np.unpackbits(packed, axis=1, bitorder='little')[:, :num_venues]
+
+    def similarity(self, method='average', nearest=5):
+        """
+        Venue-by-venue field-set similarity and hierarchical clustering.
+
+        Shared field counts for every venue pair come from a single matrix
+        product of the presence bits.  Jaccard is shared / union and overlap is
+        shared / the smaller field set.  Venues are clustered on Jaccard
+        distance when scipy is available.
+
+        Args:
+            method (str): scipy linkage method
+            nearest (int): Most similar venues listed per venue
+
+        Returns:
+            dict: Matrices in venue order, each venue's nearest venues and the
+            clustering (``None`` without scipy or with fewer than 2 venues)
+        """
+        venue_names = self.venue_names
+        bits = self.presence_bits().astype(np.float32)
+        shared = (bits.T @ bits).round().astype(np.int64)  # Exact below 2**24 fields
+        counts = np.diag(shared)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            union = counts[:, None] + counts[None, :] - shared
+            jaccard = np.where(union > 0, shared / np.maximum(union, 1), 1.0)
+            smaller = np.minimum(counts[:, None], counts[None, :])
+            overlap = np.where(smaller > 0, shared / np.maximum(smaller, 1), 1.0)
+
+        nearest_venues = []
+        for i, name in enumerate(venue_names):
+            ranked = [j for j in np.argsort(-jaccard[i], kind='stable') if j != i][:nearest]
+            nearest_venues.append({
+                'venue': name,
+                'matches': [{'venue': venue_names[j], 'jaccard': round(float(jaccard[i, j]), 4),
+                             'shared_fields': int(shared[i, j])} for j in ranked]
+            })
+
+        clustering = None
+        if linkage is not None and len(venue_names) > 1:
+            distances = squareform(1.0 - jaccard, checks=False)
+            tree = linkage(np.clip(distances, 0.0, 1.0), method=method)
+            clustering = {
+                'method': method,
+                'order': [venue_names[i] for i in leaves_list(tree)],
+                # scipy linkage rows: [cluster a, cluster b, distance, size]
+                'linkage': [[int(a), int(b), round(float(d), 6), int(n)] for a, b, d, n in tree]
+            }
+
+        return {
+            'venue_names': venue_names,
+            'field_counts': counts.tolist(),
+            'shared_fields': shared.tolist(),
+            'jaccard': jaccard.round(4).tolist(),
+            'overlap': overlap.round(4).tolist(),
+            'nearest': nearest_venues,
+            'clustering': clustering
+        }
+
+    def _venue_matrix(self, fields_by_venue):
+        return {
+            value: {venue: list(by_venue.get(i, ())) for i, venue in enumerate(self.venues)}
+            for value, by_venue in fields_by_venue.items()
+        }
+
+    def to_result(self):
+        """Build the /upload_fixml_venues response"""
+        venues = self.venues
+        venue_names = self.venue_names
+        num_venues = len(venues)
+
+        field_matrix = {}
+        field_stats = {}
+        for field, mask in self.field_masks.items():
+            field_matrix[field] = {venue: bool(mask >> i & 1) for i, venue in enumerate(venues)}
+            field_stats[field] = {
+                'present_in': popcount(mask),
+                'venues': [venue_names[i] for i in iter_bits(mask)]
+            }
+
+        presence_patterns = {
+            str(tuple(bool(mask >> i & 1) for i in range(num_venues))): fields
+            for mask, fields in self.presence_patterns().items()
+        }
+
+        return {
+            'success': True,
+            'venue_names': venue_names,
+            'venues': venues,
+            'num_venues': num_venues,
+            'total_fields': len(self.field_masks),
+            'total_enum_values': len(self.enum_fields),
+            'total_presence_values': len(self.presence_fields),
+            'field_matrix': field_matrix,
+            'enum_matrix': self._venue_matrix(self.enum_fields),
+            'presence_matrix': self._venue_matrix(self.presence_fields),
+            'field_stats': field_stats,
+            'presence_patterns': presence_patterns,
+            'enum_set_differences': self.enum_set_differences(),
+            'summary': self.summary()
+        }
+
+    def to_compact_result(self):
+        """
+        Build a compact, columnar /upload_fixml_venues response.
+
+        Field names and enum/presence values are stored once in ``strings``
+        and referenced by id.  Each field's presence is its venue bitmask as a
+        hex string (it can exceed 53 bits), and the enum/presence matrices only
+        list the venues that actually use a value.  ``field_stats`` and
+        ``presence_patterns`` are left for the client to derive from the masks.
+        """
+        strings = []
+        string_ids = {}
+
+        def intern(value):
+            string_id = string_ids.get(value)
+            if string_id is None:
+                string_id = string_ids[value] = len(strings)
+                strings.append(value)
+            return string_id
+
+        fields = [intern(field) for field in self.field_masks]
+        field_index = {field: i for i, field in enumerate(self.field_masks)}
+
+        def encode_matrix(fields_by_venue):
+            return [
+                [intern(value), [[i, [field_index[field] for field in by_venue[i]]] for i in sorted(by_venue)]]
+                for value, by_venue in fields_by_venue.items()
+            ]
+
+        return {
+            'success': True,
+            'format': 'compact',
+            'venue_names': self.venue_names,
+            'venues': self.venues,
+            'num_venues': len(self.venues),
+            'total_fields': len(self.field_masks),
+            'total_enum_values': len(self.enum_fields),
+            'total_presence_values': len(self.presence_fields),
+            'strings': strings,
+            'fields': fields,
+            'field_masks': [format(mask, 'x') for mask in self.field_masks.values()],
+            'enums': encode_matrix(self.enum_fields),
+            'presences': encode_matrix(self.presence_fields),
+            'enum_set_differences': self.enum_set_differences(),
+            'summary': self.summary()
+        }
+
+
+class VenueCatalog:
+    """
+    Venue specs persisted server-side, keyed by venue name and content hash.
+
+    Each uploaded CSV is stored once as ``<hash>.csv`` next to its reduced
+    form (``<hash>.v<REDUCTION_VERSION>.json``), and ``catalog.json`` records
+    every venue's version history.  Re-uploading identical content does not
+    create a new version.  ``analyze`` keeps the last few indexes it built,
+    keyed by the venue selection, and when a selected venue has changed since
+    only that venue's contribution is recomputed.
+    """
+
+    def __init__(self, path, max_indexes=8):
+        self.path = path
+        self.max_indexes = max_indexes
+        self._lock = threading.Lock()
+        self._partials = {}
+        self._indexes = OrderedDict()  # venue names -> (hashes, VenuePresenceIndex)
+        os.makedirs(path, exist_ok=True)
+
+    @property
+    def _catalog_path(self):
+        return os.path.join(self.path, 'catalog.json')
+
+    def _load(self):
+        if not os.path.exists(self._catalog_path):
+            return {}
+        with open(self._catalog_path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+
+    def _write(self, catalog):
+        temp_path = f"{self._catalog_path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(catalog, file, indent=2, sort_keys=True)
+        os.replace(temp_path, self._catalog_path)
+
+    def _file(self, content_hash, suffix):
+        return os.path.join(self.path, f'{content_hash}{suffix}')
+
+    def _store_partial(self, content_hash, partial):
+        temp_path = self._file(content_hash, '.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(partial, file)
+        os.replace(temp_path, self._file(content_hash, f'.v{REDUCTION_VERSION}.json'))
+        self._partials[content_hash] = partial
+
+    def load_partial(self, content_hash, venue_name):
+        """Return the reduced form of a stored CSV, re-reducing it if stale"""
+        partial = self._partials.get(content_hash)
+        if partial is not None:
+            return partial
+
+        partial_path = self._file(content_hash, f'.v{REDUCTION_VERSION}.json')
+        if os.path.exists(partial_path):
+            with open(partial_path, 'r', encoding='utf-8') as file:
+                partial = json.load(file)
+            self._partials[content_hash] = partial
+            return partial
+
+        with open(self._file(content_hash, '.csv'), 'rb') as file:
+            partial = parse_venue_csv(file.read(), venue_name)
+        self._store_partial(content_hash, partial)
+        return partial
+
+    def list_venues(self):
+        venues = []
+        for name, entry in sorted(self._load().items()):
+            latest = entry['versions'][-1]
+            venues.append({'name': name, 'versions': len(entry['versions']), **latest})
+        return venues
+
+    def get(self, name):
+        return self._load().get(name)
+
+    def put(self, name, content, filename=None):
+        """
+        Add a venue CSV, creating a new version if its content changed.
+
+        Returns:
+            tuple: (version entry, created) where ``created`` is False when the
+            content matches the venue's latest version
+
+        Raises:
+            VenueFileError: If the CSV cannot be parsed
+        """
+        content_hash = hashlib.blake2b(content, digest_size=16).hexdigest()
+        with self._lock:
+            catalog = self._load()
+            entry = catalog.setdefault(name, {'versions': []})
+            if entry['versions'] and entry['versions'][-1]['hash'] == content_hash:
+                return entry['versions'][-1], False
+
+            partial = parse_venue_csv(content, name)  # Validate before persisting
+            if not os.path.exists(self._file(content_hash, '.csv')):
+                with open(self._file(content_hash, '.csv'), 'wb') as file:
+                    file.write(content)
+            self._store_partial(content_hash, partial)
+
+            version = {
+                'version': len(entry['versions']) + 1,
+                'hash': content_hash,
+                'filename': filename,
+                'total_fields': len(partial['fields']),
+                'updated': datetime.now().isoformat(timespec='seconds')
+            }
+            entry['versions'].append(version)
+            self._write(catalog)
+        return version, True
+
+    def delete(self, name):
+        """Remove a venue from the catalog (stored files are kept for other venues)"""
+        with self._lock:
+            catalog = self._load()
+            if name not in catalog:
+                return False
+            del catalog[name]
+            self._write(catalog)
+        return True
+
+    def resolve(self, names, versions=None):
+        """
+        Map venue names (and optional pinned versions) to content hashes.
+
+        Raises:
+            KeyError: For an unknown venue or version
+        """
+        catalog = self._load()
+        versions = versions or {}
+        hashes = []
+        for name in names:
+            entry = catalog.get(name)
+            if entry is None:
+                raise KeyError(f'Unknown venue: {name}')
+            version = versions.get(name)
+            if version is None:
+                hashes.append(entry['versions'][-1]['hash'])
+                continue
+            matches = [v for v in entry['versions'] if v['version'] == int(version)]
+            if not matches:
+                raise KeyError(f'Unknown version {version} of venue {name}')
+            hashes.append(matches[0]['hash'])
+        return hashes
+
+    def _index(self, names, hashes):
+        """Return the index for ``names``, updating a cached one in place (call under the lock)"""
+        cached = self._indexes.pop(names, None)
+        if cached is None:
+            index = VenuePresenceIndex()
+            for i, (name, content_hash) in enumerate(zip(names, hashes)):
+                index.add_venue(f'venue{i + 1}', name, self.load_partial(content_hash, name))
+        else:
+            previous, index = cached
+            for i, (name, content_hash) in enumerate(zip(names, hashes)):
+                if previous[i] != content_hash:
+                    index.replace_venue(i, name, self.load_partial(content_hash, name))
+
+        self._indexes[names] = (hashes, index)
+        while len(self._indexes) > self.max_indexes:
+            self._indexes.popitem(last=False)
+        return index
+
+    def analyze(self, names, versions=None, compact=False):
+        """
+        Run the venue analysis over catalogued venues.
+
+        Args:
+            names: Venue names in analysis order
+            versions (dict): Optional {name: version} pins, latest otherwise
+            compact (bool): Return ``to_compact_result`` instead of ``to_result``
+
+        Returns:
+            dict: The /upload_fixml_venues response for the selection
+        """
+        names = tuple(names)
+        hashes = self.resolve(names, versions)
+        with self._lock:
+            index = self._index(names, hashes)
+            return index.to_compact_result() if compact else index.to_result()
+
+    def similarity(self, names, versions=None, **kwargs):
+        """``VenuePresenceIndex.similarity`` over catalogued venues"""
+        names = tuple(names)
+        hashes = self.resolve(names, versions)
+        with self._lock:
+            return self._index(names, hashes).similarity(**kwargs)